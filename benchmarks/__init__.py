@@ -0,0 +1,2 @@
+"""Benchmarks for pelecanus. See `benchmarks/run.py` for usage.
+"""
@@ -0,0 +1,468 @@
+"""Benchmark cases: one for every public PelicanJson method and every
+toolbox function.
+
+A case is made of a `setup` function, which receives a document and returns
+whatever the case needs (this part isn't timed), and a `run` function, which
+receives the result of `setup` and does the work being measured. Cases which
+edit their input get a fresh copy from `setup` for every repetition.
+"""
+from collections import namedtuple
+import asyncio
+import copy
+import json
+import os
+import pickle
+import tempfile
+
+from pelecanus import InternedPelicanJson
+from pelecanus import PackedPelicanJson
+from pelecanus import PelicanJson
+from pelecanus import ShapedPelicanJson
+from pelecanus import toolbox
+
+
+Case = namedtuple('Case', ['name', 'setup', 'run'])
+
+CASES = []
+
+
+def case(name, setup):
+    def register(run):
+        CASES.append(Case(name, setup, run))
+        return run
+    return register
+
+
+class Target:
+    """Everything a case might need to know about a document: the document
+    itself, its PelicanJson version and a path, key and value found at the
+    far end of it.
+    """
+    def __init__(self, doc):
+        self.doc = doc
+        self.pelican = PelicanJson(doc)
+        self.path, self.value = list(self.pelican.enumerate())[-1]
+        self.key = [step for step in self.path if isinstance(step, str)][-1]
+        self.node = self.pelican.get_nested_value(self.path[:-1])
+        if not isinstance(self.node, PelicanJson):
+            self.node = self.pelican
+        self.new_path = self.pelican.path_of(self.node)
+        self.new_path.extend(['benchmark', 'new', 3, 'key'])
+
+
+def target(doc):
+    return Target(doc)
+
+
+def fresh_target(doc):
+    tgt = Target(doc)
+    tgt.doc = copy.deepcopy(doc)
+    return tgt
+
+
+def raw(doc):
+    return doc
+
+
+# PelicanJson
+@case('PelicanJson.__init__', raw)
+def _(doc):
+    PelicanJson(doc)
+
+
+@case('ShapedPelicanJson.__init__', raw)
+def _(doc):
+    ShapedPelicanJson(doc)
+
+
+@case('InternedPelicanJson.__init__', raw)
+def _(doc):
+    InternedPelicanJson(doc)
+
+
+@case('PackedPelicanJson.__init__', raw)
+def _(doc):
+    PackedPelicanJson(doc)
+
+
+@case('PelicanJson.__len__', target)
+def _(tgt):
+    len(tgt.pelican)
+
+
+@case('PelicanJson.__contains__', target)
+def _(tgt):
+    'NOT A KEY' in tgt.pelican
+
+
+@case('PelicanJson.__iter__', target)
+def _(tgt):
+    for _ in tgt.pelican:
+        pass
+
+
+@case('PelicanJson.keys', target)
+def _(tgt):
+    for _ in tgt.pelican.keys():
+        pass
+
+
+@case('PelicanJson.values', target)
+def _(tgt):
+    for _ in tgt.pelican.values():
+        pass
+
+
+@case('PelicanJson.items', target)
+def _(tgt):
+    for _ in tgt.pelican.items():
+        pass
+
+
+@case('PelicanJson.enumerate', target)
+def _(tgt):
+    for _ in tgt.pelican.enumerate():
+        pass
+
+
+@case('PelicanJson.page', target)
+def _(tgt):
+    _, cursor = tgt.pelican.page(100)
+    while cursor is not None:
+        _, cursor = tgt.pelican.page(100, cursor=cursor)
+
+
+@case('PelicanJson.paths', target)
+def _(tgt):
+    for _ in tgt.pelican.paths():
+        pass
+
+
+@case('PelicanJson.convert', target)
+def _(tgt):
+    tgt.pelican.convert()
+
+
+@case('PelicanJson.serialize', target)
+def _(tgt):
+    tgt.pelican.serialize()
+
+
+@case('PelicanJson.count_key', target)
+def _(tgt):
+    tgt.pelican.count_key(tgt.key)
+
+
+@case('PelicanJson.search_key', target)
+def _(tgt):
+    for _ in tgt.pelican.search_key(tgt.key):
+        pass
+
+
+@case('PelicanJson.search_key:bfs_first_only', target)
+def _(tgt):
+    for _ in tgt.pelican.search_key(tgt.key, order='bfs', first_only=True):
+        pass
+
+
+@case('PelicanJson.search_value', target)
+def _(tgt):
+    for _ in tgt.pelican.search_value(tgt.value):
+        pass
+
+
+@case('PelicanJson.search_many', target)
+def _(tgt):
+    tgt.pelican.search_many(keys=[tgt.key, 'href', 'self', 'next', 'guid'],
+                            values=[tgt.value, None])
+
+
+@case('PelicanJson.search_hits', target)
+def _(tgt):
+    for _ in tgt.pelican.search_hits(keys=[tgt.key, 'href', 'self', 'next', 'guid'],
+                                     values=[tgt.value, None]):
+        pass
+
+
+@case('PelicanJson.pluck', target)
+def _(tgt):
+    for _ in tgt.pelican.pluck(tgt.key, tgt.value):
+        pass
+
+
+@case('PelicanJson.project', target)
+def _(tgt):
+    tgt.pelican.project([tgt.path, tgt.path[:1] + [toolbox.ANY] + tgt.path[2:]])
+
+
+@case('PelicanJson.path_of', target)
+def _(tgt):
+    tgt.pelican.path_of(tgt.node)
+
+
+@case('PelicanJson.get_nested_value', target)
+def _(tgt):
+    tgt.pelican.get_nested_value(tgt.path)
+
+
+@case('PelicanJson.safe_get_nested_value', target)
+def _(tgt):
+    tgt.pelican.safe_get_nested_value(tgt.new_path)
+
+
+@case('PelicanJson.set_nested_value', fresh_target)
+def _(tgt):
+    tgt.pelican.set_nested_value(tgt.path, 'benchmark')
+
+
+@case('PelicanJson.create_path', fresh_target)
+def _(tgt):
+    tgt.pelican.create_path(tgt.new_path, 'benchmark')
+
+
+@case('PelicanJson.find_and_replace', fresh_target)
+def _(tgt):
+    tgt.pelican.find_and_replace(tgt.value, 'benchmark')
+
+
+@case('PelicanJson.delete_paths', fresh_target)
+def _(tgt):
+    tgt.pelican.delete_paths([tgt.path, tgt.path[:1] + [toolbox.ANY] + tgt.path[2:]])
+
+
+@case('PelicanJson.delete_where', fresh_target)
+def _(tgt):
+    tgt.pelican.delete_where(key=tgt.key, value=tgt.value)
+
+
+def overrides(doc):
+    tgt = Target(doc)
+    tgt.other = copy.deepcopy(doc)
+    tgt.other.update(toolbox.new_json_from_path(tgt.new_path, 'benchmark'))
+    return tgt
+
+
+@case('PelicanJson.deep_merge', overrides)
+def _(tgt):
+    tgt.pelican.deep_merge(tgt.other, list_strategy='by_key')
+
+
+@case('PelicanJson.move_path', fresh_target)
+def _(tgt):
+    tgt.pelican.move_path(tgt.path[:1], ['benchmark'])
+
+
+@case('PelicanJson.rename_key', fresh_target)
+def _(tgt):
+    tgt.pelican.rename_key(tgt.key, 'benchmark', everywhere=True)
+
+
+@case('PelicanJson.memory_stats', target)
+def _(tgt):
+    tgt.pelican.memory_stats()
+
+
+def snapshot(doc):
+    tgt = Target(doc)
+    tgt.filename = os.path.join(tempfile.gettempdir(), 'pelecanus-benchmark.pelican')
+    tgt.pelican.dump_binary(tgt.filename)
+    return tgt
+
+
+@case('PelicanJson.dump_binary', snapshot)
+def _(tgt):
+    tgt.pelican.dump_binary(tgt.filename)
+
+
+@case('PelicanJson.open_binary', snapshot)
+def _(tgt):
+    PelicanJson.open_binary(tgt.filename).get_nested_value(tgt.path)
+
+
+@case('PelicanJson.open_binary:enumerate', snapshot)
+def _(tgt):
+    for _ in PelicanJson.open_binary(tgt.filename).enumerate():
+        pass
+
+
+@case('PelicanJson.__deepcopy__', target)
+def _(tgt):
+    copy.deepcopy(tgt.pelican)
+
+
+@case('PelicanJson.__reduce__', target)
+def _(tgt):
+    pickle.loads(pickle.dumps(tgt.pelican))
+
+
+@case('PelicanJson.share', target)
+def _(tgt):
+    with tgt.pelican.share() as shared:
+        shared.open().get_nested_value(tgt.path)
+
+
+@case('PelicanJson.aload', json.dumps)
+def _(text):
+    async def chunks():
+        yield text.encode('utf-8')
+    asyncio.run(PelicanJson.aload(chunks()))
+
+
+@case('PelicanJson.aenumerate', target)
+def _(tgt):
+    async def consume():
+        async for _ in tgt.pelican.aenumerate():
+            pass
+    asyncio.run(consume())
+
+
+@case('PelicanJson.asearch_key', target)
+def _(tgt):
+    async def consume():
+        async for _ in tgt.pelican.asearch_key(tgt.key):
+            pass
+    asyncio.run(consume())
+
+
+@case('PelicanJson.asearch_value', target)
+def _(tgt):
+    async def consume():
+        async for _ in tgt.pelican.asearch_value(tgt.value):
+            pass
+    asyncio.run(consume())
+
+
+# toolbox
+@case('toolbox.walk', target)
+def _(tgt):
+    for _ in toolbox.walk(tgt.doc):
+        pass
+
+
+@case('toolbox.new_json_from_path', target)
+def _(tgt):
+    toolbox.new_json_from_path(tgt.new_path, 'benchmark')
+
+
+@case('toolbox.backfill_append', target)
+def _(tgt):
+    toolbox.backfill_append([], 1000, 'benchmark')
+
+
+@case('toolbox.find_value', target)
+def _(tgt):
+    for _ in toolbox.find_value(tgt.doc, tgt.value):
+        pass
+
+
+@case('toolbox.count_key', target)
+def _(tgt):
+    toolbox.count_key(tgt.doc, tgt.key)
+
+
+@case('toolbox.generate_paths', target)
+def _(tgt):
+    for _ in toolbox.generate_paths(tgt.doc):
+        pass
+
+
+@case('toolbox.generate_paths_to_key', target)
+def _(tgt):
+    for _ in toolbox.generate_paths_to_key(tgt.doc, tgt.key):
+        pass
+
+
+@case('toolbox.search_many', target)
+def _(tgt):
+    toolbox.search_many(tgt.doc, keys=[tgt.key, 'href', 'self', 'next', 'guid'],
+                        values=[tgt.value, None])
+
+
+@case('toolbox.search_hits', target)
+def _(tgt):
+    for _ in toolbox.search_hits(tgt.doc, keys=[tgt.key, 'href', 'self', 'next', 'guid'],
+                                 values=[tgt.value, None]):
+        pass
+
+
+@case('toolbox.project', target)
+def _(tgt):
+    toolbox.project(tgt.doc, [tgt.path, tgt.path[:1] + [toolbox.ANY] + tgt.path[2:]])
+
+
+@case('toolbox.get_path', target)
+def _(tgt):
+    toolbox.get_path(tgt.doc, tgt.key)
+
+
+@case('toolbox.get_path:bfs', target)
+def _(tgt):
+    toolbox.get_path(tgt.doc, tgt.key, order='bfs')
+
+
+@case('toolbox.get_nested_value', target)
+def _(tgt):
+    toolbox.get_nested_value(tgt.doc, tgt.path)
+
+
+@case('toolbox.set_nested_value', fresh_target)
+def _(tgt):
+    toolbox.set_nested_value(tgt.doc, tgt.path, 'benchmark')
+
+
+def json_file(doc):
+    tgt = Target(doc)
+    tgt.filename = os.path.join(tempfile.gettempdir(), 'pelecanus-benchmark.json')
+    with open(tgt.filename, 'w') as f:
+        json.dump(doc, f)
+    tgt.index = toolbox.index_json_file(tgt.filename, max_depth=2)
+    return tgt
+
+
+@case('toolbox.index_json_file', json_file)
+def _(tgt):
+    toolbox.index_json_file(tgt.filename, max_depth=2)
+
+
+@case('toolbox.load_json_index', json_file)
+def _(tgt):
+    toolbox.load_json_index(tgt.filename)
+
+
+@case('toolbox.get_nested_value_from_file', json_file)
+def _(tgt):
+    with open(tgt.filename, 'rb') as fp:
+        toolbox.get_nested_value_from_file(fp, tgt.path, tgt.index)
+
+
+def json_text(doc):
+    tgt = Target(doc)
+    tgt.text = json.dumps(doc)
+    return tgt
+
+
+@case('PelicanJson.loads', json_text)
+def _(tgt):
+    PelicanJson.loads(tgt.text)
+
+
+@case('toolbox.loads', json_text)
+def _(tgt):
+    toolbox.loads(tgt.text)
+
+
+@case('toolbox.dumps', target)
+def _(tgt):
+    toolbox.dumps(tgt.doc)
+
+
+@case('PelicanJson.loads_lazy', json_text)
+def _(tgt):
+    PelicanJson.loads_lazy(tgt.text).get_nested_value(tgt.path)
+
+
+@case('PelicanJson.loads_lazy:serialize', json_text)
+def _(tgt):
+    pelican = PelicanJson.loads_lazy(tgt.text)
+    pelican.set_nested_value(tgt.path, 'benchmark')
+    pelican.serialize()
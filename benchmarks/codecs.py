@@ -0,0 +1,75 @@
+"""Compares the JSON codecs in `pelecanus.codecs` on the test fixtures.
+
+Usage::
+
+   $ python -m benchmarks.codecs --repeat 20
+
+For every fixture and every codec that can be imported, we record the best
+time over `--repeat` runs to load the fixture's text, to serialize the
+loaded document, and to do both through PelicanJson (`PelicanJson.loads`
+followed by `serialize`).
+"""
+import argparse
+import json
+import os
+import time
+
+from pelecanus import PelicanJson
+from pelecanus import codecs
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'test', 'fixtures')
+
+
+def best(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(names, repeat):
+    results = []
+    for fixture in sorted(os.listdir(FIXTURES)):
+        if not fixture.endswith('.json'):
+            continue
+        with open(os.path.join(FIXTURES, fixture), 'rb') as f:
+            text = f.read()
+        doc = json.loads(text)
+        for name in names:
+            result = {'fixture': fixture,
+                      'codec': name,
+                      'bytes': len(text),
+                      'loads_s': best(lambda: codecs.loads(text, name), repeat),
+                      'dumps_s': best(lambda: codecs.dumps(doc, name), repeat)}
+            if isinstance(doc, dict):
+                result['pelican_s'] = best(
+                    lambda: PelicanJson.loads(text, codec=name).serialize(codec=name), repeat)
+            results.append(result)
+            print("{fixture:32} {codec:>10} {bytes:>8}B {loads_s:>10.6f}s {dumps_s:>10.6f}s "
+                  "{pelican:>10}".format(pelican='{:.6f}s'.format(result['pelican_s'])
+                                         if 'pelican_s' in result else '-', **result))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--codec', action='append', choices=codecs.available(),
+                        help="Codec to run (default: all available)")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help="File to write JSON results to")
+    args = parser.parse_args(argv)
+
+    print("{:32} {:>10} {:>9} {:>11} {:>11} {:>10}".format(
+        'fixture', 'codec', 'size', 'loads', 'dumps', 'pelican'))
+    results = run(args.codec or codecs.available(), args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'default': codecs.default(), 'repeat': args.repeat},
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Generators for synthetic JSON documents of different shapes.
+
+Every generator takes a `size` and returns a plain dictionary. Documents are
+built from a seeded random number generator, so the same size always gives
+the same document and results may be compared between runs.
+
+Shapes:
+
+   `wide` -- one object with `size` keys, each holding a small object
+   `deep` -- objects nested `size` levels deep, with a few scalars per level
+   `list_heavy` -- a handful of keys holding long lists of scalars and objects
+   `hal` -- a HAL-style collection document with `size` embedded items,
+   each one with its own links, attributes and tags
+
+"""
+import random
+
+
+def wide(size, seed=0):
+    rand = random.Random(seed)
+    return {'key{}'.format(n): {'href': 'http://example.com/{}'.format(n),
+                                'value': rand.randint(0, 1000),
+                                'flag': rand.random() > 0.5}
+            for n in range(size)}
+
+
+def deep(size, seed=0):
+    rand = random.Random(seed)
+    doc = {'href': 'http://example.com/leaf', 'value': 'needle'}
+    for level in range(size):
+        doc = {'level': level,
+               'weight': rand.random(),
+               'child': doc}
+    return doc
+
+
+def list_heavy(size, seed=0):
+    rand = random.Random(seed)
+    return {'ids': [rand.randint(0, 10 ** 9) for _ in range(size)],
+            'coordinates': [[rand.uniform(-180, 180), rand.uniform(-90, 90)]
+                            for _ in range(size)],
+            'readings': [{'t': n, 'value': rand.random()}
+                         for n in range(size)],
+            'labels': ['label{}'.format(n % 50) for n in range(size)]}
+
+
+def hal(size, seed=0):
+    rand = random.Random(seed)
+    base = 'http://127.0.0.1:8080/docs/'
+    items = []
+    for n in range(size):
+        guid = 'guid{}'.format(n)
+        items.append({
+            'href': base + guid,
+            'version': '1.0',
+            'links': {
+                'self': [{'href': base + guid}],
+                'profile': [{'href': 'http://127.0.0.1:8080/profiles/story'}],
+                'creator': [{'href': base + 'creator{}'.format(n % 7)}],
+                'enclosure': [{'href': base + guid + '.mp3',
+                               'type': 'audio/mpeg',
+                               'meta': {'duration': rand.randint(1, 3600)}}],
+            },
+            'attributes': {
+                'guid': guid,
+                'title': 'Story number {}'.format(n),
+                'published': '2014-08-{:02}T20:09:00+00:00'.format(n % 28 + 1),
+                'tags': ['tag{}'.format(rand.randint(0, 20))
+                         for _ in range(rand.randint(1, 5))],
+                'valid': {'from': '2014-08-27T20:09:58+00:00',
+                          'to': '3014-08-27T20:09:58+00:00'},
+            },
+        })
+    return {'href': base + '?offset=0',
+            'version': '1.0',
+            'links': {'navigation': [{'rels': ['self'], 'href': base},
+                                     {'rels': ['next'],
+                                      'href': base + '?offset=10'}],
+                      'self': [{'href': base}]},
+            'items': items}
+
+
+SHAPES = {
+    'wide': wide,
+    'deep': deep,
+    'list_heavy': list_heavy,
+    'hal': hal,
+}
+
+# Sizes used for each shape when running the suite. Deep documents stay
+# below the recursion limit: building a PelicanJson takes several stack
+# frames per level, so anything much past 200 levels fails.
+SIZES = {
+    'wide': (100, 1000, 10000),
+    'deep': (10, 50, 200),
+    'list_heavy': (100, 1000, 10000),
+    'hal': (10, 100, 1000),
+}
@@ -0,0 +1,140 @@
+"""Runs the benchmark suite and saves the results as JSON.
+
+Usage::
+
+   $ python -m benchmarks.run --output before.json
+   $ # ...make some changes...
+   $ python -m benchmarks.run --output after.json --compare before.json
+
+Every case is run against every shape and size in `generators.SIZES`
+(or just the ones asked for with `--shape`, `--size` and `--case`). For each
+one we record the best and mean wall time over `--repeat` runs and the peak
+memory allocated during a separate run, measured with `tracemalloc`.
+With `--instrument`, the counts recorded by `pelecanus.instrumentation`
+(nodes visited, paths allocated...) for one more run are saved as well.
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from pelecanus import __version__
+from pelecanus import instrumentation
+from pelecanus import toolbox
+
+from .cases import CASES
+from .generators import SHAPES
+from .generators import SIZES
+
+
+def count_nodes(doc):
+    return sum(1 for _ in toolbox.generate_paths(doc))
+
+
+def count_operations(case, doc):
+    state = case.setup(doc)
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        case.run(state)
+    finally:
+        instrumentation.disable()
+    return instrumentation.snapshot()
+
+
+def measure(case, doc, repeat):
+    timings = []
+    for _ in range(repeat):
+        state = case.setup(doc)
+        start = time.perf_counter()
+        case.run(state)
+        timings.append(time.perf_counter() - start)
+
+    state = case.setup(doc)
+    tracemalloc.start()
+    case.run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'best_s': min(timings),
+            'mean_s': sum(timings) / len(timings),
+            'repeats': repeat,
+            'peak_bytes': peak}
+
+
+def run(shapes, sizes, names, repeat, instrument=False):
+    results = []
+    for shape in shapes:
+        for size in sizes or SIZES[shape]:
+            doc = SHAPES[shape](size)
+            nodes = count_nodes(doc)
+            for case in CASES:
+                if names and case.name not in names:
+                    continue
+                result = {'case': case.name,
+                          'shape': shape,
+                          'size': size,
+                          'nodes': nodes}
+                result.update(measure(case, doc, repeat))
+                if instrument:
+                    result['operations'] = count_operations(case, doc)
+                results.append(result)
+                print("{case:40} {shape:>10} {size:>7} "
+                      "{best_s:>12.6f}s {peak_bytes:>12}B".format(**result))
+    return results
+
+
+def compare(results, baseline):
+    """Prints the ratio of new to old best times for every result that
+    appears in both runs.
+    """
+    def keyed(items):
+        return {(r['case'], r['shape'], r['size']): r for r in items}
+
+    old = keyed(baseline['results'])
+    print("\n{:40} {:>10} {:>7} {:>10} {:>10}".format(
+        'case', 'shape', 'size', 'time', 'memory'))
+    for key, new in sorted(keyed(results).items()):
+        if key not in old:
+            continue
+        time_ratio = new['best_s'] / (old[key]['best_s'] or 1e-9)
+        mem_ratio = new['peak_bytes'] / (old[key]['peak_bytes'] or 1)
+        print("{:40} {:>10} {:>7} {:>9.2f}x {:>9.2f}x".format(
+            *key, time_ratio, mem_ratio))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shape', action='append', choices=sorted(SHAPES),
+                        help="Document shape to run (default: all)")
+    parser.add_argument('--size', action='append', type=int,
+                        help="Document size to run (default: per shape)")
+    parser.add_argument('--case', action='append',
+                        help="Case to run, such as PelicanJson.enumerate")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--instrument', action='store_true',
+                        help="Also record operation counts for each case")
+    parser.add_argument('--output', help="File to write JSON results to")
+    parser.add_argument('--compare', help="Results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.shape or sorted(SHAPES), args.size,
+                  args.case, args.repeat, args.instrument)
+    report = {'meta': {'pelecanus': __version__,
+                       'python': sys.version,
+                       'platform': platform.platform(),
+                       'date': datetime.datetime.now().isoformat(),
+                       'repeat': args.repeat},
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
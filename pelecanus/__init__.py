@@ -11,5 +11,10 @@ which is a wonderful bird and which deserves to have something
 named after it and because I got tired of writing "NestedJson".
 """
 from .pelicanjson import PelicanJson  # noqa
+from .frozen import FrozenPelicanJson  # noqa
+from .interning import InternedPelicanJson  # noqa
+from .packed import PackedPelicanJson  # noqa
+from .shapes import ShapedPelicanJson  # noqa
+from .threadsafe import ThreadSafePelicanJson  # noqa
 
 __version__ = '0.5.3'
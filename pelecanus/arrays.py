@@ -0,0 +1,285 @@
+"""Compact storage for lists of numbers and for sparse lists.
+
+A list of a million floats holds a million boxed float objects as well as
+the list itself. A NumericList keeps them unboxed in an `array.array`
+instead (8 bytes each) while behaving like the list it replaces: indexing
+it, iterating through it and comparing it with lists all work as before,
+and values come back out as the same ints or floats that went in::
+
+   >>> series = pack([0.5, 1.5, 2.5, 3.5, 4.5, 5.5, 6.5, 7.5])
+   >>> series[1]
+   1.5
+   >>> series == [0.5, 1.5, 2.5, 3.5, 4.5, 5.5, 6.5, 7.5]
+   True
+   >>> series.view().format
+   'd'
+
+Only lists made entirely of ints (which fit in 64 bits) or entirely of
+floats are packed: booleans, mixed lists and anything else stay lists, so
+that no value changes type. Storing a value that doesn't fit into a packed
+list turns its storage back into a plain list.
+
+`view` returns a read-only `memoryview` over the numbers, which NumPy (or
+anything else that speaks the buffer protocol) can use without copying.
+
+A SparseList stands in for a list that is mostly None, such as the one
+`create_path(['x', 1000000], value)` makes: it keeps only the indices that
+have been set and reads as None everywhere else::
+
+   >>> sparse = SparseList({1000000: 'value'})
+   >>> len(sparse), sparse[5], sparse[-1]
+   (1000001, None, 'value')
+"""
+from array import array
+from collections.abc import MutableSequence
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+
+def _typecode(values):
+    """Returns the array typecode able to hold every one of `values`, or
+    None if there isn't one.
+    """
+    first = type(values[0]) if values else None
+    if first is float:
+        if all(type(value) is float for value in values):
+            return 'd'
+    elif first is int:
+        if all(type(value) is int for value in values):
+            if INT64_MIN <= min(values) and max(values) <= INT64_MAX:
+                return 'q'
+    return None
+
+
+def pack(values, min_length=1):
+    """Returns a NumericList holding `values`, or None if they aren't all
+    ints or all floats (or there are fewer than `min_length` of them).
+    """
+    if len(values) < min_length:
+        return None
+    typecode = _typecode(values)
+    if typecode is None:
+        return None
+    return NumericList(array(typecode, values))
+
+
+class NumericList(MutableSequence):
+    """A list of numbers kept in an `array.array`. See the module
+    documentation.
+    """
+    __slots__ = ('_items',)
+
+    def __init__(self, items):
+        self._items = items
+
+    @property
+    def packed(self):
+        return isinstance(self._items, array)
+
+    def _fits(self, values):
+        if not self.packed:
+            return False
+        return _typecode(values) == self._items.typecode
+
+    def _unpack(self):
+        if self.packed:
+            self._items = self._items.tolist()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            # Slices are ordinary lists, as they would be for a list
+            return list(self._items[index])
+        return self._items[index]
+
+    def __setitem__(self, index, value):
+        if not isinstance(index, slice):
+            if not self._fits([value]):
+                self._unpack()
+            self._items[index] = value
+            return
+        values = list(value)
+        if self._fits(values):
+            values = array(self._items.typecode, values)
+        else:
+            self._unpack()
+        self._items[index] = values
+
+    def __delitem__(self, index):
+        del self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __contains__(self, value):
+        return value in self._items
+
+    def insert(self, index, value):
+        if not self._fits([value]):
+            self._unpack()
+        self._items.insert(index, value)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, NumericList)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def tolist(self):
+        return self._items.tolist() if self.packed else list(self._items)
+
+    def copy(self):
+        return NumericList(self._items[:])
+
+    def view(self):
+        """Returns a read-only memoryview over the numbers. Raises TypeError
+        if the list no longer holds only numbers of one type. The list can't
+        change length while a view of it is still around.
+        """
+        if not self.packed:
+            raise TypeError("List holds values that can't be viewed as an array")
+        view = memoryview(self._items)
+        # memoryview.toreadonly is new in Python 3.8
+        return view.toreadonly() if hasattr(view, 'toreadonly') else view
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self._items.__sizeof__()
+
+    def __reduce__(self):
+        if self.packed:
+            return (NumericList, (self._items,))
+        return (NumericList, (list(self._items),))
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+
+class SparseList(MutableSequence):
+    """A list which stores only the indices that have been set, reading as
+    None everywhere else. `items` maps indices to values and `length` is the
+    length of the list (at least one more than the largest index).
+    """
+    __slots__ = ('_items', '_length')
+
+    def __init__(self, items=None, length=0):
+        self._items = dict(items or {})
+        self._length = max(length, max(self._items, default=-1) + 1)
+
+    def _index(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("list index out of range")
+        return index
+
+    def populated(self):
+        """Yields `(index, value)` pairs for the indices that have been set,
+        in order.
+        """
+        for index in sorted(self._items):
+            yield index, self._items[index]
+
+    def pad_to(self, length):
+        """Grows the list to `length` items without storing anything.
+        """
+        self._length = max(self._length, length)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._items.get(i) for i in range(*index.indices(self._length))]
+        return self._items.get(self._index(index))
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            values = self.tolist()
+            values[index] = value
+            self.__init__(dict(enumerate(values)), len(values))
+        else:
+            self._items[self._index(index)] = value
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            values = self.tolist()
+            del values[index]
+            self.__init__(dict(enumerate(values)), len(values))
+            return
+        index = self._index(index)
+        self._items = {i if i < index else i - 1: value
+                       for i, value in self._items.items() if i != index}
+        self._length -= 1
+
+    def insert(self, index, value):
+        if index < 0:
+            index = max(index + self._length, 0)
+        if index < self._length:
+            self._items = {i if i < index else i + 1: v for i, v in self._items.items()}
+        else:
+            index = self._length
+        self._items[index] = value
+        self._length += 1
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return _SparseIterator(self)
+
+    def __contains__(self, value):
+        if len(self._items) < self._length and value is None:
+            return True
+        return any(item == value for item in self._items.values())
+
+    def __eq__(self, other):
+        if isinstance(other, (list, NumericList, SparseList)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def tolist(self):
+        return self[:]
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self._items.__sizeof__()
+
+    def __reduce__(self):
+        return (SparseList, (self._items, self._length))
+
+    def __repr__(self):
+        return "SparseList({}, length={})".format(dict(self.populated()), self._length)
+
+
+class _SparseIterator:
+    """Iterates through a SparseList. Like list iterators, it can be moved
+    to an offset with `__setstate__`.
+    """
+    __slots__ = ('_sparse', '_values')
+
+    def __init__(self, sparse):
+        self._sparse = sparse
+        self.__setstate__(0)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._values)
+
+    def __setstate__(self, offset):
+        self._values = map(self._sparse._items.get, range(offset, self._sparse._length))
+
+
+# Everything PelicanJson treats as a list
+LIST_TYPES = (list, NumericList, SparseList)
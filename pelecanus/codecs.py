@@ -0,0 +1,194 @@
+"""The JSON libraries used to load and serialize documents.
+
+Parsing and serializing JSON is often most of the work done with a
+document, and there are faster libraries for it than the standard `json`
+module. Every library pelecanus knows about that can be imported is
+registered here as a codec. The fastest of them is used by default by
+`PelicanJson.loads` and `toolbox.loads`, while `PelicanJson.serialize` and
+`toolbox.dumps` keep to `json`, whose text the others don't match, unless
+another codec is asked for or made the default::
+
+   >>> from pelecanus import codecs
+   >>> codecs.available()
+   ['orjson', 'json']
+   >>> codecs.default(), codecs.default(dumping=True)
+   ('orjson', 'json')
+   >>> pelican.serialize(codec='orjson')
+   '{"links":{"alternate":[{"href":"somelink"}]}}'
+
+In order of preference, the codecs are `orjson`, `ujson`, `simplejson` and
+`json` (always there). Others may be added with `register`.
+
+Whatever the codec, loading a document gives back the same values (ints
+stay ints however large they are, floats round-trip exactly, strings are
+unchanged) with keys in the same order, and serializing writes text that
+loads back into the same values. The text itself differs: `orjson` leaves
+out spaces and writes non-ASCII characters as they are rather than as
+escapes. The non-JSON floats NaN and Infinity are written as `json` writes
+them, whatever the codec.
+"""
+from collections import namedtuple
+import json
+import math
+
+Codec = namedtuple('Codec', ['name', 'loads', 'dumps'])
+
+# Registered codecs, most preferred first
+CODECS = {}
+_default = None
+
+# Turns every digit into 0 and everything else into a space, so that runs
+# of digits long enough to be integers beyond 64 bits can be found with `in`
+# (which is much faster than searching with a regular expression)
+_DIGITS = bytes(b'0'[0] if byte in b'0123456789' else b' '[0] for byte in range(256))
+_LONG_NUMBER = b'0' * 19
+
+
+def register(name, loads, dumps, default=False):
+    """Registers a codec. `loads` takes JSON text (str or UTF-8 bytes) and
+    returns Python objects, and `dumps` does the reverse, returning a str.
+    With `default`, the codec becomes the default.
+    """
+    CODECS[name] = Codec(name, loads, dumps)
+    if default:
+        set_default(name)
+
+
+def available():
+    """Returns the names of the registered codecs, most preferred first.
+    """
+    return list(CODECS)
+
+
+def default(dumping=False):
+    """Returns the name of the codec used when none is asked for: the one
+    set with `set_default` if there is one, or else the preferred codec for
+    loading and `json` for `dumping`.
+    """
+    if _default is not None:
+        return _default
+    return 'json' if dumping else next(iter(CODECS))
+
+
+def set_default(name):
+    """Makes the codec called `name` the default for loading and dumping, or
+    puts the usual defaults back if `name` is None.
+    """
+    global _default
+    if name is not None:
+        get(name)
+    _default = name
+
+
+def get(name=None):
+    """Returns the codec called `name`, or the default codec.
+    """
+    name = name or default()
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError("Unknown JSON codec {!r} (available: {})".format(
+            name, ', '.join(CODECS))) from None
+
+
+def loads(data, codec=None):
+    """Parses the JSON text `data` (str or UTF-8 bytes) with `codec`.
+    """
+    return get(codec).loads(data)
+
+
+def dumps(obj, codec=None):
+    """Serializes `obj` as JSON text with `codec`.
+    """
+    return get(codec or default(dumping=True)).dumps(obj)
+
+
+def _has_long_number(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8', 'surrogatepass')
+    return _LONG_NUMBER in data.translate(_DIGITS)
+
+
+def _has_non_finite(obj):
+    """Returns True if there's a NaN or an infinite float anywhere in `obj`.
+    """
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+def _orjson():
+    import orjson
+
+    def loads(data):
+        # orjson reads integers beyond 64 bits as floats
+        if _has_long_number(data):
+            return json.loads(data)
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN and Infinity, which `json` reads, or a JSON error `json`
+            # will raise as well
+            return json.loads(data)
+
+    def dumps(obj):
+        try:
+            text = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Integers beyond 64 bits, or something `json` will refuse too
+            return json.dumps(obj)
+        # orjson writes NaN and Infinity as null, so a document with nulls in
+        # it is looked through for them
+        if b'null' in text and _has_non_finite(obj):
+            return json.dumps(obj)
+        return text.decode('utf-8')
+
+    return loads, dumps
+
+
+def _ujson():
+    import ujson
+
+    def loads(data):
+        if _has_long_number(data):
+            return json.loads(data)
+        try:
+            return ujson.loads(data)
+        except ValueError:
+            return json.loads(data)
+
+    def dumps(obj):
+        try:
+            return ujson.dumps(obj, escape_forward_slashes=False)
+        except (OverflowError, TypeError, ValueError):
+            return json.dumps(obj)
+
+    return loads, dumps
+
+
+def _simplejson():
+    import simplejson
+
+    def loads(data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode('utf-8')
+        return simplejson.loads(data)
+
+    return loads, simplejson.dumps
+
+
+for _name, _factory in (('orjson', _orjson), ('ujson', _ujson), ('simplejson', _simplejson)):
+    try:
+        register(_name, *_factory())
+    except ImportError:
+        pass
+
+register('json', json.loads, json.dumps)
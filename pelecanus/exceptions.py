@@ -8,3 +8,15 @@ class BadPath(Exception):
 
 class EmptyPath(Exception):
     pass
+
+
+class BadCursor(Exception):
+    pass
+
+
+class StaleCursor(BadCursor):
+    pass
+
+
+class StaleIndex(Exception):
+    pass
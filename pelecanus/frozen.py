@@ -0,0 +1,263 @@
+"""Persistent (immutable) versions of PelicanJson objects.
+
+A FrozenPelicanJson can't be edited in place. Instead, `set_nested_value`,
+`create_path` and `find_and_replace` return a *new* version of the object
+which shares every untouched subtree with the old one, so an update only
+copies the containers along the path being edited, not the whole document::
+
+   >>> original = FrozenPelicanJson({'links': {'self': 'a'}, 'big': {...}})
+   >>> edited = original.set_nested_value(['links', 'self'], 'b')
+   >>> original.get_nested_value(['links', 'self'])
+   'a'
+   >>> edited['big'] is original['big']
+   True
+
+This makes it cheap to keep old versions around (for rolling back
+speculative edits, for instance). Frozen objects are hashable and, since
+nothing inside them ever changes, they may be shared between threads
+without locking.
+"""
+from .arrays import LIST_TYPES
+from .pelicanjson import PelicanJson
+from .toolbox import backfill_append
+from .toolbox import new_json_from_path
+
+from .exceptions import BadPath
+
+
+class FrozenList(list):
+    """A list that can't be modified once created. FrozenPelicanJson objects
+    use these for arrays so that traversal code written for lists keeps
+    working.
+    """
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("FrozenList objects can't be modified")
+
+    __setitem__ = _immutable
+    __delitem__ = _immutable
+    __iadd__ = _immutable
+    __imul__ = _immutable
+    append = _immutable
+    extend = _immutable
+    insert = _immutable
+    pop = _immutable
+    remove = _immutable
+    clear = _immutable
+    sort = _immutable
+    reverse = _immutable
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+
+def freeze(value):
+    """Returns an immutable version of `value`. Frozen values are returned
+    as-is, which is how new versions share structure with old ones.
+    """
+    if isinstance(value, (FrozenPelicanJson, FrozenList)):
+        return value
+    elif isinstance(value, PelicanJson):
+        return FrozenPelicanJson._from_store(
+            {k: freeze(v) for k, v in value.store.items()})
+    elif isinstance(value, dict):
+        return FrozenPelicanJson._from_store(
+            {k: freeze(v) for k, v in value.items()})
+    elif isinstance(value, LIST_TYPES):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+class FrozenPelicanJson(PelicanJson):
+    """An immutable PelicanJson. All of the reading and searching methods
+    work as usual, but the editing methods return new versions::
+
+       >>> pelican = FrozenPelicanJson({'links': {'self': 'a'}})
+       >>> newer = pelican.create_path(['links', 'next'], 'b')
+       >>> 'next' in pelican
+       False
+       >>> newer.get_nested_value(['links', 'next'])
+       'b'
+
+    Because subtrees are shared between versions, a node may have more than
+    one parent: frozen objects don't keep parent links, and `path_of` falls
+    back to searching the tree.
+    """
+    _hash = None
+
+    def __init__(self, *args, **kwargs):
+        if len(args) == 1 and not kwargs and isinstance(args[0], PelicanJson):
+            data = args[0].store
+        else:
+            data = dict(*args, **kwargs)
+        self.store = {k: freeze(v) for k, v in data.items()}
+
+    @classmethod
+    def _from_store(cls, store):
+        new = cls.__new__(cls)
+        new.store = store
+        return new
+
+    def _immutable(self, *args, **kwargs):
+        errmsg = "FrozenPelicanJson objects can't be modified in place. "
+        errmsg += "Use set_nested_value or create_path to get a new version."
+        raise TypeError(errmsg)
+
+    __setitem__ = _immutable
+    __delitem__ = _immutable
+    _discard = _immutable
+    _set = _immutable
+    _rename = _immutable
+
+    def _adopt(self, child, steps):
+        pass
+
+    def _loaded(self):
+        # The objects below are frozen already: only the lists are left
+        self.store = {k: freeze(v) for k, v in self.store.items()}
+
+    # Nothing in a frozen object ever changes, so it is its own copy
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    # Pickled through __getstate__, which keeps frozen lists frozen
+    __reduce__ = object.__reduce__
+
+    def __eq__(self, other):
+        if isinstance(other, PelicanJson):
+            return self.store == other.store
+        elif isinstance(other, dict):
+            return self.convert() == other
+        return NotImplemented
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self.store.items()))
+        return self._hash
+
+    def __repr__(self):
+        return "<FrozenPelicanJson: {}>".format(str(self.store))
+
+    def _assoc(self, key, value):
+        """Returns a copy of this node with `key` set to `value`.
+        """
+        store = dict(self.store)
+        store[key] = value
+        return self._from_store(store)
+
+    def thaw(self):
+        """Returns a regular, editable PelicanJson copy of the object.
+        """
+        return PelicanJson(self.convert())
+
+    def set_nested_value(self, path, newvalue, force=False):
+        """Returns a new version of the object with `path` set to `newvalue`.
+        Path must already exist (unless `force` is passed, in which case the
+        path is created).
+
+        Only the containers along `path` are copied: the new version shares
+        everything else with this one.
+        """
+        try:
+            return _set_in(self, list(path), freeze(newvalue))
+        except (IndexError, KeyError, TypeError) as e:
+            if force:
+                return self.create_path(path, newvalue)
+            raise e
+
+    def create_path(self, path, newvalue):
+        """Returns a new version of the object with a new `path` set to
+        `newvalue`. Missing list indices are back-filled with None, as with
+        `PelicanJson.create_path`.
+        """
+        if len(path) == 0 or not isinstance(path[0], str):
+            errmsg = "New PelicanJson path must start with an acceptable key"
+            errmsg += " (it must be a string). Bad path: {}"
+            raise BadPath(errmsg.format(str(path)))
+        return _create_in(self, list(path), newvalue)
+
+    def find_and_replace(self, matchval, replaceval):
+        """Returns a new version of the object with all matched values
+        swapped for the replacement value. Subtrees without a match are
+        shared with this version.
+        """
+        return _replace_in(self, matchval, freeze(replaceval))
+
+
+def _set_in(node, path, newvalue):
+    key, *rest = path
+    if rest:
+        newvalue = _set_in(node[key], rest, newvalue)
+    if isinstance(node, FrozenPelicanJson):
+        return node._assoc(key, newvalue)
+    elif isinstance(node, list):
+        node[key]  # raises IndexError just as assignment would
+        temp_list = list(node)
+        temp_list[key] = newvalue
+        return FrozenList(temp_list)
+    errmsg = "'{}' object does not support item assignment"
+    raise TypeError(errmsg.format(type(node).__name__))
+
+
+def _create_in(node, path, newvalue):
+    key, *rest = path
+    if isinstance(node, FrozenPelicanJson):
+        if key in node.store:
+            if not rest:
+                return node._assoc(key, freeze(newvalue))
+            return node._assoc(key, _create_in(node.store[key], rest, newvalue))
+        return node._assoc(key, freeze(new_json_from_path(rest, newvalue)))
+    elif isinstance(node, list):
+        if not isinstance(key, int):
+            errmsg = "Check path. List index must be integer: {}."
+            raise IndexError(errmsg.format(key))
+        if key < len(node):
+            temp_list = list(node)
+            if rest:
+                temp_list[key] = _create_in(node[key], rest, newvalue)
+            else:
+                temp_list[key] = freeze(newvalue)
+            return FrozenList(temp_list)
+        new_object = freeze(new_json_from_path(rest, newvalue))
+        return FrozenList(backfill_append(node, key, new_object))
+    # Overwriting some random value
+    return freeze(new_json_from_path(path, newvalue))
+
+
+def _replace_in(node, matchval, replaceval):
+    """Returns `node` with every match replaced, or `node` itself if
+    nothing inside of it matched.
+    """
+    if isinstance(node, FrozenPelicanJson):
+        store = None
+        for k, v in node.store.items():
+            if v == matchval:
+                newvalue = replaceval
+            elif isinstance(v, (FrozenPelicanJson, FrozenList)):
+                newvalue = _replace_in(v, matchval, replaceval)
+            else:
+                continue
+            if newvalue is not v:
+                if store is None:
+                    store = dict(node.store)
+                store[k] = newvalue
+        return node if store is None else node._from_store(store)
+
+    temp_list = None
+    for idx, item in enumerate(node):
+        if isinstance(item, FrozenPelicanJson):
+            newvalue = _replace_in(item, matchval, replaceval)
+        elif item == matchval:
+            newvalue = replaceval
+        else:
+            continue
+        if newvalue is not item:
+            if temp_list is None:
+                temp_list = list(node)
+            temp_list[idx] = newvalue
+    return node if temp_list is None else FrozenList(temp_list)
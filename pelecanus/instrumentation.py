@@ -0,0 +1,298 @@
+"""Opt-in instrumentation for PelicanJson objects and the toolbox functions.
+
+When turned on, every PelicanJson method and toolbox function records how
+many times it was called, how many nodes it visited, how many paths it
+allocated, how many results it produced and how long it ran::
+
+   >>> from pelecanus import instrumentation
+   >>> instrumentation.enable()
+   >>> list(pelican.search_key('href'))
+   >>> instrumentation.snapshot()['PelicanJson.search_key']
+   {'calls': 1, 'nodes': 68, 'paths': 32, 'results': 11, 'seconds': 4.1e-05}
+   >>> instrumentation.disable()
+
+A callback may be passed to `enable` to export each operation as it
+finishes (to a metrics system, for instance). It is called with the name of
+the operation and a dictionary of that call's counts.
+
+Instrumentation is switched on by swapping instrumented versions of the
+methods and functions into `PelicanJson` and the `toolbox` module, so it
+costs nothing while it's off. This means toolbox functions must be called
+through the module (`toolbox.find_value(...)`) to be counted if they were
+imported by name before `enable` was called.
+
+The public methods and functions (along with a few special methods, such
+as `__init__` and `__iter__`) are all instrumented, classmethods and async
+ones included, apart from those in `EXCLUDED`.
+
+For generators, the time is the time spent producing results, not the time
+the caller spends consuming them. For coroutines and async generators it
+includes any time spent waiting on the event loop in between. Recursive
+calls of an operation count as nodes visited by the outermost call, not as
+separate calls.
+"""
+from contextvars import ContextVar
+from functools import wraps
+import inspect
+import threading
+import time
+
+from . import toolbox
+from .pelicanjson import PelicanJson
+
+COUNTERS = ('nodes', 'paths', 'results', 'seconds')
+
+# Special methods instrumented along with the public ones: the others (item
+# access, repr...) are too small and too frequent to be worth the overhead
+PELICAN_SPECIAL_METHODS = ('__init__', '__iter__', '__contains__', '__len__')
+
+# Public callables which aren't operations on a document
+EXCLUDED = (
+    'toolbox.reverse_result',  # a decorator
+)
+
+
+def _operations(namespace, module, prefix, special=()):
+    """Names of the functions (and classmethods) defined in `module` which
+    are found in `namespace` (a class's or a module's dictionary) and are
+    public or `special`, less the ones in EXCLUDED.
+    """
+    names = []
+    for name, value in namespace.items():
+        if name.startswith('_') and name not in special:
+            continue
+        func = getattr(value, '__func__', value)
+        if inspect.isfunction(func) and func.__module__ == module and prefix + name not in EXCLUDED:
+            names.append(name)
+    return tuple(names)
+
+
+PELICAN_OPERATIONS = _operations(vars(PelicanJson), PelicanJson.__module__, 'PelicanJson.',
+                                 PELICAN_SPECIAL_METHODS)
+
+TOOLBOX_OPERATIONS = _operations(vars(toolbox), toolbox.__name__, 'toolbox.')
+
+# Operations that hand a newly built path back with every result
+PATH_OPERATIONS = (
+    'PelicanJson.enumerate', 'PelicanJson.paths', 'PelicanJson.search_key',
+    'PelicanJson.search_value', 'PelicanJson.search_hits',
+    'PelicanJson.aenumerate', 'PelicanJson.asearch_key',
+    'PelicanJson.asearch_value',
+    'toolbox.find_value', 'toolbox.generate_paths',
+    'toolbox.generate_paths_to_key', 'toolbox.search_hits',
+)
+
+_lock = threading.Lock()
+# The operations running, innermost last: a context variable rather than a
+# thread local, so that tasks sharing a thread each keep their own
+_running = ContextVar('pelecanus_operations', default=())
+_originals = {}
+_totals = {}
+_callback = None
+
+
+class _Operation:
+    __slots__ = ('name', 'nodes', 'paths', 'results', 'seconds')
+
+    def __init__(self, name):
+        self.name = name
+        self.nodes = 0
+        self.paths = 0
+        self.results = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {counter: getattr(self, counter) for counter in COUNTERS}
+
+
+def _current():
+    running = _running.get()
+    return running[-1] if running else None
+
+
+def _push(op):
+    _running.set(_running.get() + (op,))
+
+
+def _pop():
+    _running.set(_running.get()[:-1])
+
+
+def _begin(name):
+    """Returns a new operation record, or None if an operation is already
+    running on this thread. A recursive call counts as a node visited.
+    """
+    current = _current()
+    if current is None:
+        return _Operation(name)
+    if current.name == name:
+        current.nodes += 1
+    return None
+
+
+def _finish(op):
+    with _lock:
+        totals = _totals.setdefault(op.name, dict.fromkeys(COUNTERS, 0))
+        totals['calls'] = totals.get('calls', 0) + 1
+        for counter in COUNTERS:
+            totals[counter] += getattr(op, counter)
+    if _callback is not None:
+        _callback(op.name, op.as_dict())
+
+
+def _traced(op, generator):
+    try:
+        while True:
+            _push(op)
+            start = time.perf_counter()
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                op.seconds += time.perf_counter() - start
+                _pop()
+            op.results += 1
+            if op.name in PATH_OPERATIONS:
+                op.paths += 1
+            yield item
+    finally:
+        _finish(op)
+
+
+async def _atraced(op, generator):
+    try:
+        while True:
+            _push(op)
+            start = time.perf_counter()
+            try:
+                item = await generator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                op.seconds += time.perf_counter() - start
+                _pop()
+            op.results += 1
+            if op.name in PATH_OPERATIONS:
+                op.paths += 1
+            yield item
+    finally:
+        _finish(op)
+
+
+def _instrument(name, func):
+    if inspect.isgeneratorfunction(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            op = _begin(name)
+            if op is None:
+                return func(*args, **kwargs)
+            return _traced(op, func(*args, **kwargs))
+    elif inspect.isasyncgenfunction(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            op = _begin(name)
+            if op is None:
+                return func(*args, **kwargs)
+            return _atraced(op, func(*args, **kwargs))
+    elif inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            op = _begin(name)
+            if op is None:
+                return await func(*args, **kwargs)
+            _push(op)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                op.seconds += time.perf_counter() - start
+                _pop()
+                _finish(op)
+    else:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            op = _begin(name)
+            if op is None:
+                return func(*args, **kwargs)
+            _push(op)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                op.seconds += time.perf_counter() - start
+                _pop()
+                _finish(op)
+    return wrapper
+
+
+def _counting_walk(walk):
+    @wraps(walk)
+    def wrapper(*args, **kwargs):
+        for slot in walk(*args, **kwargs):
+            op = _current()
+            if op is not None:
+                op.nodes += 1
+                # Walking into an object or list builds its path prefix
+                if isinstance(slot[2], (PelicanJson, dict, list)):
+                    op.paths += 1
+            yield slot
+    return wrapper
+
+
+def _swap(owner, attr, replacement):
+    # Taken from the dictionary, as getattr would bind a classmethod
+    _originals[(owner, attr)] = vars(owner)[attr]
+    setattr(owner, attr, replacement)
+
+
+def enabled():
+    return bool(_originals)
+
+
+def enable(callback=None):
+    """Turns instrumentation on. `callback`, if given, is called with the
+    name and counts of every operation as it finishes.
+    """
+    global _callback
+    _callback = callback
+    if enabled():
+        return
+    for attr in PELICAN_OPERATIONS:
+        func = PelicanJson.__dict__[attr]
+        if isinstance(func, classmethod):
+            wrapper = classmethod(_instrument('PelicanJson.' + attr, func.__func__))
+        else:
+            wrapper = _instrument('PelicanJson.' + attr, func)
+        _swap(PelicanJson, attr, wrapper)
+    _swap(PelicanJson, '_walk', _counting_walk(PelicanJson.__dict__['_walk']))
+    for attr in TOOLBOX_OPERATIONS:
+        func = getattr(toolbox, attr)
+        # The other toolbox traversals call `walk`, which counts their nodes
+        if attr == 'walk':
+            func = _counting_walk(func)
+        _swap(toolbox, attr, _instrument('toolbox.' + attr, func))
+
+
+def disable():
+    """Turns instrumentation off, putting back the original methods and
+    functions. Counts collected so far are kept until `reset` is called.
+    """
+    global _callback
+    _callback = None
+    for (owner, attr), func in _originals.items():
+        setattr(owner, attr, func)
+    _originals.clear()
+
+
+def snapshot():
+    """Returns a dictionary of the totals for each operation called since
+    the last `reset`.
+    """
+    with _lock:
+        return {name: dict(totals) for name, totals in _totals.items()}
+
+
+def reset():
+    with _lock:
+        _totals.clear()
@@ -0,0 +1,255 @@
+"""Documents that share one copy of each repeated subtree.
+
+Many documents repeat the same sub-objects over and over (the same `links`
+block on every item of a collection, the same list of tags...), and a
+PelicanJson builds a separate tree of wrappers for every copy. An
+InternedPelicanJson is built bottom-up instead, looking every object and
+list up in an InternTable as it goes: a subtree that has been seen before
+is replaced by the node already built for it, so each distinct subtree is
+held in memory once::
+
+   >>> doc = InternedPelicanJson({'a': {'links': {'self': 'x'}},
+   ...                            'b': {'links': {'self': 'x'}}})
+   >>> doc['a'] is doc['b']
+   True
+   >>> doc.interning
+   {'containers': 4, 'unique': 2, 'shared': 2, 'strings_shared': 0,
+    'bytes_saved': 1056}
+
+Shared nodes are FrozenPelicanJson objects (and FrozenLists), so they can't
+be changed in place. Edit the document through `set_nested_value`,
+`create_path` or `find_and_replace` instead: these copy every shared
+container along the path before writing to it, leaving the other places
+that shared it untouched. Only the copied containers become private; their
+contents stay shared.
+
+Building a document this way takes longer, and the table costs memory
+while it's being built, so it only pays off when subtrees really repeat.
+Values that compare equal but have different types (`1` and `True`, say)
+are never merged. To share subtrees between documents, build them with the
+same table through `InternedPelicanJson.with_table`.
+"""
+import sys
+
+from .arrays import LIST_TYPES
+from .frozen import FrozenList
+from .frozen import FrozenPelicanJson
+from .pelicanjson import PelicanJson
+from .pelicanjson import _select_paths
+from .toolbox import _path_trie
+
+
+class InternTable:
+    """Hands out one frozen node for each distinct subtree (and one string
+    for each distinct string) and keeps count of what was shared.
+    """
+    def __init__(self):
+        self._nodes = {}
+        self._strings = {}
+        self.containers = 0
+        self.shared = 0
+        self.strings_shared = 0
+        self.bytes_saved = 0
+
+    def intern(self, value):
+        """Returns the shared version of `value`.
+        """
+        if isinstance(value, PelicanJson):
+            value = value.store
+        if isinstance(value, dict):
+            store = {self.intern(k): self.intern(v) for k, v in value.items()}
+            identity = [dict]
+            for k, v in store.items():
+                identity.extend(self._token(k) + self._token(v))
+            return self._lookup(tuple(identity), FrozenPelicanJson._from_store, store)
+        elif isinstance(value, LIST_TYPES):
+            items = [self.intern(item) for item in value]
+            identity = [list]
+            for item in items:
+                identity.extend(self._token(item))
+            return self._lookup(tuple(identity), FrozenList, items)
+        elif type(value) is str:
+            shared = self._strings.setdefault(value, value)
+            if shared is not value:
+                self.strings_shared += 1
+                self.bytes_saved += sys.getsizeof(value)
+            return shared
+        return value
+
+    @staticmethod
+    def _token(value):
+        # Containers are already shared, so they're told apart by identity.
+        # Scalars carry their type so that 1, 1.0 and True stay distinct.
+        if isinstance(value, (FrozenPelicanJson, FrozenList)):
+            return (None, id(value))
+        elif type(value) is float:
+            # 0.0 and -0.0 are equal, as is a NaN to nothing at all: the
+            # text of a float tells them apart, and stays the same for NaN
+            return (float, repr(value))
+        return (type(value), value)
+
+    def _lookup(self, identity, build, contents):
+        self.containers += 1
+        node = self._nodes.get(identity)
+        if node is None:
+            node = self._nodes[identity] = build(contents)
+        else:
+            self.shared += 1
+            self.bytes_saved += _footprint(node)
+        return node
+
+    def stats(self):
+        return {'containers': self.containers,
+                'unique': len(self._nodes),
+                'shared': self.shared,
+                'strings_shared': self.strings_shared,
+                'bytes_saved': self.bytes_saved}
+
+
+def _footprint(node):
+    """The memory a separate copy of `node` (not counting its contents)
+    would have used.
+    """
+    if isinstance(node, PelicanJson):
+        size = sys.getsizeof(node) + sys.getsizeof(node.store)
+        attributes = getattr(node, '__dict__', None)
+        if attributes is not None:
+            size += sys.getsizeof(attributes)
+        return size
+    return sys.getsizeof(node)
+
+
+class InternedPelicanJson(PelicanJson):
+    """A PelicanJson object whose repeated subtrees are built once and
+    shared. See the module documentation.
+    """
+    def __init__(self, *args, **kwargs):
+        if len(args) == 1 and not kwargs and isinstance(args[0], PelicanJson):
+            data = args[0]
+        else:
+            data = dict(*args, **kwargs)
+        self._build(data, InternTable())
+
+    @classmethod
+    def with_table(cls, data, table):
+        """Builds a document from `data`, sharing subtrees with every other
+        document built with the same `table`.
+        """
+        new = cls.__new__(cls)
+        new._build(data, table)
+        return new
+
+    def _build(self, data, table):
+        if isinstance(data, PelicanJson):
+            data = data.store
+        self.store = {table.intern(k): table.intern(v) for k, v in data.items()}
+        self.interning = table.stats()
+
+    @classmethod
+    async def aload(cls, stream, budget=None, codec=None):
+        """Reads the document as `PelicanJson.aload` does, then interns it
+        all at once, as nodes can only be shared once they're finished.
+        """
+        return cls(await PelicanJson.aload(stream, budget=budget, codec=codec))
+
+    # Copied and pickled through __getstate__, which keeps shared nodes shared
+    __reduce__ = object.__reduce__
+    __copy__ = __deepcopy__ = None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        # A shallow copy gets a store of its own, so that copying a shared
+        # node into it on a write doesn't change the original
+        state['store'] = dict(self.store)
+        # Only the root keeps the stats
+        if 'interning' in self.__dict__:
+            state['interning'] = dict(self.interning)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if 'interning' in state:
+            self.interning = state['interning']
+
+    def _adopt(self, child, steps):
+        # A shared node may have any number of parents, so it keeps none
+        if not isinstance(child, FrozenPelicanJson):
+            super()._adopt(child, steps)
+
+    def _private(self, node):
+        """Returns an editable copy of the shared `node`, holding the same
+        (still shared) contents.
+        """
+        if isinstance(node, FrozenPelicanJson):
+            new = type(self).__new__(type(self))
+            new.store = dict(node.store)
+            return new
+        return list(node)
+
+    def _unshare(self, path):
+        """Replaces every shared container along `path` (as far as it
+        exists) with a private copy, so that writing to it doesn't change
+        the other places it appears.
+        """
+        node, owner, steps = self, self, ()
+        for step in path:
+            try:
+                child = node[step]
+            except (IndexError, KeyError, TypeError):
+                return
+            if isinstance(node, PelicanJson):
+                owner, steps = node, (step,)
+            else:
+                steps += (step,)
+            if isinstance(child, (FrozenPelicanJson, FrozenList)):
+                child = self._private(child)
+                if isinstance(node, PelicanJson):
+                    node.store[step] = child
+                else:
+                    node[step] = child
+                if isinstance(child, PelicanJson):
+                    owner._adopt(child, steps)
+            node = child
+
+    def set_nested_value(self, path, newvalue, force=False):
+        """Sets a nested_value to a new value using the path provided,
+        copying any shared containers along the way first.
+        """
+        self._unshare(path[:-1])
+        super().set_nested_value(path, newvalue, force=force)
+
+    def create_path(self, path, newvalue):
+        """Creates a new `path` set to `newvalue`, copying any shared
+        containers along the part of it that exists first.
+        """
+        self._unshare(path)
+        return super().create_path(path, newvalue)
+
+    def _writable(self, steps):
+        self._unshare(steps)
+        return super()._writable(steps)
+
+    def _prune(self, select, state, found=None):
+        # The paths to everything to be removed are found first, so that
+        # the shared containers holding them can be copied beforehand
+        if found is not None:
+            return super()._prune(select, state, found)
+        found = []
+        super()._prune(select, state, found)
+        if not found:
+            return 0
+        for path in found:
+            self._unshare(path[:-1])
+        return super()._prune(_select_paths, [_path_trie(found)])
+
+    def rename_key(self, old, new, everywhere=False, overwrite=False):
+        """Renames `old` keys to `new`, as `PelicanJson.rename_key` does,
+        copying the shared objects holding them first.
+        """
+        if everywhere:
+            for path in list(self.search_key(old)):
+                self._unshare(path[:-1])
+        return super().rename_key(old, new, everywhere=everywhere, overwrite=overwrite)
+
+    def __repr__(self):
+        return "<InternedPelicanJson: {}>".format(str(self.store))
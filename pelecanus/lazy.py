@@ -0,0 +1,304 @@
+"""PelicanJson objects that parse their JSON text only where it's visited.
+
+A service which changes a field or two in a large document and passes the
+rest along pays for parsing every byte of it into Python objects, and then
+for serializing all of them again. `PelicanJson.loads_lazy` instead keeps
+the text, and only notes where each member of an object starts and ends::
+
+   >>> pelican = PelicanJson.loads_lazy(text)
+   >>> pelican.set_nested_value(['query', 'pages', '1422396', 'title'], 'Ed')
+   >>> forwarded = pelican.serialize()
+
+Only the objects and lists that `get_nested_value`, `set_nested_value` or a
+traversal such as `enumerate` enters are parsed, each the first time it's
+entered. `serialize` copies the text of everything that was never parsed
+(or was parsed but never changed) straight to its output, so untouched
+parts of the document keep their original formatting. The result is the
+same JSON document `serialize` would otherwise give, though not always the
+same text.
+
+Loading scans the text once, for brackets and strings only, and notes
+where every object and list ends without building any values. Entering an
+object then only steps over its own members to find their spans, so each
+part of the text is parsed at most once, when it's first reached. Errors in
+parts of the text that are never parsed aren't noticed.
+"""
+from collections.abc import MutableMapping
+import json
+import re
+import weakref
+
+from .arrays import LIST_TYPES
+from .pelicanjson import PelicanJson
+
+_whitespace = re.compile(r'[ \t\n\r]*').match
+# Matches everything up to and including the next bracket outside of a
+# string (written so that it can't backtrack), capturing it if it opens
+_next_bracket = re.compile(r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*(?:([\[{])|[\]}])',
+                           re.DOTALL)
+_string = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL).match
+_scalar = re.compile(r'[^ \t\n\r\[\]{},:"]+').match
+# The json module's own scanner (its C version, where it has been built)
+_scan_once = json.JSONDecoder().scan_once
+
+
+def _scan(text, pos):
+    """Returns the value starting at `pos` in `text` and the offset just past
+    it.
+    """
+    try:
+        return _scan_once(text, pos)
+    except StopIteration:
+        raise json.JSONDecodeError("Expecting value", text, pos) from None
+
+
+def _container_ends(text, pos):
+    """Scans the JSON object or list starting at `pos` in `text` for brackets
+    (outside of strings), without parsing anything, and returns a dictionary
+    mapping the offset of every object and list in it to the offset just
+    past its end.
+    """
+    ends = {}
+    openers = []
+    for match in _next_bracket.finditer(text, pos):
+        if match.start() != pos:
+            break
+        pos = match.end()
+        if match.lastindex:
+            openers.append(pos - 1)
+            continue
+        start = openers.pop()
+        if text[start] + text[pos - 1] not in ('{}', '[]'):
+            raise json.JSONDecodeError("Mismatched bracket", text, pos - 1)
+        ends[start] = pos
+        if not openers:
+            return ends
+    raise json.JSONDecodeError("Unterminated object, list or string", text, pos)
+
+
+def _value_end(text, pos, ends):
+    """Returns the offset just past the JSON value starting at `pos` in
+    `text`, looking up where objects and lists end in `ends`.
+    """
+    char = text[pos:pos + 1]
+    if char in ('{', '['):
+        return ends[pos]
+    match = _string(text, pos) if char == '"' else _scalar(text, pos)
+    if match is None:
+        raise json.JSONDecodeError("Expecting value", text, pos)
+    return match.end()
+
+
+def _members(text, pos, ends):
+    """Returns the spans of the members of the JSON object or list starting
+    at `pos` in `text`, as a dictionary of `key: (start, end)` (keys are
+    indices for lists). Nested objects and lists are stepped over using
+    `ends`, from `_container_ends`.
+    """
+    close = '}' if text[pos] == '{' else ']'
+    spans = {}
+    pos = _whitespace(text, pos + 1).end()
+    if text[pos:pos + 1] == close:
+        return spans
+    index = 0
+    while True:
+        key = index
+        if close == '}':
+            if text[pos:pos + 1] != '"':
+                raise json.JSONDecodeError("Expecting property name", text, pos)
+            key, pos = _scan(text, pos)
+            pos = _whitespace(text, pos).end()
+            if text[pos:pos + 1] != ':':
+                raise json.JSONDecodeError("Expecting ':' delimiter", text, pos)
+            pos = _whitespace(text, pos + 1).end()
+        end = _value_end(text, pos, ends)
+        spans[key] = (pos, end)
+        pos = _whitespace(text, end).end()
+        if text[pos:pos + 1] == close:
+            return spans
+        if text[pos:pos + 1] != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+        pos = _whitespace(text, pos + 1).end()
+        index += 1
+
+
+class RawStore(MutableMapping):
+    """The store of a PelicanJson object loaded with `loads_lazy`. It holds
+    the JSON text of the object, and the first lookup steps over its members
+    to find their spans. Values are parsed when they are asked for; nested objects
+    and lists are parsed once and kept. The first change copies the whole
+    object into a dictionary, which is used from then on.
+    """
+    __slots__ = ('_text', '_start', '_end', '_ends', '_spans', '_owner', '_decoded', '_dict')
+
+    def __init__(self, text, start, ends, owner):
+        self._text = text
+        self._start = start
+        self._end = ends[start]
+        # Where each object and list in the whole document ends
+        self._ends = ends
+        self._spans = None
+        self._owner = weakref.ref(owner)
+        self._decoded = {}
+        self._dict = None
+
+    def _members(self):
+        if self._spans is None:
+            self._spans = _members(self._text, self._start, self._ends)
+        return self._spans
+
+    def _value(self, key):
+        if key in self._decoded:
+            return self._decoded[key]
+        start, end = self._members()[key]
+        if self._text[start] in '{[':
+            value = self._decoded[key] = self._container(start, end, (key,))
+            return value
+        return _scan(self._text, start)[0]
+
+    def _container(self, start, end, steps):
+        owner = self._owner()
+        text = self._text
+        if text[start] == '{':
+            node = type(owner).__new__(type(owner))
+            node.store = RawStore(text, start, self._ends, node)
+            owner._adopt(node, steps)
+            return node
+        if text.find('{', start, end) == -1:
+            # Nothing in the list will become a PelicanJson
+            return _scan(text, start)[0]
+        items = []
+        for index, (item_start, item_end) in _members(text, start, self._ends).items():
+            if text[item_start] in '{[':
+                items.append(self._container(item_start, item_end, steps + (index,)))
+            else:
+                items.append(_scan(text, item_start)[0])
+        return items
+
+    def _copy_out(self):
+        if self._dict is None:
+            self._dict = {key: self._value(key) for key in self._members()}
+            self._decoded = None
+        return self._dict
+
+    def __getitem__(self, key):
+        if self._dict is not None:
+            return self._dict[key]
+        return self._value(key)
+
+    def __setitem__(self, key, value):
+        self._copy_out()[key] = value
+
+    def __delitem__(self, key):
+        del self._copy_out()[key]
+
+    def __contains__(self, key):
+        if self._dict is not None:
+            return key in self._dict
+        return key in self._members()
+
+    def __iter__(self):
+        if self._dict is not None:
+            return iter(self._dict)
+        return iter(self._members())
+
+    def __len__(self):
+        return len(self._members()) if self._dict is None else len(self._dict)
+
+    def items(self):
+        if self._dict is not None:
+            return self._dict.items()
+        return ((key, self._value(key)) for key in self._members())
+
+    def values(self):
+        return (value for _, value in self.items())
+
+    def _write(self, out):
+        if self._dict is not None:
+            _write_items(self._dict.items(), out)
+        elif not self._decoded:
+            # Nothing in the object has been parsed, so nothing has changed
+            out.append(self._text[self._start:self._end])
+        else:
+            out.append('{')
+            for position, (key, (start, end)) in enumerate(self._members().items()):
+                if position:
+                    out.append(', ')
+                out.append(json.dumps(key))
+                out.append(': ')
+                if key in self._decoded:
+                    _write(self._decoded[key], out)
+                else:
+                    out.append(self._text[start:end])
+            out.append('}')
+
+    def __reduce__(self):
+        # Copies of a lazily loaded object are ordinary dictionaries
+        return (dict, (list(self.items()),))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+def _key_text(key):
+    if isinstance(key, str):
+        return json.dumps(key)
+    # Other keys are turned into strings the way `json.dumps` does it
+    return json.dumps({key: None})[1:-len(': null}')]
+
+
+def _write_items(items, out):
+    out.append('{')
+    for position, (key, value) in enumerate(items):
+        if position:
+            out.append(', ')
+        out.append(_key_text(key))
+        out.append(': ')
+        _write(value, out)
+    out.append('}')
+
+
+def _write(value, out):
+    """Appends the JSON text of `value` to the list `out`, copying the text
+    of anything still held unparsed by a RawStore.
+    """
+    if isinstance(value, PelicanJson):
+        if isinstance(value.store, RawStore):
+            value.store._write(out)
+        else:
+            _write_items(value.store.items(), out)
+    elif isinstance(value, LIST_TYPES):
+        out.append('[')
+        for position, item in enumerate(value):
+            if position:
+                out.append(', ')
+            _write(item, out)
+        out.append(']')
+    else:
+        out.append(json.dumps(value))
+
+
+def serialize(pelican):
+    """Returns the JSON text of `pelican`, copying the text of the parts of
+    it that were never parsed.
+    """
+    out = []
+    _write(pelican, out)
+    return ''.join(out)
+
+
+def loads(cls, data):
+    """Returns a `cls` object holding the JSON object in `data` (str, or
+    UTF-8 bytes), which is parsed as it's visited.
+    """
+    text = data.decode('utf-8') if isinstance(data, (bytes, bytearray)) else data
+    start = _whitespace(text).end()
+    if text[start:start + 1] != '{':
+        raise json.JSONDecodeError("Expecting an object", text, start)
+    ends = _container_ends(text, start)
+    end = ends[start]
+    if _whitespace(text, end).end() != len(text):
+        raise json.JSONDecodeError("Extra data", text, end)
+    pelican = cls.__new__(cls)
+    pelican.store = RawStore(text, start, ends, pelican)
+    return pelican
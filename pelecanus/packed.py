@@ -0,0 +1,56 @@
+"""PelicanJson objects that keep their lists of numbers packed.
+
+Documents made mostly of long numeric arrays (time series, coordinates,
+IDs...) spend most of their memory on boxed ints and floats. A
+PackedPelicanJson stores each list of numbers it holds as a NumericList
+(see `pelecanus.arrays`), backed by an `array.array`, which cuts that
+several-fold::
+
+   >>> telemetry = PackedPelicanJson({'readings': [0.5, 1.5, 2.5, ...]})
+   >>> telemetry.get_nested_value(['readings', 1])
+   1.5
+   >>> telemetry.get_nested_array(['readings']).tolist()
+   [0.5, 1.5, 2.5, ...]
+
+`get_nested_value`, `enumerate`, `convert` and the searches see exactly
+the same values as they would in a PelicanJson. Lists shorter than
+`min_length` aren't worth packing and are left alone, as are lists nested
+inside other lists, which PelicanJson treats as single values.
+"""
+from .arrays import NumericList
+from .arrays import pack
+from .pelicanjson import PelicanJson
+
+
+class PackedPelicanJson(PelicanJson):
+    """A PelicanJson object which packs the lists of numbers it holds. See
+    the module documentation.
+    """
+    min_length = 8
+
+    def _set(self, key, value):
+        if type(value) is list:
+            packed = pack(value, self.min_length)
+            if packed is not None:
+                self.store[key] = packed
+                return
+        super()._set(key, value)
+
+    def _loaded(self):
+        for key, value in self.store.items():
+            if type(value) is list:
+                packed = pack(value, self.min_length)
+                if packed is not None:
+                    self.store[key] = packed
+
+    def get_nested_array(self, path):
+        """Returns a read-only memoryview over the packed list of numbers
+        at the end of `path`. Raises TypeError if there isn't one.
+        """
+        value = self.get_nested_value(path)
+        if not isinstance(value, NumericList):
+            raise TypeError("Not a packed list of numbers: {}".format(path))
+        return value.view()
+
+    def __repr__(self):
+        return "<PackedPelicanJson: {}>".format(str(self.store))
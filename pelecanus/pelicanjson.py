@@ -13,21 +13,40 @@ than Python's recursion limit (default: 1000 stack frames) will work.
 In addition, a JSON object that is a top-level array won't work, but I don't
 actually think that's allowed, per JSON spec.
 """
+import asyncio
+import base64
+from bisect import bisect_left
 import copy
+from itertools import islice
 import json
 import sys
+import weakref
 
 if sys.version_info.major == 3 and sys.version_info.minor >= 10:
     from collections.abc import MutableMapping
-    from collections import deque
+    from collections import Counter, deque
 else:
-    from collections import MutableMapping, deque
+    from collections import Counter, MutableMapping, deque
 
+from . import codecs
+from .arrays import LIST_TYPES
+from .arrays import NumericList
+from .arrays import SparseList
+from .toolbox import ANY
+from .toolbox import _branches
+from .toolbox import _collect_hits
+from .toolbox import _path_trie
+from .toolbox import _project
 from .toolbox import backfill_append
-from .toolbox import new_json_from_path
 
+from .exceptions import BadCursor
 from .exceptions import BadPath
 from .exceptions import EmptyPath
+from .exceptions import StaleCursor
+
+
+# Stands for an argument which wasn't given, where None is a value
+_NOTHING = object()
 
 
 class PelicanJson(MutableMapping):
@@ -82,42 +101,370 @@ class PelicanJson(MutableMapping):
 
     You can also `searchkey` and `searchvalue` in order to find all the paths
     that leads to keys or values you are searching for.
+
+    Every nested PelicanJson keeps a weak reference back to the object that
+    holds it, so a subtree can find its `parent` and the root can find the
+    path to any of its nodes with `path_of` without searching. The links
+    are always kept, rather than on request, because changes find the root
+    through them to mark the document as changed (which is how cursors know
+    they've gone stale), and moving or renaming relinks a subtree instead of
+    copying it. They cost a weak reference and a short tuple per object::
+
+       >>> link = pelican.get_nested_value(['links', 'alternate', 0])
+       >>> link.parent is pelican['links']
+       True
+       >>> pelican.path_of(link)
+       ['links', 'alternate', 0]
     """
+    # Number of nodes the async methods visit before yielding to the loop
+    ASYNC_BUDGET = 1000
+
+    # Lists that `create_path` would have to pad with more Nones than this,
+    # to reach the index being created, become SparseLists instead
+    SPARSE_GAP = 1000
+
+    # Name of the JSON codec (see `pelecanus.codecs`) that `loads` and
+    # `serialize` use, None meaning the default one
+    codec = None
+
+    # Weak reference to the PelicanJson holding this one and the steps
+    # (a key, followed by any list indices) leading from it to this node.
+    _parent = None
+    _key = ()
+
+    # Bumped on the root whenever the document is changed through any of
+    # its PelicanJson objects, so that cursors can tell it has changed.
+    _generation = 0
+
     def __init__(self, *args, **kwargs):
         self.store = dict()
-        self.update(dict(*args, **kwargs))
-        for key, value in self.store.items():
-            # __setitem__ does the heavy-lifting here
-            self.store[key] = value
+        # A new object has nothing to invalidate, so this skips __setitem__
+        for key, value in dict(*args, **kwargs).items():
+            self._set(key, value)
 
     def __getitem__(self, key):
         return self.store[key]
 
     def __setitem__(self, key, value):
+        self._set(key, value)
+        self._touch()
+
+    def _set(self, key, value):
         if isinstance(value, dict):
-            self.store[key] = PelicanJson(value)
+            value = type(self)(value)
         elif isinstance(value, list):
-            self.store[key] = self._update_from_list(value)
-        else:
-            self.store[key] = value
+            value = self._update_from_list(value, key=(key,))
+        elif isinstance(value, SparseList):
+            value = self._update_from_sparse(value, key=(key,))
+        if isinstance(value, PelicanJson):
+            self._adopt(value, (key,))
+        self.store[key] = value
 
     def __delitem__(self, key):
         del self.store[key]
+        self._touch()
+
+    def _discard(self, key):
+        """Removes `key` without marking the document as changed, for
+        methods that remove many members and do that once at the end.
+        """
+        del self.store[key]
+
+    def _relink(self, key, value):
+        """Links `value`, which has just been put under `key`, back to this
+        object.
+        """
+        if isinstance(value, PelicanJson):
+            self._adopt(value, (key,))
+        elif isinstance(value, LIST_TYPES):
+            self._adopt_list(value, (key,))
+
+    def _rename(self, old, new):
+        """Renames the key `old` to `new`, keeping its place among the keys
+        (and replacing any value already under `new`).
+        """
+        store = self.store
+        value = store[old]
+        if isinstance(store, dict):
+            self.store = {new if key == old else key: item
+                          for key, item in store.items() if key != new}
+        else:
+            # Other stores only add keys at the end, so the keys after `old`
+            # are taken out and put back after `new`
+            if new in store:
+                del store[new]
+            keys = list(store)
+            keys = keys[keys.index(old):]
+            tail = [(key, store[key]) for key in keys[1:]]
+            for key in keys:
+                del store[key]
+            store[new] = value
+            for key, item in tail:
+                store[key] = item
+        self._relink(new, value)
+
+    def _writable(self, steps):
+        """Returns the container at the end of `steps` from self.store, to
+        be changed in place.
+        """
+        node = self.store
+        for step in steps:
+            node = node[step]
+        return node
+
+    def __getstate__(self):
+        # Parent links are weak references, which can't be pickled: they
+        # get rebuilt from the store instead.
+        return {'store': self.store}
+
+    def __setstate__(self, state):
+        self.store = state['store']
+        for key, value in self.store.items():
+            if isinstance(value, PelicanJson):
+                self._adopt(value, (key,))
+            elif isinstance(value, list):
+                self._adopt_list(value, (key,))
+
+    # Copies and pickles are made from a flat encoding of the document (see
+    # `_flatten`), which is built and read back without recursing, so they
+    # work however deep the document is and every wrapper is made in one
+    # pass. Nodes know their parents, so even a shallow copy gets its own
+    # wrappers: it shares only the values at the leaves with the original.
+    def __reduce__(self):
+        return (_unflatten, (type(self),) + _flatten(self))
+
+    def __copy__(self):
+        kinds, counts, items = _flatten(self)
+        items = [item.copy() if isinstance(item, NumericList) else item for item in items]
+        return _unflatten(type(self), kinds, counts, items)
+
+    def __deepcopy__(self, memo):
+        kinds, counts, items = _flatten(self)
+        items = [item if type(item) in _ATOMIC else copy.deepcopy(item, memo) for item in items]
+        result = memo[id(self)] = _unflatten(type(self), kinds, counts, items)
+        return result
+
+    def _adopt(self, child, steps):
+        """Points `child` back at this object, `steps` being the key (and
+        any list indices) that lead from self.store to the child.
+        """
+        child._parent = weakref.ref(self)
+        child._key = steps
+
+    def _adopt_list(self, somelist, steps, start=0):
+        if isinstance(somelist, SparseList):
+            items = (pair for pair in somelist.populated() if pair[0] >= start)
+        else:
+            items = enumerate(islice(somelist, start, None), start)
+        for idx, item in items:
+            if isinstance(item, PelicanJson):
+                self._adopt(item, steps + (idx,))
+            elif isinstance(item, list):
+                self._adopt_list(item, steps + (idx,))
 
-    def _update_from_list(self, somelist):
+    def _update_from_list(self, somelist, key=None):
         """Used to parse list objects for nested dictionaries and turn
         those internal dictionaries into PelicanJson objects.
+
+        kwargs:
+           `key` (tuple): steps leading from self.store to the list. If
+           given, the nested PelicanJson objects get linked back to self.
         """
         temp_list = []
-        for item in somelist:
+        for idx, item in enumerate(somelist):
+            steps = None if key is None else key + (idx,)
             if isinstance(item, dict):
-                temp_list.append(PelicanJson(item))
+                item = type(self)(item)
             elif isinstance(item, list):
-                temp_list.append(self._update_from_list(item))
-            else:
-                temp_list.append(item)
+                item = self._update_from_list(item, key=steps)
+            if isinstance(item, PelicanJson) and steps is not None:
+                self._adopt(item, steps)
+            temp_list.append(item)
         return temp_list
 
+    def _update_from_sparse(self, sparse, key):
+        """Like `_update_from_list`, for a SparseList: only the indices that
+        have been set are visited.
+        """
+        temp_list = SparseList(length=len(sparse))
+        for idx, item in sparse.populated():
+            steps = key + (idx,)
+            if isinstance(item, dict):
+                item = type(self)(item)
+            elif isinstance(item, list):
+                item = self._update_from_list(item, key=steps)
+            if isinstance(item, PelicanJson):
+                self._adopt(item, steps)
+            temp_list[idx] = item
+        return temp_list
+
+    def _touch(self):
+        node = self
+        while node._parent is not None:
+            parent = node._parent()
+            if parent is None:
+                break
+            node = parent
+        node._generation += 1
+
+    @property
+    def parent(self):
+        """The PelicanJson object that holds this one, or None for a root
+        (or for a node whose parent has been garbage-collected).
+        """
+        if self._parent is None:
+            return None
+        return self._parent()
+
+    @property
+    def root(self):
+        """The top-most PelicanJson object reachable through parent links.
+        """
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    def _holds(self, child):
+        """Returns True if `child` actually lives where its link says.
+        """
+        data = self.store
+        try:
+            for step in child._key:
+                data = data[step]
+        except (IndexError, KeyError, TypeError):
+            return False
+        return data is child
+
+    def path_of(self, node):
+        """Returns the path from this object to `node`, a PelicanJson
+        nested somewhere inside it. The path is found by following parent
+        links upward, so it costs O(depth) rather than a search of the tree.
+
+        If a link has gone stale (a list edited in place, for instance), this
+        falls back to searching the tree. Raises ValueError if `node` is not
+        inside this object.
+        """
+        steps = deque()
+        current = node
+        while current is not self:
+            parent = current.parent
+            if parent is None or not parent._holds(current):
+                return self._search_node(node)
+            steps.extendleft(reversed(current._key))
+            current = parent
+        return list(steps)
+
+    def _search_node(self, node):
+        # Unlike `_walk`, this goes into lists nested in lists as well
+        stack = [((), iter(self.store.items()))]
+        while stack:
+            prefix, slots = stack[-1]
+            for key, value in slots:
+                if value is node:
+                    return list(prefix + (key,))
+                if isinstance(value, PelicanJson):
+                    stack.append((prefix + (key,), iter(value.store.items())))
+                    break
+                elif isinstance(value, LIST_TYPES):
+                    stack.append((prefix + (key,), enumerate(value)))
+                    break
+            else:
+                stack.pop()
+        errmsg = "Object is not nested inside this PelicanJson: {}"
+        raise ValueError(errmsg.format(repr(node)))
+
+    def _walk(self, path=None, order='dfs', max_depth=None, resume=None):
+        """Iterates through every slot in the tree, depth-first and in the
+        same order as `enumerate`, yielding `(prefix, key, value, container)`
+        tuples. `container` is the PelicanJson or list holding `value` and
+        `prefix` is the path to the container as a tuple (starting with
+        `path`, if passed in), so `prefix + (key,)` is the path to `value`.
+
+        The prefix is built once for each container and shared by all of
+        its slots: a path is only copied for the values that callers want.
+
+        Nested lists are treated as values: only lists held directly by a
+        PelicanJson are walked into.
+
+        With `order='bfs'` the tree is walked breadth-first instead, so every
+        slot is visited before any slot nested more deeply. `max_depth`
+        limits the length of the paths visited (not counting `path`).
+
+        `resume` is a list of `(key, offset)` pairs leading to a slot, as
+        saved in a cursor: a depth-first walk then starts just after it.
+        """
+        prefix = tuple(path or ())
+        # Containers are only walked into if their prefix is shorter
+        limit = None if max_depth is None else len(prefix) + max_depth - 1
+        if order == 'bfs' and resume is None:
+            yield from self._walk_bfs(prefix, limit)
+            return
+        elif order != 'dfs':
+            raise ValueError("order must be 'dfs' or 'bfs' (only 'dfs' "
+                             "may be resumed): {}".format(order))
+
+        if resume is None:
+            stack = [(prefix, self, iter(self.store.items()))]
+        else:
+            stack = self._resume_stack(prefix, resume)
+        while stack:
+            prefix, container, slots = stack[-1]
+            for key, value in slots:
+                yield prefix, key, value, container
+                if isinstance(value, PelicanJson):
+                    if limit is None or len(prefix) < limit:
+                        stack.append((prefix + (key,), value,
+                                      iter(value.store.items())))
+                        break
+                elif isinstance(value, LIST_TYPES) and isinstance(container, PelicanJson):
+                    if limit is None or len(prefix) < limit:
+                        stack.append((prefix + (key,), value, enumerate(value)))
+                        break
+            else:
+                stack.pop()
+
+    def _resume_stack(self, prefix, positions):
+        """Rebuilds the stack `_walk` had after visiting the slot found by
+        following `positions`. Lists are resumed directly at an offset;
+        objects are skipped through up to their offset.
+        """
+        stack = []
+        container = self
+        for key, offset in positions:
+            if isinstance(container, PelicanJson):
+                slots = islice(iter(container.store.items()), offset, None)
+                slot = next(slots, None)
+            elif isinstance(container, LIST_TYPES) and stack and isinstance(stack[-1][1], PelicanJson):
+                slots = iter(container)
+                slots.__setstate__(offset)
+                slots = enumerate(slots, offset)
+                slot = next(slots, None)
+            else:
+                slot = None
+            if slot is None or slot[0] != key:
+                raise BadCursor("Cursor doesn't match the document: {}".format(key))
+            stack.append((prefix, container, slots))
+            prefix = prefix + (key,)
+            container = slot[1]
+        if not stack:
+            raise BadCursor("Cursor holds no position")
+        return stack
+
+    def _walk_bfs(self, prefix, limit):
+        queue = deque([(prefix, self, self.store.items())])
+        while queue:
+            prefix, container, slots = queue.popleft()
+            walk_into = limit is None or len(prefix) < limit
+            for key, value in slots:
+                yield prefix, key, value, container
+                if not walk_into:
+                    continue
+                if isinstance(value, PelicanJson):
+                    queue.append((prefix + (key,), value, value.store.items()))
+                elif isinstance(value, LIST_TYPES) and isinstance(container, PelicanJson):
+                    queue.append((prefix + (key,), value, enumerate(value)))
+
     def __len__(self):
         """Counts all keys and subkeys nested in the object.
         """
@@ -134,14 +481,9 @@ class PelicanJson(MutableMapping):
     def __iter__(self):
         """Iterates through the entire tree and yields all nested keys.
         """
-        for k, v in self.store.items():
-            yield k
-            if isinstance(v, PelicanJson):
-                yield from iter(v)
-            elif isinstance(v, list):
-                for item in v:
-                    if isinstance(item, PelicanJson):
-                        yield from iter(item)
+        for _, key, _, container in self._walk():
+            if isinstance(container, PelicanJson):
+                yield key
 
     def __repr__(self):
         return "<PelicanJson: {}>".format(str(self.store))
@@ -152,42 +494,86 @@ class PelicanJson(MutableMapping):
     def items(self, path=None):
         """Yields path-value pairs from throughout the entire tree.
         """
-        for k, v in self.store.items():
-            yield k, v
-            if isinstance(v, PelicanJson):
-                yield from v.items()
-            elif isinstance(v, list):
-                for list_item in v:
-                    if isinstance(list_item, PelicanJson):
-                        yield from list_item.items()
+        for _, key, value, container in self._walk():
+            if isinstance(container, PelicanJson):
+                yield key, value
 
-    def enumerate(self, path=None):
+    def enumerate(self, path=None, tuples=False, order='dfs', max_depth=None,
+                  cursor=None):
         """Iterate through the PelicanJson object yielding 1) the full path to
         each value and 2) the value itself at that path.
+
+        kwargs:
+           `path` (list): prefix for the paths returned.
+           `tuples` (bool): return paths as tuples instead of lists.
+           `order` (str): 'dfs' (depth-first, the default) or 'bfs'
+           (breadth-first, shallowest values first).
+           `max_depth` (int): only yield values whose paths are no longer
+           than this.
+           `cursor` (str): a cursor returned by `page`: values are yielded
+           from the position it saved onwards (depth-first only).
         """
-        if path is None:
-            path = []
-        for k, v in self.store.items():
-            current_path = path[:]
-            current_path.append(k)
+        resume = None if cursor is None else self._read_cursor(cursor)
+        for prefix, key, value, container in self._walk(path, order, max_depth, resume):
+            if isinstance(value, PelicanJson):
+                continue
+            elif isinstance(value, LIST_TYPES) and isinstance(container, PelicanJson):
+                continue
+            current_path = prefix + (key,)
+            yield current_path if tuples else list(current_path), value
 
-            if isinstance(v, PelicanJson):
-                yield from v.enumerate(path=current_path)
-            elif isinstance(v, list):
-                for idx, list_item in enumerate(v):
-                    list_path = current_path[:]
-                    list_path.append(idx)
-                    if isinstance(list_item, PelicanJson):
-                        yield from list_item.enumerate(path=list_path)
-                    else:
-                        yield list_path, list_item
+    def page(self, size, cursor=None, tuples=False, max_depth=None):
+        """Returns a list of the next `size` items from `enumerate`, starting
+        after `cursor`, and a cursor for the page after that (None once
+        there are no more items)::
+
+           >>> items, cursor = pelican.page(100)
+           >>> more_items, cursor = pelican.page(100, cursor=cursor)
+
+        A cursor is an opaque string which may be sent to a client and back.
+        Each page picks up the walk where the cursor left it rather than
+        starting over and skipping the items already seen.
+
+        Raises StaleCursor if the document was changed after the cursor was
+        made (changes made directly to a list, rather than through a
+        PelicanJson, can't be noticed) and BadCursor if it can't be read.
+        """
+        items = list(islice(self.enumerate(tuples=True, max_depth=max_depth,
+                                           cursor=cursor), size))
+        next_cursor = None
+        if items and len(items) == size:
+            next_cursor = self._make_cursor(items[-1][0])
+        if not tuples:
+            items = [(list(path), value) for path, value in items]
+        return items, next_cursor
+
+    def _make_cursor(self, path):
+        positions = []
+        data = self
+        for key in path:
+            if isinstance(data, PelicanJson):
+                # Objects can only be resumed by counting through their keys
+                positions.append((key, list(data.store).index(key)))
             else:
-                yield current_path, v
+                positions.append((key, key))
+            data = data[key]
+        state = [self.root._generation, positions]
+        return base64.urlsafe_b64encode(json.dumps(state).encode('utf-8')).decode('ascii')
+
+    def _read_cursor(self, cursor):
+        try:
+            generation, positions = json.loads(base64.urlsafe_b64decode(cursor))
+            positions = [(key, int(offset)) for key, offset in positions]
+        except (TypeError, ValueError) as e:
+            raise BadCursor("Cursor can't be read: {}".format(cursor)) from e
+        if generation != self.root._generation:
+            raise StaleCursor("Document has changed since the cursor was made")
+        return positions
 
-    def paths(self):
+    def paths(self, tuples=False):
         """Uses enumerate to yield paths only
         """
-        for path, _ in self.enumerate():
+        for path, _ in self.enumerate(tuples=tuples):
             yield path
 
     def keys(self, flat=False):
@@ -206,6 +592,95 @@ class PelicanJson(MutableMapping):
         """
         yield from (v for k, v in self.enumerate())
 
+    def memory_stats(self):
+        """Returns a report on the shape of the object and an estimate of
+        the memory it uses, gathered in a single pass through the tree::
+
+           >>> pelican.memory_stats()
+           {'nodes': 5, 'objects': 3, 'lists': 1, 'scalars': 1,
+            'max_depth': 4, 'fanout': {1: 3}, 'list_lengths': {1: 1},
+            'bytes': {'wrapper': 1272, 'containers': 640, 'keys': 165,
+                      'values': 57, 'total': 2134}}
+
+        `fanout` and `list_lengths` map the number of keys in an object (or
+        items in a list) to how many objects (or lists) have that many.
+
+        Sizes come from `sys.getsizeof`, counting shared objects once.
+        `wrapper` is the cost of the PelicanJson objects themselves (and
+        their parent links): a plain dictionary, as returned by `convert`,
+        would need roughly `total - wrapper` bytes.
+        """
+        counts = Counter()
+        fanout = Counter()
+        list_lengths = Counter()
+        sizes = Counter(wrapper=0, containers=0, keys=0, values=0)
+        seen = set()
+        max_depth = 0
+        stack = [(self, 0)]
+        while stack:
+            value, depth = stack.pop()
+            max_depth = max(max_depth, depth)
+            # Subtrees shared between several places count once
+            first_sight = id(value) not in seen
+            seen.add(id(value))
+            if isinstance(value, PelicanJson):
+                counts['objects'] += 1
+                fanout[len(value.store)] += 1
+                if first_sight:
+                    sizes['wrapper'] += sys.getsizeof(value)
+                    attributes = getattr(value, '__dict__', None)
+                    if attributes is not None:
+                        sizes['wrapper'] += sys.getsizeof(attributes)
+                    if value._parent is not None:
+                        sizes['wrapper'] += sys.getsizeof(value._parent)
+                        sizes['wrapper'] += sys.getsizeof(value._key)
+                    sizes['containers'] += sys.getsizeof(value.store)
+                for key, child in value.store.items():
+                    if id(key) not in seen:
+                        seen.add(id(key))
+                        sizes['keys'] += sys.getsizeof(key)
+                    stack.append((child, depth + 1))
+            elif isinstance(value, NumericList):
+                # Its numbers aren't objects of their own
+                counts['lists'] += 1
+                counts['scalars'] += len(value)
+                if value:
+                    max_depth = max(max_depth, depth + 1)
+                list_lengths[len(value)] += 1
+                if first_sight:
+                    sizes['containers'] += sys.getsizeof(value)
+            elif isinstance(value, SparseList):
+                # Its gaps are Nones that aren't stored anywhere
+                counts['lists'] += 1
+                list_lengths[len(value)] += 1
+                if first_sight:
+                    sizes['containers'] += sys.getsizeof(value)
+                populated = list(value.populated())
+                counts['scalars'] += len(value) - len(populated)
+                if value:
+                    max_depth = max(max_depth, depth + 1)
+                stack.extend((item, depth + 1) for _, item in populated)
+            elif isinstance(value, list):
+                counts['lists'] += 1
+                list_lengths[len(value)] += 1
+                if first_sight:
+                    sizes['containers'] += sys.getsizeof(value)
+                stack.extend((item, depth + 1) for item in value)
+            else:
+                counts['scalars'] += 1
+                if first_sight:
+                    sizes['values'] += sys.getsizeof(value)
+
+        sizes['total'] = sum(sizes.values())
+        return {'nodes': sum(counts.values()),
+                'objects': counts['objects'],
+                'lists': counts['lists'],
+                'scalars': counts['scalars'],
+                'max_depth': max_depth,
+                'fanout': dict(sorted(fanout.items())),
+                'list_lengths': dict(sorted(list_lengths.items())),
+                'bytes': dict(sizes)}
+
     def convert(self):
         """Converts the object back to a native Python object (a nested dictionary)
         that is equal to object passed in or, if modified, the dict version of
@@ -215,7 +690,10 @@ class PelicanJson(MutableMapping):
         for k, v in self.store.items():
             if isinstance(v, PelicanJson):
                 data[k] = v.convert()
-            elif isinstance(v, list):
+            elif isinstance(v, NumericList):
+                data[k] = v.tolist()
+            elif isinstance(v, (list, SparseList)):
+                # This is where a SparseList's gaps are filled in
                 temp_list = []
                 for list_item in v:
                     if isinstance(list_item, PelicanJson):
@@ -228,10 +706,66 @@ class PelicanJson(MutableMapping):
                 data[k] = v
         return data
 
-    def serialize(self):
-        """Returns JSON serialization of the object.
+    def serialize(self, codec=None):
+        """Returns JSON serialization of the object, made with `codec` (the
+        name of a codec in `pelecanus.codecs`) if it's given.
+        """
+        if not isinstance(self.store, dict):
+            # Objects loaded with `loads_lazy` copy the text they haven't parsed
+            from .lazy import RawStore
+            from .lazy import serialize
+            if isinstance(self.store, RawStore):
+                return serialize(self)
+        return codecs.dumps(self.convert(), codec or self.codec)
+
+    @classmethod
+    def loads(cls, data, codec=None):
+        """Parses the JSON object in `data` (str or UTF-8 bytes) with `codec`,
+        or the default codec, and returns it as a new object.
+        """
+        return cls(codecs.loads(data, codec or cls.codec))
+
+    def dump_binary(self, path):
+        """Writes the object to the file at `path` in the binary snapshot
+        format, to be opened again with `open_binary`.
+        """
+        # Imported here as the snapshot module builds PelicanJson objects
+        from .snapshot import dump
+        dump(self, path, PelicanJson)
+
+    @classmethod
+    def open_binary(cls, path):
+        """Opens a snapshot written by `dump_binary`. The file is mapped into
+        memory and nodes are only decoded from it when they're reached: see
+        `pelecanus.snapshot`.
         """
-        return json.dumps(self.convert())
+        from .snapshot import load
+        return load(cls, path)
+
+    def share(self):
+        """Writes the object into a shared memory block, in the snapshot
+        format, and returns a SharedSnapshot of it. It pickles as little
+        more than the block's name, so it can be sent to worker processes
+        cheaply, and each of them `open`s it instead of unpickling its own
+        copy of the document::
+
+           >>> with pelican.share() as shared:
+           ...     pool.map(work, [(shared, path) for path in paths])
+
+        This needs Python 3.8 or later. See `pelecanus.snapshot`.
+        """
+        from .snapshot import share
+        return share(self, PelicanJson)
+
+    @classmethod
+    def loads_lazy(cls, data):
+        """Loads the JSON object in `data` (bytes or str) without parsing it:
+        nested objects and lists are only parsed when they're reached, and
+        `serialize` copies the text of the rest straight to its output. See
+        `pelecanus.lazy`.
+        """
+        from .lazy import loads
+        return loads(cls, data)
 
     def count_key(self, key):
         """Returns a sum of the number of times a particular key appears in the object.
@@ -264,88 +798,194 @@ class PelicanJson(MutableMapping):
         if keys_present:
             # The following object could be any value really
             edit_object = self.get_nested_value(keys_present)
-            if isinstance(edit_object, list):
+            if isinstance(edit_object, LIST_TYPES):
                 # if list, we try to insert at the proper (missing) index
                 index, *rest = keys_missing
                 if not isinstance(index, int):
                     errmsg = "Check path. List index must be integer: {}."
                     raise IndexError(errmsg.format(index))
-                if rest:
-                    new_object = new_json_from_path(rest, newvalue)
-                    new_object = PelicanJson(new_object)
-                else:
-                    new_object = newvalue
-                edited_list = backfill_append(edit_object, index, new_object)
-                self.set_nested_value(keys_present, edited_list)
+                new_object = self._new_from_path(rest, newvalue, held=False)
+                self._insert_into(keys_present, edit_object, index, new_object)
             elif isinstance(edit_object, PelicanJson):
-                new_object = new_json_from_path(keys_missing, newvalue)
+                new_object = self._new_from_path(keys_missing, newvalue)
                 edit_object.update(new_object)
             else:
                 # This is the case where we are overwriting some random value
-                new_object = new_json_from_path(keys_missing, newvalue)
+                new_object = self._new_from_path(keys_missing, newvalue,
+                                                 held=isinstance(keys_present[-1], str))
                 self.set_nested_value(keys_present, new_object)
         else:
             # No keys_present: top-level object
-            new_object = new_json_from_path(keys_missing, newvalue)
+            new_object = self._new_from_path(keys_missing, newvalue)
             self.update(new_object)
 
         return self
 
-    def search_key(self, searchkey, path=None):
+    def _new_from_path(self, path, value, held=True):
+        """Like `new_json_from_path`, except that a list which would need
+        more than SPARSE_GAP Nones in front of its item is made a SparseList
+        (if it's `held` directly by an object: lists in lists are values).
+        """
+        if len(path) == 0:
+            return value
+        current, *rest = path
+        if isinstance(current, str):
+            return {current: self._new_from_path(rest, value)}
+        elif isinstance(current, int):
+            item = self._new_from_path(rest, value, held=False)
+            if held and current > self.SPARSE_GAP:
+                return SparseList({current: item})
+            return backfill_append([], current, item)
+
+    def _insert_into(self, path, somelist, index, item):
+        """Puts `item` at `index` of the list found at `path`, in place,
+        padding the list with None first if `index` is past its end.
+        """
+        # Find the nearest PelicanJson holding the list, to link `item` to it
+        owner, steps = self, ()
+        node = self
+        for step in path:
+            node = node[step]
+            if isinstance(node, PelicanJson):
+                owner, steps = node, ()
+            else:
+                steps += (step,)
+        steps += (index,)
+        if isinstance(item, dict):
+            item = type(self)(item)
+        elif isinstance(item, list):
+            item = owner._update_from_list(item, key=steps)
+        if isinstance(item, PelicanJson):
+            owner._adopt(item, steps)
+
+        gap = index - len(somelist)
+        if gap < 0:
+            somelist[index] = item
+        elif isinstance(somelist, SparseList):
+            somelist.pad_to(index)
+            somelist.append(item)
+        elif gap > self.SPARSE_GAP and len(steps) == 2:
+            # Held directly by `owner`, so it may be swapped for a SparseList
+            sparse = SparseList(enumerate(somelist), length=index)
+            sparse.append(item)
+            owner.store[steps[0]] = sparse
+        else:
+            somelist.extend([None] * gap)
+            somelist.append(item)
+        self._touch()
+
+    def search_key(self, searchkey, path=None, tuples=False, order='dfs',
+                   max_depth=None, first_only=False):
         """Generator that returns the (various) paths for a particular key
+
+        Takes the same `path`, `tuples`, `order` and `max_depth` kwargs as
+        `enumerate`. With `first_only`, stops at the first path found: with
+        `order='bfs'` that's the shallowest one::
+
+           >>> list(pelican.search_key('self', order='bfs', first_only=True))
+           [['links', 'self']]
+
         """
-        if path is None:
-            path = []
-        for k, v in self.store.items():
-            current_path = path[:]
-            current_path.append(k)
-            if k == searchkey:
-                yield current_path
-            if isinstance(v, PelicanJson):
-                yield from v.search_key(searchkey,
-                                        path=current_path)
-            elif isinstance(v, list):
-                for idx, list_item in enumerate(v):
-                    list_path = current_path[:]
-                    list_path.append(idx)
-                    if isinstance(list_item, PelicanJson):
-                        yield from list_item.search_key(searchkey,
-                                                        path=list_path)
+        for prefix, key, _, container in self._walk(path, order, max_depth):
+            if key == searchkey and isinstance(container, PelicanJson):
+                current_path = prefix + (key,)
+                yield current_path if tuples else list(current_path)
+                if first_only:
+                    return
 
-    def search_value(self, searchval, path=None):
+    def search_value(self, searchval, path=None, tuples=False, order='dfs',
+                     max_depth=None, first_only=False):
         """Generator that returns the (various) paths for a particular value
+
+        Takes the same kwargs as `search_key`.
         """
-        if path is None:
-            path = []
-        for k, v in self.store.items():
-            current_path = path[:]
-            current_path.append(k)
-            if v == searchval:
-                yield current_path
+        for prefix, key, value, container in self._walk(path, order, max_depth):
+            if isinstance(container, list) and isinstance(value, PelicanJson):
+                continue
+            if value == searchval:
+                current_path = prefix + (key,)
+                yield current_path if tuples else list(current_path)
+                if first_only:
+                    return
 
-            if isinstance(v, PelicanJson):
-                yield from v.search_value(searchval,
-                                          path=current_path)
-            elif isinstance(v, list):
-                for idx, list_item in enumerate(v):
-                    list_path = current_path[:]
-                    list_path.append(idx)
-                    if isinstance(list_item, PelicanJson):
-                        yield from list_item.search_value(searchval,
-                                                          path=list_path)
-                    elif list_item == searchval:
-                        yield list_path
+    def search_hits(self, keys=(), values=(), predicates=None, path=None,
+                    tuples=False):
+        """Generator that searches for many keys, values and predicates in a
+        single pass, yielding `(kind, target, path)` tuples, where `kind` is
+        one of 'key', 'value' or 'predicate'::
+
+           >>> list(pelican.search_hits(keys=['preview'], values=['noview']))
+           [('key', 'preview', ['ISBN:9780804720687', 'preview']),
+            ('value', 'noview', ['ISBN:9780804720687', 'preview'])]
+
+        Keys and values are found as `search_key` and `search_value` find
+        them. Values must be hashable. Predicates are passed as a dictionary
+        of names to functions, which are called as `predicate(key, value)`
+        for every key and index.
+        """
+        keys = {key: key for key in keys}
+        values = {value: value for value in values}
+        predicates = predicates or {}
+        for prefix, key, value, container in self._walk(path):
+            if key in keys and isinstance(container, PelicanJson):
+                current_path = prefix + (key,)
+                yield 'key', keys[key], current_path if tuples else list(current_path)
+            if not isinstance(value, (PelicanJson, list, NumericList, SparseList)) and value in values:
+                current_path = prefix + (key,)
+                yield 'value', values[value], current_path if tuples else list(current_path)
+            for name, predicate in predicates.items():
+                if predicate(key, value):
+                    current_path = prefix + (key,)
+                    yield 'predicate', name, current_path if tuples else list(current_path)
+
+    def search_many(self, keys=(), values=(), predicates=None, path=None,
+                    tuples=False):
+        """Like `search_hits`, but returns a dictionary of the paths found for
+        each target, by kind::
+
+           >>> pelican.search_many(keys=['preview'], values=['noview'])
+           {'key': {'preview': [['ISBN:9780804720687', 'preview']]},
+            'value': {'noview': [['ISBN:9780804720687', 'preview']]},
+            'predicate': {}}
+
+        """
+        hits = self.search_hits(keys=keys, values=values, predicates=predicates,
+                                path=path, tuples=tuples)
+        return _collect_hits(hits, keys, values, predicates)
+
+    def project(self, paths, compact=False, plain=False):
+        """Returns a new object holding only the values at the end of
+        `paths` (and the objects and lists leading to them), such as the
+        fields a client asked for. A path may use `toolbox.ANY` to stand for
+        every key or index at that step::
+
+           >>> pelican.project([['links', 'self'], ['items', ANY, 'id']])
+           <PelicanJson: {'links': {'self': '/items'}, 'items': [{'id': 1}, {'id': 2}]}>
+
+        The paths are merged into a trie first, so the object is walked
+        once and nothing outside the paths is visited. Paths which aren't
+        in the object are left out.
+
+        kwargs:
+           `compact` (bool): leave out the items of lists that weren't
+           selected, rather than leaving None in their places so that the
+           selected items keep their indices.
+
+           `plain` (bool): return a plain dictionary instead.
+        """
+        trie = _path_trie(paths)
+        if trie is True:
+            result = self.convert()
+        else:
+            result = _project(self, [trie], compact, _plain, _members) or {}
+        return result if plain else type(self)(result)
 
     def pluck(self, key, value):
         """Returns the _parent_ object that contains a particular key-value pair
         """
-        for path in self.search_key(key):
-            if self.get_nested_value(path) == value:
-                if len(path) > 1:
-                    path = path[:-1]
-                    yield self.get_nested_value(path)
-                else:
-                    yield self
+        for _, k, v, container in self._walk():
+            if k == key and isinstance(container, PelicanJson) and v == value:
+                yield container
 
     def get_nested_value(self, path):
         """Retrieves nested value at the end of a path.
@@ -378,6 +1018,9 @@ class PelicanJson(MutableMapping):
             try:
                 editable = self.get_nested_value(keys)
                 editable[last_key] = newvalue
+                # Lists can't tell the document they've been changed
+                if isinstance(editable, LIST_TYPES):
+                    self._touch()
             except (IndexError, KeyError, TypeError) as e:
                 if force:
                     self.create_path(path, newvalue)
@@ -385,7 +1028,7 @@ class PelicanJson(MutableMapping):
                     raise e
         else:
             key, *_ = path
-            self.store[key] = newvalue
+            self[key] = newvalue
 
     def safe_get_nested_value(self, path, default=None):
         """Retrieves nested value at the end of a path. Returns `default`
@@ -421,3 +1064,590 @@ class PelicanJson(MutableMapping):
         """
         for path in self.search_value(matchval):
             self.set_nested_value(path, replaceval)
+
+    def delete_paths(self, paths):
+        """Removes the values at the end of `paths` from the object, and
+        returns how many were removed. A path may use `toolbox.ANY` to stand
+        for every key or index at that step::
+
+           >>> pelican.delete_paths([['links', 'self'], ['items', ANY, '_embedded']])
+           3
+
+        As with `project`, the paths are merged into a trie and the object
+        is walked once, entering only the branches the paths lead into.
+        Items removed from a list are removed from the last one back, so the
+        indices in `paths` all refer to the list as it was. Paths which
+        aren't in the object are ignored.
+        """
+        trie = _path_trie(paths)
+        if trie is True:
+            raise EmptyPath("Path must have at least one element.")
+        return self._prune(_select_paths, [trie])
+
+    def delete_where(self, key=_NOTHING, value=_NOTHING, predicate=None):
+        """Removes every member of an object (and item of a list) that
+        matches, and returns how many were removed::
+
+           >>> pelican.delete_where(key='_embedded')
+           2
+           >>> pelican.delete_where(predicate=lambda k, v: k == 'password' or v is None)
+           5
+
+        A member matches if its key is `key` (as `search_key` finds keys),
+        its value is the scalar `value` (as `search_value` finds values) or
+        `predicate(key, value)` returns True; list items are matched by
+        value and by predicate, which is given their index. The object is
+        walked once, and nothing inside a removed value is looked at.
+        """
+        def matches(k, v, container):
+            if key is not _NOTHING and k == key and isinstance(container, PelicanJson):
+                return True
+            if value is not _NOTHING and not isinstance(v, _CONTAINERS) and v == value:
+                return True
+            return predicate is not None and predicate(k, v)
+
+        return self._prune(_select_matches, matches)
+
+    def _prune(self, select, state, found=None):
+        """Removes members all through the object in a single walk, and
+        returns how many were removed. `select(container, members, state)`
+        returns the keys (or indices) of `container` to remove and, for
+        each member to be walked into, its key and the state to walk it
+        with. Items after one removed from a list move up, so they are
+        linked to their new indices.
+
+        If a `found` list is passed, nothing is removed: the paths to what
+        would have been are appended to it instead.
+        """
+        removed = 0
+        # Each frame is a container, its nearest PelicanJson and the steps
+        # leading from it to the container, the path to the container and
+        # the state to walk it with
+        stack = [(self, self, (), (), state)]
+        while stack:
+            container, owner, steps, prefix, state = stack.pop()
+            is_object = isinstance(container, PelicanJson)
+            members = container.store if is_object else container
+            doomed, below = select(container, members if is_object else enumerate(container), state)
+            if found is not None:
+                found.extend(prefix + (key,) for key in doomed)
+            elif is_object:
+                for key in doomed:
+                    container._discard(key)
+            else:
+                doomed = sorted(doomed)
+                for index in reversed(doomed):
+                    del container[index]
+                if doomed:
+                    owner._adopt_list(container, steps, start=doomed[0])
+                # Indices of what's left, once the removed items are gone
+                below = [(key - bisect_left(doomed, key), branch) for key, branch in below]
+            if is_object:
+                owner, steps = container, ()
+            removed += len(doomed)
+            for key, branch in below:
+                child = members[key]
+                if isinstance(child, PelicanJson):
+                    stack.append((child, child, (), prefix + (key,), branch))
+                elif isinstance(child, LIST_TYPES):
+                    stack.append((child, owner, steps + (key,), prefix + (key,), branch))
+        if removed and found is None:
+            self._touch()
+        return removed
+
+    def deep_merge(self, other, list_strategy='replace', list_key='id', move=False):
+        """Merges `other` (a dictionary or PelicanJson) into this object, in
+        place, and returns the object. Where both hold an object under the
+        same key, the two are merged; anywhere else the value from `other`
+        wins::
+
+           >>> config = PelicanJson({'db': {'host': 'a', 'port': 1}, 'tags': ['x']})
+           >>> config.deep_merge({'db': {'host': 'b'}, 'tags': ['y']}, list_strategy='append')
+           <PelicanJson: {'db': <PelicanJson: {'host': 'b', 'port': 1}>, 'tags': ['x', 'y']}>
+
+        Only keys that are on both sides are descended into: a subtree
+        found only in `other` is stored as it is, and one found only in this
+        object isn't looked at.
+
+        kwargs:
+           `list_strategy` (str): what to do where both hold a list.
+           'replace' puts the list from `other` in place of this one, and
+           'append' adds its items to the end of this one. 'by_key' merges
+           items which are objects into the item of this list with the same
+           value under `list_key`, and appends the rest.
+
+           `move` (bool): if `other` is an object of the same type as this
+           one, move its subtrees over instead of copying them. Moving a
+           subtree only relinks it, whatever its size, and leaves `other`
+           empty.
+        """
+        if list_strategy not in ('replace', 'append', 'by_key'):
+            errmsg = "Unknown list_strategy {!r}: use 'replace', 'append' or 'by_key'"
+            raise ValueError(errmsg.format(list_strategy))
+        if _members(other) is None:
+            errmsg = "Can only merge a dictionary or PelicanJson, not {}"
+            raise TypeError(errmsg.format(type(other).__name__))
+        move = move and type(other) is type(self)
+        # Each frame is an object of this document and the one (a
+        # dictionary or PelicanJson) being merged into it
+        stack = [(self, other)]
+        while stack:
+            target, source = stack.pop()
+            for key, value in list(_members(source).items()):
+                current = target.store.get(key, _NOTHING)
+                lists = isinstance(current, LIST_TYPES) and isinstance(value, LIST_TYPES)
+                if isinstance(current, PelicanJson) and _members(value) is not None:
+                    stack.append((target._writable((key,)), value))
+                elif lists and list_strategy != 'replace':
+                    stack.extend(target._merge_list(key, value, list_strategy, list_key, move))
+                else:
+                    target._set(key, value if move else _plain(value))
+        if move:
+            for key in list(other.store):
+                other._discard(key)
+            other._touch()
+        self._touch()
+        return self
+
+    def _merge_list(self, key, values, list_strategy, list_key, move):
+        """Adds `values` to the list held under `key`, for `deep_merge`, and
+        returns the frames for the objects to be merged into its items.
+        """
+        somelist = self._writable((key,))
+        start = len(somelist)
+        positions = {}
+        if list_strategy == 'by_key':
+            for index, item in enumerate(somelist):
+                if isinstance(item, PelicanJson):
+                    _index_item(positions, item.store, list_key, index)
+        frames = []
+        for value in values:
+            members = _members(value)
+            if members is not None and list_strategy == 'by_key':
+                index = _find_item(positions, members, list_key)
+                if index is not None:
+                    frames.append((self._writable((key, index)), value))
+                    continue
+                _index_item(positions, members, list_key, len(somelist))
+            if not move:
+                value = _plain(value)
+            if isinstance(value, dict):
+                value = type(self)(value)
+            elif isinstance(value, list):
+                value = self._update_from_list(value)
+            somelist.append(value)
+        self._adopt_list(somelist, (key,), start=start)
+        return frames
+
+    def move_path(self, src, dst):
+        """Moves the value at the end of the path `src` to the path `dst`,
+        replacing anything already there::
+
+           >>> pelican.move_path(['attributes', 'links'], ['links'])
+
+        The value itself is moved, not copied: objects are relinked to
+        their new place without being rebuilt, so the cost doesn't depend
+        on the size of what's moved (only a list which is moved, and any
+        list an item is moved into or out of, is relinked item by item).
+
+        Both paths refer to the object as it was before the move. Where
+        `dst` ends in a list, the value is inserted before the item which
+        was at that index, or appended if the index is the list's length
+        (any further out raises IndexError). Objects missing along `dst` are created, as
+        `create_path` creates them; a value can't be moved inside itself.
+        """
+        for path in (src, dst):
+            if not isinstance(path, (list, tuple)):
+                raise BadPath("Path passed in is not a list or a tuple: {}".format(path))
+            elif len(path) == 0:
+                raise EmptyPath("Path must have at least one element.")
+        *src_keys, src_key = src
+        *dst_keys, dst_key = dst
+        source, src_owner, src_steps, _ = self._route(src_keys)
+        value = source[src_key]
+        missing = dst_keys and self.safe_get_nested_value(dst_keys, _NOTHING) is _NOTHING
+        if missing and isinstance(dst_key, str):
+            self.create_path(dst_keys, {})
+        node = self
+        for step in dst_keys:
+            node = node[step]
+            if node is value:
+                errmsg = "Can't move {} inside itself, to {}"
+                raise BadPath(errmsg.format(list(src), list(dst)))
+        target, owner, steps, holders = self._route(dst_keys)
+        if not isinstance(target, _CONTAINERS):
+            errmsg = "Can't move a value into a {}: {}"
+            raise TypeError(errmsg.format(type(target).__name__, list(dst)))
+        elif not isinstance(target, PelicanJson):
+            if not isinstance(dst_key, int):
+                errmsg = "Check path. List index must be integer: {}."
+                raise IndexError(errmsg.format(dst_key))
+            position = dst_key + len(target) if dst_key < 0 else dst_key
+            if not 0 <= position <= len(target):
+                raise IndexError("List index out of range: {}".format(list(dst)))
+
+        if isinstance(source, PelicanJson):
+            source._discard(src_key)
+        else:
+            src_index = src_key + len(source) if src_key < 0 else src_key
+            del source[src_index]
+            src_owner._adopt_list(source, src_steps, start=src_index)
+            # Items after the one moved out of the list have moved up
+            steps = tuple(step - 1 if holder is source and step > src_index else step
+                          for holder, step in zip(holders, steps))
+
+        if isinstance(target, PelicanJson):
+            target._set(dst_key, value)
+        else:
+            moved_within = target is source
+            index = dst_key + len(target) + moved_within if dst_key < 0 else dst_key
+            if moved_within and index > src_index:
+                index -= 1
+            target.insert(index, value)
+            owner._adopt_list(target, steps, start=index)
+        self._touch()
+
+    def _route(self, path):
+        """Follows `path` (which must exist) and returns the container at
+        its end, ready to be changed in place, along with the nearest
+        PelicanJson holding it, the steps leading from that to the
+        container (with list indices counted from the front), and the
+        container each of those steps was taken in.
+        """
+        self._writable(path)
+        node, owner, steps, holders = self, self, (), []
+        for step in path:
+            if isinstance(node, LIST_TYPES) and isinstance(step, int) and step < 0:
+                step += len(node)
+            holder, node = node, node[step]
+            if isinstance(node, PelicanJson):
+                owner, steps, holders = node, (), []
+            else:
+                steps += (step,)
+                holders.append(holder)
+        return node, owner, steps, holders
+
+    def rename_key(self, old, new, everywhere=False, overwrite=False):
+        """Renames the key `old` of this object to `new`, keeping its place
+        among the keys, and returns the number of keys renamed. The value
+        isn't copied, so this costs the same whatever it holds. Raises
+        KeyError if there's no `old` key.
+
+        With `everywhere`, every `old` key found in the object (as
+        `search_key` finds them) is renamed, in one walk::
+
+           >>> pelican.rename_key('_links', 'links', everywhere=True)
+           12
+
+        An object which already has a `new` key raises ValueError, and
+        nothing is renamed, unless `overwrite` is passed: then the value
+        under `new` is replaced by the one under `old`.
+        """
+        if everywhere:
+            holders = [container for _, key, _, container in self._walk()
+                       if key == old and isinstance(container, PelicanJson)]
+        elif old not in self.store:
+            raise KeyError(old)
+        else:
+            holders = [self]
+        if old != new:
+            if not overwrite:
+                for holder in holders:
+                    if new in holder.store:
+                        errmsg = "Can't rename {!r} to {!r}: the object already has a {!r} key"
+                        raise ValueError(errmsg.format(old, new, new))
+            for holder in holders:
+                holder._rename(old, new)
+            if holders:
+                self._touch()
+        return len(holders)
+
+    @classmethod
+    async def aload(cls, stream, budget=None, codec=None):
+        """Asynchronously reads a JSON document from `stream` and builds a
+        PelicanJson from it, yielding to the event loop every `budget`
+        nodes so that other tasks aren't stalled by a large document.
+
+        `stream` is either an object with an async `read` method (such as an
+        `asyncio.StreamReader` or an aiohttp response's `content`) or an
+        async iterable of bytes. Parsing runs in the loop's default executor,
+        with `codec` or the default codec.
+        """
+        budget = budget or cls.ASYNC_BUDGET
+        chunks = []
+        if hasattr(stream, 'read'):
+            while True:
+                chunk = await stream.read(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        else:
+            async for chunk in stream:
+                chunks.append(chunk)
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, codecs.loads, b''.join(chunks), codec or cls.codec)
+
+        if not isinstance(data, dict):
+            # Not an object: fails (or not) exactly as `loads` would
+            return cls(data)
+        pelican = cls.__new__(cls)
+        pelican.store = {}
+        for count, _ in enumerate(_build_steps(pelican, data), start=1):
+            if count % budget == 0:
+                await asyncio.sleep(0)
+        return pelican
+
+    def _loaded(self):
+        """Called by `aload` once this object's store, a dictionary, has
+        been filled in directly (and everything under it has been loaded),
+        for subclasses that keep their members in some other way.
+        """
+
+    async def _awalk(self, budget):
+        budget = budget or self.ASYNC_BUDGET
+        for count, slot in enumerate(self._walk(), start=1):
+            yield slot
+            if count % budget == 0:
+                await asyncio.sleep(0)
+
+    async def aenumerate(self, budget=None):
+        """Async version of `enumerate` which yields to the event loop every
+        `budget` nodes visited.
+        """
+        async for prefix, key, value, container in self._awalk(budget):
+            if isinstance(value, PelicanJson):
+                continue
+            elif isinstance(value, LIST_TYPES) and isinstance(container, PelicanJson):
+                continue
+            yield list(prefix + (key,)), value
+
+    async def asearch_key(self, searchkey, budget=None):
+        """Async version of `search_key` which yields to the event loop every
+        `budget` nodes visited.
+        """
+        async for prefix, key, _, container in self._awalk(budget):
+            if key == searchkey and isinstance(container, PelicanJson):
+                yield list(prefix + (key,))
+
+    async def asearch_value(self, searchval, budget=None):
+        """Async version of `search_value` which yields to the event loop
+        every `budget` nodes visited.
+        """
+        async for prefix, key, value, container in self._awalk(budget):
+            if isinstance(container, list) and isinstance(value, PelicanJson):
+                continue
+            if value == searchval:
+                yield list(prefix + (key,))
+
+
+def _build_steps(pelican, data):
+    """Fills the empty `pelican` from the dictionary `data` without
+    recursing, yielding once for every nested object or list created.
+    Nested objects are of the same class as `pelican`, and each one is
+    `_loaded` once everything under it is in place.
+    """
+    cls = type(pelican)
+    stack = [(pelican, (), pelican.store, iter(data.items()))]
+    while stack:
+        # `owner` is the nearest PelicanJson, `steps` lead from it to `target`
+        owner, steps, target, slots = stack[-1]
+        for key, value in slots:
+            if isinstance(value, dict):
+                new = cls.__new__(cls)
+                new.store = {}
+                owner._adopt(new, steps + (key,))
+                stack.append((new, (), new.store, iter(value.items())))
+            elif isinstance(value, list):
+                new = []
+                stack.append((owner, steps + (key,), new, enumerate(value)))
+            else:
+                new = value
+            if isinstance(target, list):
+                target.append(new)
+            else:
+                target[key] = new
+            if new is not value:
+                break
+        else:
+            stack.pop()
+            if not steps:
+                owner._loaded()
+            continue
+        yield
+
+
+_CONTAINERS = (PelicanJson,) + LIST_TYPES
+
+
+def _select_paths(container, members, tries):
+    """Picks out what `delete_paths` removes from `container`, and which of
+    its members it walks into with which tries.
+    """
+    doomed, below = [], []
+    wildcard = any(ANY in trie for trie in tries)
+    if isinstance(container, PelicanJson):
+        if wildcard:
+            keys = list(members)
+        else:
+            keys = list(dict.fromkeys(key for trie in tries for key in trie if key in members))
+        for key in keys:
+            branches = _branches(tries, (key,))
+            if branches is True:
+                doomed.append(key)
+            elif branches:
+                below.append((key, branches))
+        return doomed, below
+    length = len(container)
+    if wildcard:
+        indices = range(length)
+    else:
+        indices = {index + length if index < 0 else index
+                   for trie in tries for index in trie
+                   if isinstance(index, int) and -length <= index < length}
+    for index in indices:
+        branches = _branches(tries, (index, index - length))
+        if branches is True:
+            doomed.append(index)
+        elif branches:
+            below.append((index, branches))
+    return doomed, below
+
+
+def _select_matches(container, members, matches):
+    """Picks out what `delete_where` removes from `container`: everything
+    `matches`, walking into every other object and list.
+    """
+    doomed, below = [], []
+    for key, value in (members.items() if isinstance(container, PelicanJson) else members):
+        if matches(key, value, container):
+            doomed.append(key)
+        elif isinstance(value, _CONTAINERS):
+            below.append((key, matches))
+    return doomed, below
+
+
+def _members(node):
+    """Returns the members of `node` if it's a JSON object (a PelicanJson or
+    a dictionary), or else None.
+    """
+    if isinstance(node, PelicanJson):
+        return node.store
+    return node if isinstance(node, dict) else None
+
+
+def _index_item(positions, members, list_key, index):
+    """Notes that the list item with `members` is at `index`, for merging
+    lists by key.
+    """
+    try:
+        positions.setdefault(members[list_key], index)
+    except (KeyError, TypeError):
+        # No key, or one that can't be looked up
+        pass
+
+
+def _find_item(positions, members, list_key):
+    try:
+        return positions.get(members[list_key])
+    except (KeyError, TypeError):
+        return None
+
+
+def _plain(value):
+    """Returns a plain copy of `value`, for `project`.
+    """
+    if isinstance(value, PelicanJson):
+        return value.convert()
+    elif isinstance(value, LIST_TYPES):
+        return [_plain(item) for item in value]
+    return value
+
+
+# Kinds of node in the flat encoding of a document
+_OBJECT, _LIST, _SPARSE, _VALUE = range(4)
+
+# Values that deep copies share with the original
+_ATOMIC = frozenset((str, int, float, bool, type(None)))
+
+
+def _flatten(pelican):
+    """Encodes `pelican` as three flat sequences, without recursing. `kinds`
+    holds the kind of every node, in depth-first order. `counts` holds the
+    number of entries of each object, the length of each list, and the
+    length and number of stored items of each SparseList. `items` holds the
+    keys of each object (or the stored indices of a SparseList), followed
+    by the values at the leaves of its subtree.
+    """
+    kinds = bytearray([_OBJECT])
+    counts = [len(pelican.store)]
+    items = list(pelican.store)
+    stack = [iter(pelican.store.values())]
+    while stack:
+        for value in stack[-1]:
+            if isinstance(value, PelicanJson):
+                kinds.append(_OBJECT)
+                store = value.store
+                counts.append(len(store))
+                items.extend(store)
+                stack.append(iter(store.values()))
+            elif isinstance(value, SparseList):
+                kinds.append(_SPARSE)
+                populated = list(value.populated())
+                counts.extend((len(value), len(populated)))
+                items.extend(index for index, _ in populated)
+                stack.append(iter([item for _, item in populated]))
+            elif isinstance(value, list):
+                kinds.append(_LIST)
+                counts.append(len(value))
+                stack.append(iter(value))
+            else:
+                kinds.append(_VALUE)
+                items.append(value)
+                continue
+            break
+        else:
+            stack.pop()
+    return bytes(kinds), counts, items
+
+
+def _unflatten(cls, kinds, counts, items):
+    """Builds a `cls` object from the output of `_flatten`, without
+    recursing.
+    """
+    kinds = iter(kinds)
+    counts = iter(counts)
+    items = iter(items)
+    next(kinds)
+    root = cls.__new__(cls)
+    root.store = {}
+    # Each frame is the container being filled, its nearest PelicanJson and
+    # the steps leading from it to the container, and the keys left to fill
+    stack = [(root.store, root, (), iter(list(islice(items, next(counts)))))]
+    while stack:
+        target, owner, steps, keys = stack[-1]
+        is_list = type(target) is list
+        for key in keys:
+            kind = next(kinds)
+            if kind == _VALUE:
+                node = next(items)
+            elif kind == _OBJECT:
+                node = cls.__new__(cls)
+                node.store = {}
+                owner._adopt(node, steps + (key,))
+                frame = (node.store, node, (), iter(list(islice(items, next(counts)))))
+            elif kind == _LIST:
+                node = []
+                frame = (node, owner, steps + (key,), iter(range(next(counts))))
+            else:
+                node = SparseList(length=next(counts))
+                frame = (node, owner, steps + (key,), iter(list(islice(items, next(counts)))))
+            if is_list:
+                target.append(node)
+            else:
+                target[key] = node
+            if kind != _VALUE:
+                stack.append(frame)
+                break
+        else:
+            stack.pop()
+    return root
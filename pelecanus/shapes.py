@@ -0,0 +1,190 @@
+"""Compact storage for PelicanJson objects built from the same schema.
+
+Each PelicanJson normally keeps its keys in its own dictionary, so ten
+thousand documents from one API hold ten thousand copies of the same keys
+(and of the hash tables built for them). A ShapedPelicanJson instead keeps
+the keys of each object in a Shape, shared by every object with the same
+keys in the same order, and holds only an array of values itself, much as
+CPython's split-table dictionaries do for instance attributes::
+
+   >>> first = ShapedPelicanJson({'href': 'a', 'title': 'First'})
+   >>> second = ShapedPelicanJson({'href': 'b', 'title': 'Second'})
+   >>> first.store.shape is second.store.shape
+   True
+
+Shapes are kept in a ShapeCache (`SHAPES`, unless a subclass sets its own
+`shapes`) and their keys are interned, so key strings are shared across
+documents too. A shape lives only as long as some object is using it.
+
+Adding or deleting a key moves an object to another shape; setting an
+existing key just replaces a value. ShapedPelicanJson objects behave
+exactly like PelicanJson objects otherwise.
+"""
+from collections.abc import Mapping
+from collections.abc import MutableMapping
+import sys
+import weakref
+
+from .pelicanjson import PelicanJson
+
+
+class Shape:
+    """An ordered set of keys, with each key's position in the values of
+    the stores sharing it.
+    """
+    __slots__ = ('keys', 'index', 'cache', '__weakref__')
+
+    def __init__(self, keys, cache):
+        self.keys = keys
+        self.index = {key: position for position, key in enumerate(keys)}
+        self.cache = cache
+
+    def __reduce__(self):
+        # Unpickled shapes are shared through the default cache
+        return (shape_for, (self.keys,))
+
+    def __repr__(self):
+        return "<Shape: {}>".format(self.keys)
+
+
+class ShapeCache:
+    """Hands out one Shape for each distinct sequence of keys.
+    """
+    def __init__(self):
+        self._shapes = weakref.WeakValueDictionary()
+
+    def shape(self, keys):
+        keys = tuple(keys)
+        shape = self._shapes.get(keys)
+        if shape is None:
+            keys = tuple(sys.intern(key) if type(key) is str else key
+                         for key in keys)
+            shape = self._shapes[keys] = Shape(keys, self)
+        return shape
+
+    def __len__(self):
+        return len(self._shapes)
+
+
+SHAPES = ShapeCache()
+
+
+def shape_for(keys):
+    return SHAPES.shape(keys)
+
+
+class ShapedStore(list):
+    """A dictionary-like store made of a shared Shape and the values for its
+    keys, in order. Used in place of a dictionary as the `store` of a
+    ShapedPelicanJson.
+
+    It is a list of values (so that it costs no more than one) but it
+    behaves as a mapping: iterating through it yields keys and indexing it
+    takes a key. Pass it to `dict` to get a plain dictionary back.
+    """
+    __slots__ = ('shape',)
+
+    def __init__(self, mapping=(), cache=SHAPES):
+        mapping = dict(mapping)
+        super().__init__(mapping.values())
+        self.shape = cache.shape(mapping)
+
+    def __getitem__(self, key):
+        return list.__getitem__(self, self.shape.index[key])
+
+    def __setitem__(self, key, value):
+        position = self.shape.index.get(key)
+        if position is None:
+            self.shape = self.shape.cache.shape(self.shape.keys + (key,))
+            self.append(value)
+        else:
+            list.__setitem__(self, position, value)
+
+    def __delitem__(self, key):
+        position = self.shape.index[key]
+        keys = self.shape.keys
+        self.shape = self.shape.cache.shape(keys[:position] + keys[position + 1:])
+        list.__delitem__(self, position)
+
+    def __contains__(self, key):
+        return key in self.shape.index
+
+    def __iter__(self):
+        return iter(self.shape.keys)
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def keys(self):
+        return self.shape.keys
+
+    def values(self):
+        return list.__iter__(self)
+
+    def items(self):
+        return zip(self.shape.keys, list.__iter__(self))
+
+    def get(self, key, default=None):
+        position = self.shape.index.get(key)
+        return default if position is None else list.__getitem__(self, position)
+
+    def pop(self, key, *default):
+        if key not in self.shape.index and default:
+            return default[0]
+        value = self[key]
+        del self[key]
+        return value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __reduce__(self):
+        return (ShapedStore, (dict(self.items()),))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+MutableMapping.register(ShapedStore)
+
+
+class ShapedPelicanJson(PelicanJson):
+    """A PelicanJson object whose nested objects all keep their keys in
+    shared Shapes. See the module documentation.
+    """
+    shapes = SHAPES
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = ShapedStore(self.store, self.shapes)
+
+    # Copied and pickled through __getstate__, which keeps the shapes
+    __reduce__ = object.__reduce__
+    __copy__ = __deepcopy__ = None
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if not isinstance(self.store, ShapedStore):
+            self.store = ShapedStore(self.store, self.shapes)
+
+    def _loaded(self):
+        self.store = ShapedStore(self.store, self.shapes)
+
+    def _rename(self, old, new):
+        # A new store, so that the key keeps its place in the new Shape
+        value = self.store[old]
+        self.store = ShapedStore(((new if key == old else key, item)
+                                  for key, item in self.store.items() if key != new), self.shapes)
+        self._relink(new, value)
+
+    def __repr__(self):
+        return "<ShapedPelicanJson: {}>".format(str(self.store))
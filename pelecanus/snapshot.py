@@ -0,0 +1,383 @@
+"""A binary snapshot format for PelicanJson objects, read through `mmap`.
+
+Parsing a large JSON document and wrapping it in PelicanJson objects takes
+time, and every process doing it holds its own copy. Instead, a document may
+be written once with `dump_binary` and opened with `open_binary`, which maps
+the file into memory and decodes nodes only as they are reached::
+
+   >>> PelicanJson(reference).dump_binary('reference.pelican')
+   >>> pelican = PelicanJson.open_binary('reference.pelican')
+   >>> pelican.get_nested_value(['query', 'pages', '1422396', 'title'])
+   'Pelecanus'
+
+Opening a snapshot reads nothing but its header, and processes mapping the
+same file share its pages. `get_nested_value` decodes only the objects along
+its path; `enumerate` and the searches decode the objects they walk through.
+A snapshot can be edited like any PelicanJson object: an object is copied
+out of the file the first time it is changed, and the file itself never is.
+
+The format is little-endian. After a 12-byte header (`PELB`, the format
+version, two reserved bytes and the offset of the root object) come tagged
+nodes, addressed by 32-bit offsets, so a snapshot is limited to 4 GiB. An
+object is its entry count, a table of `(key offset, value offset)` pairs in
+order and a table of entry positions sorted by key, which is searched to
+look keys up. A list is its length and a table of item offsets. Strings are
+UTF-8 and are stored once, however often they appear.
+
+A snapshot may also be put in shared memory with `share`, for worker
+processes to open without each unpickling a copy of the document::
+
+   >>> with PelicanJson(reference).share() as shared:
+   ...     pool.map(work, [(shared, item) for item in items])
+
+where `work` calls `shared.open()`, which only maps the shared block (this
+needs `multiprocessing.shared_memory`, new in Python 3.8).
+"""
+from bisect import bisect_left
+from collections.abc import MutableMapping
+import mmap
+import struct
+import weakref
+
+from .arrays import LIST_TYPES
+
+MAGIC = b'PELB'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHHI')
+COUNT = struct.Struct('<I')
+ENTRY = struct.Struct('<II')
+OFFSET = struct.Struct('<I')
+INT = struct.Struct('<q')
+FLOAT = struct.Struct('<d')
+
+NULL, FALSE, TRUE, INTEGER, BIGINT, FLOATING, STRING, OBJECT, ARRAY = range(9)
+
+
+class _Writer:
+    """Writes nodes children first, so that every offset a container holds
+    is known by the time the container itself is written.
+    """
+    def __init__(self, object_type):
+        self.object_type = object_type
+        self.buffer = bytearray(HEADER.size)
+        self.shared = {}
+
+    def _append(self, data):
+        offset = len(self.buffer)
+        self.buffer += data
+        return offset
+
+    def _shared(self, key, data):
+        offset = self.shared.get(key)
+        if offset is None:
+            offset = self.shared[key] = self._append(data)
+        return offset
+
+    def string(self, value):
+        encoded = value.encode('utf-8')
+        return self._shared((str, value), bytes([STRING]) + COUNT.pack(len(encoded)) + encoded)
+
+    def write(self, value):
+        if isinstance(value, (self.object_type, dict)):
+            store = value.store if isinstance(value, self.object_type) else value
+            entries = [(self.string(_check_key(key)), self.write(item), key)
+                       for key, item in store.items()]
+            order = sorted(range(len(entries)), key=lambda position: entries[position][2])
+            data = bytearray([OBJECT])
+            data += COUNT.pack(len(entries))
+            for key_offset, value_offset, _ in entries:
+                data += ENTRY.pack(key_offset, value_offset)
+            for position in order:
+                data += COUNT.pack(position)
+            return self._append(data)
+        elif isinstance(value, LIST_TYPES):
+            offsets = [self.write(item) for item in value]
+            data = bytearray([ARRAY])
+            data += COUNT.pack(len(offsets))
+            for offset in offsets:
+                data += OFFSET.pack(offset)
+            return self._append(data)
+        elif value is None:
+            return self._shared(None, bytes([NULL]))
+        elif value is True or value is False:
+            return self._shared(value, bytes([TRUE if value else FALSE]))
+        elif isinstance(value, str):
+            return self.string(value)
+        elif isinstance(value, int):
+            if -2 ** 63 <= value < 2 ** 63:
+                return self._append(bytes([INTEGER]) + INT.pack(value))
+            digits = str(value).encode('ascii')
+            return self._append(bytes([BIGINT]) + COUNT.pack(len(digits)) + digits)
+        elif isinstance(value, float):
+            return self._append(bytes([FLOATING]) + FLOAT.pack(value))
+        raise TypeError("Object of type {} can't be written to a snapshot".format(
+            type(value).__name__))
+
+
+def _check_key(key):
+    if not isinstance(key, str):
+        raise TypeError("Snapshot keys must be strings: {!r}".format(key))
+    return key
+
+
+def dumps(pelican, object_type):
+    """Returns `pelican` in the snapshot format. Nodes that are instances of
+    `object_type` (PelicanJson) or dictionaries are written as objects.
+    """
+    writer = _Writer(object_type)
+    root = writer.write(pelican)
+    if len(writer.buffer) > 2 ** 32:
+        raise ValueError("Object is too large for a snapshot file")
+    HEADER.pack_into(writer.buffer, 0, MAGIC, VERSION, 0, root)
+    return writer.buffer
+
+
+def dump(pelican, path, object_type):
+    """Writes `pelican` to the file at `path`.
+    """
+    with open(path, 'wb') as f:
+        f.write(dumps(pelican, object_type))
+
+
+class Snapshot:
+    """A snapshot in memory (a mapped file or a shared memory block, which
+    `memory` keeps open), with the strings decoded from it so far.
+    """
+    def __init__(self, data, source, memory=None):
+        self.data = data
+        self.memory = memory
+        if len(self.data) < HEADER.size:
+            raise ValueError("Not a snapshot file: {}".format(source))
+        magic, version, _, self.root = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a version {} snapshot file: {}".format(VERSION, source))
+        self.strings = {}
+
+    def string(self, offset):
+        value = self.strings.get(offset)
+        if value is None:
+            length, = COUNT.unpack_from(self.data, offset + 1)
+            start = offset + 1 + COUNT.size
+            value = self.strings[offset] = str(self.data[start:start + length], 'utf-8')
+        return value
+
+    def scalar(self, offset, tag):
+        if tag == NULL:
+            return None
+        elif tag == TRUE:
+            return True
+        elif tag == FALSE:
+            return False
+        elif tag == INTEGER:
+            return INT.unpack_from(self.data, offset + 1)[0]
+        elif tag == FLOATING:
+            return FLOAT.unpack_from(self.data, offset + 1)[0]
+        elif tag == STRING:
+            return self.string(offset)
+        length, = COUNT.unpack_from(self.data, offset + 1)
+        start = offset + 1 + COUNT.size
+        return int(bytes(self.data[start:start + length]))
+
+
+class MappedStore(MutableMapping):
+    """The store of a PelicanJson object opened from a snapshot. Values are
+    decoded from the snapshot when they are asked for; nested objects and
+    lists are decoded once and kept. The first change copies the whole
+    object into a dictionary, which is used from then on.
+    """
+    __slots__ = ('_snapshot', '_offset', '_count', '_owner', '_decoded', '_dict')
+
+    def __init__(self, snapshot, offset, owner):
+        self._snapshot = snapshot
+        self._offset = offset
+        self._count, = COUNT.unpack_from(snapshot.data, offset + 1)
+        self._owner = weakref.ref(owner)
+        self._decoded = {}
+        self._dict = None
+
+    def _entry(self, position):
+        start = self._offset + 1 + COUNT.size + position * ENTRY.size
+        return ENTRY.unpack_from(self._snapshot.data, start)
+
+    def _key(self, position):
+        return self._snapshot.string(self._entry(position)[0])
+
+    def _find(self, key):
+        """Returns the position of the entry for `key`, or None.
+        """
+        if not isinstance(key, str):
+            return None
+        start = self._offset + 1 + COUNT.size + self._count * ENTRY.size
+        sorted_positions = _SortedKeys(self, start)
+        index = bisect_left(sorted_positions, key)
+        if index < self._count and sorted_positions[index] == key:
+            return COUNT.unpack_from(self._snapshot.data, start + index * COUNT.size)[0]
+        return None
+
+    def _value(self, position):
+        key_offset, offset = self._entry(position)
+        key = self._snapshot.string(key_offset)
+        if key in self._decoded:
+            return self._decoded[key]
+        tag = self._snapshot.data[offset]
+        if tag == OBJECT or tag == ARRAY:
+            value = self._decoded[key] = self._container(offset, (key,))
+            return value
+        return self._snapshot.scalar(offset, tag)
+
+    def _container(self, offset, steps):
+        owner = self._owner()
+        data = self._snapshot.data
+        if data[offset] == OBJECT:
+            node = type(owner).__new__(type(owner))
+            node.store = MappedStore(self._snapshot, offset, node)
+            owner._adopt(node, steps)
+            return node
+        count, = COUNT.unpack_from(data, offset + 1)
+        start = offset + 1 + COUNT.size
+        items = []
+        for index in range(count):
+            item_offset, = OFFSET.unpack_from(data, start + index * OFFSET.size)
+            tag = data[item_offset]
+            if tag == OBJECT or tag == ARRAY:
+                items.append(self._container(item_offset, steps + (index,)))
+            else:
+                items.append(self._snapshot.scalar(item_offset, tag))
+        return items
+
+    def _copy_out(self):
+        if self._dict is None:
+            self._dict = {key: self._value(position) for position, key in
+                          enumerate(map(self._key, range(self._count)))}
+            self._decoded = None
+        return self._dict
+
+    def __getitem__(self, key):
+        if self._dict is not None:
+            return self._dict[key]
+        position = self._find(key)
+        if position is None:
+            raise KeyError(key)
+        return self._value(position)
+
+    def __setitem__(self, key, value):
+        self._copy_out()[key] = value
+
+    def __delitem__(self, key):
+        del self._copy_out()[key]
+
+    def __contains__(self, key):
+        if self._dict is not None:
+            return key in self._dict
+        return self._find(key) is not None
+
+    def __iter__(self):
+        if self._dict is not None:
+            return iter(self._dict)
+        return map(self._key, range(self._count))
+
+    def __len__(self):
+        return self._count if self._dict is None else len(self._dict)
+
+    def items(self):
+        if self._dict is not None:
+            return self._dict.items()
+        return ((self._key(position), self._value(position)) for position in range(self._count))
+
+    def values(self):
+        return (value for _, value in self.items())
+
+    def __reduce__(self):
+        # Copies of a mapped object are ordinary dictionaries
+        return (dict, (list(self.items()),))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class _SortedKeys:
+    """The keys of a MappedStore in sorted order, as a sequence for bisect.
+    """
+    __slots__ = ('_store', '_start')
+
+    def __init__(self, store, start):
+        self._store = store
+        self._start = start
+
+    def __len__(self):
+        return self._store._count
+
+    def __getitem__(self, index):
+        position, = COUNT.unpack_from(self._store._snapshot.data, self._start + index * COUNT.size)
+        return self._store._key(position)
+
+
+def _open(cls, snapshot, source):
+    if snapshot.data[snapshot.root] != OBJECT:
+        raise ValueError("Snapshot doesn't hold an object: {}".format(source))
+    pelican = cls.__new__(cls)
+    pelican.store = MappedStore(snapshot, snapshot.root, pelican)
+    return pelican
+
+
+def load(cls, path):
+    """Opens the snapshot file at `path` as a `cls` object.
+    """
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _open(cls, Snapshot(data, path), path)
+
+
+class SharedSnapshot:
+    """A snapshot of a `cls` object in the shared memory block called
+    `name`. It pickles as just those two, so it may be handed to other
+    processes, which `open` it. The process that made it with `share`
+    should `unlink` it once they're done (leaving a `with` block does that).
+    """
+    def __init__(self, name, cls):
+        self.name = name
+        self.cls = cls
+        self._memory = None
+
+    def open(self):
+        """Maps the shared block and returns the `cls` object it holds, whose
+        nodes are decoded from the block as they're reached.
+        """
+        from multiprocessing import shared_memory
+        memory = shared_memory.SharedMemory(name=self.name)
+        return _open(self.cls, Snapshot(memory.buf, self.name, memory), self.name)
+
+    def unlink(self):
+        """Frees the shared block. Objects already opened from it keep
+        working, but it can't be opened again.
+        """
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.unlink()
+
+    def __reduce__(self):
+        return (SharedSnapshot, (self.name, self.cls))
+
+    def __repr__(self):
+        return "<SharedSnapshot: {}>".format(self.name)
+
+
+def share(pelican, object_type):
+    """Writes `pelican` into a new shared memory block and returns a
+    SharedSnapshot of it.
+    """
+    from multiprocessing import shared_memory
+    data = dumps(pelican, object_type)
+    memory = shared_memory.SharedMemory(create=True, size=len(data))
+    memory.buf[:len(data)] = data
+    shared = SharedSnapshot(memory.name, type(pelican))
+    shared._memory = memory
+    return shared
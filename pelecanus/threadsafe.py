@@ -0,0 +1,338 @@
+"""An opt-in thread-safe wrapper for PelicanJson objects that are shared
+between threads (in a threaded web server, for instance).
+
+PelicanJson objects are not safe to edit while another thread is iterating
+through them: a generator such as `enumerate` or `search_key` may raise
+"dictionary changed size during iteration" or return a mix of old and new
+values. ThreadSafePelicanJson guards the object with a reader-writer lock,
+so any number of threads may read at the same time while writers get
+exclusive access::
+
+   >>> shared = ThreadSafePelicanJson({'links': {'self': 'a'}})
+   >>> shared.get_nested_value(['links', 'self'])
+   'a'
+   >>> shared.set_nested_value(['links', 'self'], 'b')
+
+Generators take a snapshot of their results while holding the read lock, so
+a writer may run as soon as the snapshot is taken and a reader never sees a
+half-finished write. For the same reason, nested objects and lists are
+handed out as copies taken under the lock, rather than as the live parts of
+the shared document: use `writing` to change them in place.
+"""
+import asyncio
+from contextlib import contextmanager
+import copy
+from functools import wraps
+import threading
+
+from .arrays import LIST_TYPES
+from .pelicanjson import PelicanJson
+
+
+class ReadWriteLock:
+    """A lock that many readers may hold at once, but which a writer holds
+    alone. Waiting writers are given preference over new readers so that a
+    steady stream of reads can't starve them.
+
+    Not reentrant: a thread holding the lock must not acquire it again.
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+def _detached(value):
+    """Returns a copy of `value` if it's an object or a list, which another
+    thread could change once the lock has been released.
+    """
+    if isinstance(value, (PelicanJson,) + LIST_TYPES):
+        return copy.deepcopy(value)
+    return value
+
+
+def _reader(method):
+    @wraps(method)
+    def inner(self, *args, **kwargs):
+        with self.lock.read_locked():
+            return method(self, *args, **kwargs)
+    return inner
+
+
+def _snapshot(method):
+    """Collects a generator's results under the read lock and returns an
+    iterator over them.
+    """
+    @wraps(method)
+    def inner(self, *args, **kwargs):
+        with self.lock.read_locked():
+            return iter(list(method(self, *args, **kwargs)))
+    return inner
+
+
+def _writer(method):
+    @wraps(method)
+    def inner(self, *args, **kwargs):
+        with self.lock.write_locked():
+            return method(self, *args, **kwargs)
+    return inner
+
+
+class ThreadSafePelicanJson:
+    """Wraps a PelicanJson object (or a dictionary, which gets turned into
+    one) and guards every method with a ReadWriteLock. The wrapper offers the
+    same methods as PelicanJson.
+
+    For compound operations that must happen atomically, use the `reading`
+    and `writing` context managers, which hand back the wrapped object::
+
+       >>> with shared.writing() as pelican:
+       ...     if 'next' not in pelican:
+       ...         pelican.create_path(['links', 'next'], 'c')
+
+    """
+    def __init__(self, *args, **kwargs):
+        if len(args) == 1 and not kwargs and isinstance(args[0], PelicanJson):
+            self.pelican = args[0]
+        else:
+            self.pelican = PelicanJson(*args, **kwargs)
+        self.lock = ReadWriteLock()
+
+    @contextmanager
+    def reading(self):
+        with self.lock.read_locked():
+            yield self.pelican
+
+    @contextmanager
+    def writing(self):
+        with self.lock.write_locked():
+            yield self.pelican
+
+    def __repr__(self):
+        return "<ThreadSafePelicanJson: {}>".format(str(self.pelican.store))
+
+    # Readers
+    @_reader
+    def __getitem__(self, key):
+        return _detached(self.pelican[key])
+
+    @_reader
+    def __contains__(self, key):
+        return key in self.pelican
+
+    @_reader
+    def __len__(self):
+        return len(self.pelican)
+
+    @_reader
+    def __eq__(self, other):
+        if isinstance(other, ThreadSafePelicanJson):
+            other = other.pelican
+        return self.pelican == other
+
+    __hash__ = None
+
+    @_reader
+    def __str__(self):
+        return str(self.pelican)
+
+    @_reader
+    def get(self, *args, **kwargs):
+        return _detached(self.pelican.get(*args, **kwargs))
+
+    @_reader
+    def get_nested_value(self, *args, **kwargs):
+        return _detached(self.pelican.get_nested_value(*args, **kwargs))
+
+    @_reader
+    def safe_get_nested_value(self, *args, **kwargs):
+        return _detached(self.pelican.safe_get_nested_value(*args, **kwargs))
+
+    @_reader
+    def count_key(self, *args, **kwargs):
+        return self.pelican.count_key(*args, **kwargs)
+
+    @_reader
+    def search_many(self, *args, **kwargs):
+        return self.pelican.search_many(*args, **kwargs)
+
+    @_reader
+    def page(self, *args, **kwargs):
+        items, cursor = self.pelican.page(*args, **kwargs)
+        return [(path, _detached(value)) for path, value in items], cursor
+
+    @_reader
+    def path_of(self, *args, **kwargs):
+        return self.pelican.path_of(*args, **kwargs)
+
+    @_reader
+    def convert(self):
+        return self.pelican.convert()
+
+    @_reader
+    def serialize(self, *args, **kwargs):
+        return self.pelican.serialize(*args, **kwargs)
+
+    @_reader
+    def dump_binary(self, *args, **kwargs):
+        self.pelican.dump_binary(*args, **kwargs)
+
+    @_reader
+    def memory_stats(self):
+        return self.pelican.memory_stats()
+
+    @_reader
+    def project(self, *args, **kwargs):
+        return self.pelican.project(*args, **kwargs)
+
+    # Generators: these return snapshots
+    @_snapshot
+    def __iter__(self):
+        return iter(self.pelican)
+
+    @_snapshot
+    def keys(self, *args, **kwargs):
+        return self.pelican.keys(*args, **kwargs)
+
+    @_snapshot
+    def values(self):
+        return map(_detached, self.pelican.values())
+
+    @_snapshot
+    def items(self, *args, **kwargs):
+        return ((key, _detached(value)) for key, value in self.pelican.items(*args, **kwargs))
+
+    @_snapshot
+    def enumerate(self, *args, **kwargs):
+        return ((path, _detached(value)) for path, value in self.pelican.enumerate(*args, **kwargs))
+
+    @_snapshot
+    def paths(self, *args, **kwargs):
+        return self.pelican.paths(*args, **kwargs)
+
+    @_snapshot
+    def search_key(self, *args, **kwargs):
+        return self.pelican.search_key(*args, **kwargs)
+
+    @_snapshot
+    def search_value(self, *args, **kwargs):
+        return self.pelican.search_value(*args, **kwargs)
+
+    @_snapshot
+    def search_hits(self, *args, **kwargs):
+        return self.pelican.search_hits(*args, **kwargs)
+
+    @_snapshot
+    def pluck(self, *args, **kwargs):
+        return map(_detached, self.pelican.pluck(*args, **kwargs))
+
+    # Async generators: these hand out a snapshot, taken all at once, as the
+    # lock can't be held across an await: a task on the same loop waiting
+    # to write would block the loop's thread for good.
+    async def _trickle(self, results, budget):
+        budget = budget or self.pelican.ASYNC_BUDGET
+        for count, result in enumerate(results, start=1):
+            yield result
+            if count % budget == 0:
+                await asyncio.sleep(0)
+
+    async def aenumerate(self, budget=None):
+        async for result in self._trickle(self.enumerate(), budget):
+            yield result
+
+    async def asearch_key(self, searchkey, budget=None):
+        async for result in self._trickle(self.search_key(searchkey), budget):
+            yield result
+
+    async def asearch_value(self, searchval, budget=None):
+        async for result in self._trickle(self.search_value(searchval), budget):
+            yield result
+
+    # Writers
+    @_writer
+    def __setitem__(self, key, value):
+        self.pelican[key] = value
+
+    @_writer
+    def __delitem__(self, key):
+        del self.pelican[key]
+
+    @_writer
+    def update(self, *args, **kwargs):
+        self.pelican.update(*args, **kwargs)
+
+    @_writer
+    def set_nested_value(self, *args, **kwargs):
+        self.pelican.set_nested_value(*args, **kwargs)
+
+    @_writer
+    def create_path(self, *args, **kwargs):
+        self.pelican.create_path(*args, **kwargs)
+        return self
+
+    @_writer
+    def find_and_replace(self, *args, **kwargs):
+        self.pelican.find_and_replace(*args, **kwargs)
+
+    @_writer
+    def deep_merge(self, *args, **kwargs):
+        self.pelican.deep_merge(*args, **kwargs)
+        return self
+
+    @_writer
+    def move_path(self, *args, **kwargs):
+        self.pelican.move_path(*args, **kwargs)
+
+    @_writer
+    def rename_key(self, *args, **kwargs):
+        return self.pelican.rename_key(*args, **kwargs)
+
+    @_writer
+    def delete_paths(self, *args, **kwargs):
+        return self.pelican.delete_paths(*args, **kwargs)
+
+    @_writer
+    def delete_where(self, *args, **kwargs):
+        return self.pelican.delete_where(*args, **kwargs)
@@ -2,7 +2,16 @@
 PelicanJson. None of these functions create PelicanJson objects.
 Instead they operate on nested Python dictionaries.
 """
+from collections import deque
 from functools import wraps
+import json
+import mmap
+import os
+import re
+
+from . import codecs
+from .arrays import LIST_TYPES
+from .exceptions import StaleIndex
 
 
 def new_json_from_path(path, value):
@@ -40,15 +49,97 @@ def backfill_append(listobject, index, item):
     temp_list = listobject[:]
     if index >= len(temp_list):
         difference = index - len(temp_list)
-        backfill = [None for x in range(difference)]
-        backfill.append(item)
-        temp_list.extend(backfill)
+        temp_list.extend([None] * difference)
+        temp_list.append(item)
     else:
         temp_list[index] = item
     return temp_list
 
 
-def find_value(json_result, value, path=None):
+def walk(json_result, path=None, prune=None, order='dfs', max_depth=None):
+    """Iterates through every key and index inside a nested JSON object,
+    depth-first, yielding `(prefix, key, value, container)` tuples, where
+    `container` is the dict or list holding `value` and `prefix` is the path
+    to `container` as a tuple, so `prefix + (key,)` is the path to `value`.
+
+    The searches in this module are built on `walk` (`count_key` needs no
+    paths, so it only looks up the key in each object). `walk` keeps
+    its own stack instead of recursing, so it isn't bounded by the recursion
+    limit, and the prefix tuple for each dict or list is built once and shared
+    by everything inside it.
+
+    Args:
+
+       `json_result` -- JSON object
+
+    Kwargs:
+
+       `path` -- prefix for the paths returned
+       `prune` -- called as `prune(prefix, key, value, container)` for every
+       dict or list before it is walked into: return True to skip it
+       `order` -- 'dfs' (depth-first, the default) or 'bfs' (breadth-first:
+       every key is visited before any key nested more deeply)
+       `max_depth` -- only visit paths up to this long (not counting `path`)
+
+    To stop early, stop iterating: nothing past the last slot taken is
+    visited::
+
+       >>> for prefix, key, value, _ in walk(some_nested_json):
+       ...     if key == 'self':
+       ...         break
+
+    """
+    if isinstance(json_result, dict):
+        slots = iter(json_result.items())
+    elif isinstance(json_result, list):
+        slots = enumerate(json_result)
+    else:
+        return
+    prefix = tuple(path or ())
+    # Containers are only walked into if their prefix is shorter
+    limit = None if max_depth is None else len(prefix) + max_depth - 1
+    if order == 'bfs':
+        yield from _walk_bfs(json_result, prefix, slots, prune, limit)
+        return
+    elif order != 'dfs':
+        raise ValueError("order must be 'dfs' or 'bfs': {}".format(order))
+
+    stack = [(prefix, json_result, slots)]
+    while stack:
+        prefix, container, slots = stack[-1]
+        for key, value in slots:
+            yield prefix, key, value, container
+            if isinstance(value, dict):
+                if limit is not None and len(prefix) >= limit:
+                    continue
+                if prune is None or not prune(prefix, key, value, container):
+                    stack.append((prefix + (key,), value, iter(value.items())))
+                    break
+            elif isinstance(value, list):
+                if limit is not None and len(prefix) >= limit:
+                    continue
+                if prune is None or not prune(prefix, key, value, container):
+                    stack.append((prefix + (key,), value, enumerate(value)))
+                    break
+        else:
+            stack.pop()
+
+
+def _walk_bfs(json_result, prefix, slots, prune, limit):
+    queue = deque([(prefix, json_result, slots)])
+    while queue:
+        prefix, container, slots = queue.popleft()
+        walk_into = limit is None or len(prefix) < limit
+        for key, value in slots:
+            yield prefix, key, value, container
+            if not walk_into or not isinstance(value, (dict, list)):
+                continue
+            if prune is None or not prune(prefix, key, value, container):
+                items = value.items() if isinstance(value, dict) else enumerate(value)
+                queue.append((prefix + (key,), value, items))
+
+
+def find_value(json_result, value, path=None, tuples=False):
     """Generator function for finding various paths to the value passed in.
     This function can handle arrays or objects and will return indices for
     array values and string keys for dictionary keys accessed to find the
@@ -59,6 +150,11 @@ def find_value(json_result, value, path=None):
        `json_result` -- JSON object
        `value` -- value to search for
 
+    Kwargs:
+
+       `path` -- prefix for the paths returned
+       `tuples` -- return paths as tuples instead of lists
+
     Returns:
 
        Generator of lists that each represent a path to the value searched for.
@@ -71,29 +167,23 @@ def find_value(json_result, value, path=None):
        'SOMEVALUE'
 
     """
-    if path is None:
-        path = []
-    if isinstance(json_result, dict):
-        for k, v in json_result.items():
-            current_path = path[:]
-            current_path.append(k)
-            if value == v:
-                yield current_path
-            else:
-                yield from find_value(v, value, path=current_path)
-
-    elif isinstance(json_result, list):
-        for idx, item in enumerate(json_result):
-            current_path = path[:]
-            current_path.append(idx)
-            yield from find_value(item, value, path=current_path)
-    else:
+    if not isinstance(json_result, (dict, list)):
         if json_result == value:
-            yield path
+            yield tuple(path or ()) if tuples else list(path or ())
+        return
+
+    # A dict value which matches is a result, so it isn't searched inside
+    def matched(prefix, key, v, container):
+        return isinstance(container, dict) and v == value
+
+    for prefix, key, v, container in walk(json_result, path, prune=matched):
+        if v == value and (isinstance(container, dict) or not isinstance(v, (dict, list))):
+            current_path = prefix + (key,)
+            yield current_path if tuples else list(current_path)
 
 
 def count_key(json_result, key):
-    """Recursive method for counting the appearance of a particular key
+    """Method for counting the appearance of a particular key
     inside a nested JSON object. This was created mostly to make sure that the
     generator below stays honest.
 
@@ -110,25 +200,25 @@ def count_key(json_result, key):
        10
 
     """
-    def counter(jresult):
-        if isinstance(jresult, dict):
-            for k, v in jresult.items():
-                if key == k:
-                    yield 1
-                if isinstance(v, dict):
-                    yield from counter(v)
-                elif isinstance(v, list):
-                    for item in v:
-                        yield from counter(item)
-        elif isinstance(jresult, list):
-            for item in jresult:
-                yield from counter(item)
-        else:
-            yield 0
-    return sum(counter(json_result))
-
-
-def generate_paths(json_result, path=None):
+    # Neither paths nor order matter here, so rather than `walk` every slot
+    # this only visits the objects and lists, looking the key up in each
+    if not isinstance(json_result, (dict, list)):
+        return 0
+    count = 0
+    stack = [json_result]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if key in node:
+                count += 1
+            node = node.values()
+        for value in node:
+            if isinstance(value, (dict, list)):
+                stack.append(value)
+    return count
+
+
+def generate_paths(json_result, path=None, tuples=False):
     """Generator function for introspecting a nested JSON object and finding all
     routes. Unlike `paths` for a `PelicanJson` object, which only yields paths
     that lead directly to whole values (and not nested objects), the
@@ -141,6 +231,11 @@ def generate_paths(json_result, path=None):
 
        `json_result` -- JSON object
 
+    Kwargs:
+
+       `path` -- prefix for the paths returned
+       `tuples` -- return paths as tuples instead of lists
+
     Returns:
 
        Generator of lists that each represent a path inside the object.
@@ -151,27 +246,18 @@ def generate_paths(json_result, path=None):
        [['key1, 'key2', key3']['another_object', 'another_key', 1']]
 
     """
-    if path is None:
-        path = []
-    if isinstance(json_result, dict):
-        for k, v in json_result.items():
-            current_path = path[:]
-            current_path.append(k)
-            yield current_path
-
-            if isinstance(v, dict) or isinstance(v, list):
-                yield from generate_paths(v, path=current_path)
+    if not isinstance(json_result, (dict, list)):
+        yield tuple(path or ()) if tuples else list(path or ())
+        return
 
-    elif isinstance(json_result, list):
-        for idx, item in enumerate(json_result):
-            current_path = path[:]
-            current_path.append(idx)
-            yield from generate_paths(item, path=current_path)
-    else:
-        yield path
+    for prefix, key, value, container in walk(json_result, path):
+        # Objects inside lists are only walked into, not yielded
+        if isinstance(container, dict) or not isinstance(value, (dict, list)):
+            current_path = prefix + (key,)
+            yield current_path if tuples else list(current_path)
 
 
-def generate_paths_to_key(json_result, key, path=None):
+def generate_paths_to_key(json_result, key, path=None, tuples=False):
     """Generator function for introspecting a nested JSON object and finding all
     routes to a particular key. If, for instance, the key 'href' appears inside
     the JSON object 11 times, this generator will return 11 separate results,
@@ -185,6 +271,11 @@ def generate_paths_to_key(json_result, key, path=None):
        `json_result` -- JSON object
        `key` -- Key to find routes for
 
+    Kwargs:
+
+       `path` -- prefix for the paths returned
+       `tuples` -- return paths as tuples instead of lists
+
     Returns:
 
        Generator of lists that each represent one path to the key passed in.
@@ -197,30 +288,103 @@ def generate_paths_to_key(json_result, key, path=None):
        'SOMEVALUE'
 
     """
-    if path is None:
-        path = []
-    if isinstance(json_result, dict):
-        for k, v in json_result.items():
-            if key == k:
-                current_path = path[:]
-                current_path.append(key)
-                yield current_path
-            else:
-                current_path = path[:]
-                current_path.append(k)
-                yield from generate_paths_to_key(v, key, path=current_path)
+    # Objects holding the key aren't searched any further
+    def found(prefix, k, value, container):
+        return k == key and isinstance(container, dict)
 
-    elif isinstance(json_result, list):
-        for idx, item in enumerate(json_result):
-            current_path = path[:]
-            current_path.append(idx)
-            yield from generate_paths_to_key(item, key, path=current_path)
+    for prefix, k, _, container in walk(json_result, path, prune=found):
+        if k == key and isinstance(container, dict):
+            current_path = prefix + (k,)
+            yield current_path if tuples else list(current_path)
+
+
+def search_hits(json_result, keys=(), values=(), predicates=None, path=None,
+                tuples=False):
+    """Generator function for searching a nested JSON object for many keys,
+    values and predicates at once. However many targets are passed in, the
+    object is walked only once.
+
+    Args:
+
+       `json_result` -- JSON object
+
+    Kwargs:
+
+       `keys` -- keys to search for
+       `values` -- values to search for: these must be hashable
+       `predicates` -- dictionary of names to functions called as
+       `predicate(key, value)` for every key and index inside the object
+       `path` -- prefix for the paths returned
+       `tuples` -- return paths as tuples instead of lists
+
+    Returns:
+
+       Generator of `(kind, target, path)` tuples, where `kind` is one of
+       'key', 'value' or 'predicate' and `target` is the key, value or
+       predicate name found at `path`.
+
+    Usage::
+
+       >>> list(search_hits(some_nested_json, keys=['href', 'self'],
+       ...                  values=[None]))
+       [('key', 'self', ['links', 'self']),
+        ('key', 'href', ['links', 'self', 'href']),
+        ('value', None, ['attributes', 'title'])]
+
+    Unlike `generate_paths_to_key` and `find_value`, the objects holding a
+    key or value found are still searched inside.
+    """
+    keys = {key: key for key in keys}
+    values = {value: value for value in values}
+    predicates = predicates or {}
+    for prefix, key, value, container in walk(json_result, path):
+        if key in keys and isinstance(container, dict):
+            current_path = prefix + (key,)
+            yield 'key', keys[key], current_path if tuples else list(current_path)
+        if not isinstance(value, (dict, list)) and value in values:
+            current_path = prefix + (key,)
+            yield 'value', values[value], current_path if tuples else list(current_path)
+        for name, predicate in predicates.items():
+            if predicate(key, value):
+                current_path = prefix + (key,)
+                yield 'predicate', name, current_path if tuples else list(current_path)
+
+
+def search_many(json_result, keys=(), values=(), predicates=None, path=None,
+                tuples=False):
+    """Searches a nested JSON object for many keys, values and predicates in
+    a single pass, with the same arguments as `search_hits`.
+
+    Returns:
+
+       Dictionary of the paths found for each target, by kind::
+
+          >>> search_many(some_nested_json, keys=['href', 'self'],
+          ...             values=[None])
+          {'key': {'href': [['links', 'self', 'href']],
+                   'self': [['links', 'self']]},
+           'value': {None: [['attributes', 'title']]},
+           'predicate': {}}
+
+    """
+    hits = search_hits(json_result, keys=keys, values=values,
+                       predicates=predicates, path=path, tuples=tuples)
+    return _collect_hits(hits, keys, values, predicates)
+
+
+def _collect_hits(hits, keys, values, predicates):
+    found = {'key': {key: [] for key in keys},
+             'value': {value: [] for value in values},
+             'predicate': {name: [] for name in predicates or {}}}
+    for kind, target, current_path in hits:
+        found[kind][target].append(current_path)
+    return found
 
 
 def reverse_result(func):
-    """The recursive function `get_path` returns results in order reversed
-    from desired. This decorator just reverses those results before returning
-    them to caller.
+    """Recursive functions which build a path on the way back out (as
+    `get_path` once did) return it in order reversed from desired. This
+    decorator just reverses those results before returning them to caller.
     """
     @wraps(func)
     def inner(*args, **kwargs):
@@ -230,8 +394,7 @@ def reverse_result(func):
     return inner
 
 
-@reverse_result
-def get_path(json_result, key, path=None):
+def get_path(json_result, key, path=None, order='dfs', max_depth=None):
     """Find first occurrence of a key inside a nested dictionary. This is helpful
     only for unique keys across all nested brances of a dictionary and will
     return confusing results for dictionaries that do not conform to this rule.
@@ -261,32 +424,20 @@ def get_path(json_result, key, path=None):
 
     Kwargs:
 
-       `path` -- The path gets built on recursive calls.
+       `path` -- prefix for the path returned
+       `order` -- 'dfs' finds the first occurrence in depth-first order (the
+       default); 'bfs' finds the shallowest one
+       `max_depth` -- don't look for the key in paths longer than this
 
     This function is only valid for unique keys. Use `generate_paths` to
     find all routes to a particular key inside a JSON object.
     """
-    if path is None:
-        path = []
     if isinstance(json_result, int) or isinstance(json_result, str):
-        path = []
-        return path
-    elif isinstance(json_result, dict):
-        for k, v in json_result.items():
-            if key == k:
-                path.append(key)
-                return path
-            else:
-                result = get_path(v, key, path)
-                if result:
-                    path.append(k)
-                    return path
-    elif isinstance(json_result, list):
-        for idx, item in enumerate(json_result):
-            result = get_path(item, key, path)
-            if result:
-                path.append(idx)
-                return path
+        return []
+    for prefix, k, _, container in walk(json_result, path, order=order,
+                                        max_depth=max_depth):
+        if k == key and isinstance(container, dict):
+            return list(prefix + (k,))
 
 
 def get_nested_value(json_result, keys):
@@ -359,3 +510,389 @@ def set_nested_value(json_result, path, newvalue):
     else:
         key, *_ = path
         json_result[key] = newvalue
+
+
+class _Any:
+    """The type of ANY, which stands for every key or index in a path.
+    """
+    def __repr__(self):
+        return 'ANY'
+
+    def __reduce__(self):
+        return 'ANY'
+
+
+# In a path given to `project`, matches every key of an object or index of
+# a list
+ANY = _Any()
+
+
+def _path_trie(paths):
+    """Merges `paths` into a trie of nested dictionaries, keyed by step. A
+    step leading to True selects everything below it, so a path which ends
+    where another passes through takes precedence over it. Returns True if
+    one of `paths` is empty (which selects everything).
+    """
+    trie = {}
+    for path in paths:
+        if len(path) == 0:
+            return True
+        node = trie
+        for step in path[:-1]:
+            node = node.setdefault(step, {})
+            if node is True:
+                break
+        else:
+            node[path[-1]] = True
+    return trie
+
+
+def _branches(tries, steps):
+    """Returns True if one of `tries` selects everything under `steps` (a
+    key, or an index and the same index counted from the end), or else the
+    tries which apply below it.
+    """
+    below = []
+    for trie in tries:
+        for step in steps + (ANY,):
+            branch = trie.get(step)
+            if branch is True:
+                return True
+            elif branch is not None:
+                below.append(branch)
+    return below
+
+
+def _project(node, tries, compact, leaf, members_of):
+    """Returns the parts of `node` selected by `tries`, or None if there
+    aren't any. Selected values are passed through `leaf`; `members_of`
+    returns the dictionary of members of a JSON object (or None if it's
+    given anything else).
+    """
+    projected = []
+    frame = _project_frame(node, tries, members_of, projected, None)
+    stack = [] if frame is None else [frame]
+    while stack:
+        # `source` holds the members of the node being projected and
+        # `picked` the parts selected from them so far; once they're all
+        # done, the result is added to `parent` under `slot`
+        source, selected, picked, length, parent, slot = stack[-1]
+        for key, branches in selected:
+            if branches is True:
+                picked.append((key, leaf(source[key])))
+            elif branches:
+                frame = _project_frame(source[key], branches, members_of, picked, key)
+                if frame is not None:
+                    stack.append(frame)
+                    break
+        else:
+            stack.pop()
+            if picked:
+                parent.append((slot, _assemble(picked, length, compact)))
+    return projected[0][1] if projected else None
+
+
+def _project_frame(node, tries, members_of, parent, slot):
+    """Returns a frame for `_project` to select the parts of `node` that
+    `tries` pick out, or None if it's neither an object nor a list.
+    """
+    wildcard = any(ANY in trie for trie in tries)
+    members = members_of(node)
+    if members is not None:
+        if wildcard:
+            keys = list(members)
+        else:
+            keys = list(dict.fromkeys(key for trie in tries for key in trie if key in members))
+        selected = ((key, _branches(tries, (key,))) for key in keys)
+        return members, selected, [], None, parent, slot
+    elif isinstance(node, LIST_TYPES):
+        length = len(node)
+        if wildcard:
+            indices = range(length)
+        else:
+            indices = sorted({index + length if index < 0 else index
+                              for trie in tries for index in trie
+                              if isinstance(index, int) and -length <= index < length})
+        selected = ((index, _branches(tries, (index, index - length))) for index in indices)
+        return node, selected, [], length, parent, slot
+    return None
+
+
+def _assemble(picked, length, compact):
+    """Builds the object (or the list, if there's a `length`) holding the
+    `(key, value)` pairs picked from one by `_project`.
+    """
+    if length is None:
+        return dict(picked)
+    if compact:
+        return [value for _, value in picked]
+    # Items which weren't selected are left as None, so that the ones
+    # which were stay where they were
+    result = [None] * (picked[-1][0] + 1)
+    for index, value in picked:
+        result[index] = value
+    return result
+
+
+def _dictionary(node):
+    return node if isinstance(node, dict) else None
+
+
+def project(json_result, paths, compact=False):
+    """Returns a new dictionary holding only the values at the end of
+    `paths` (and the objects and lists leading to them). A path may use
+    ANY to stand for every key or index at that step::
+
+       >>> project(hal, [['_links', 'self'], ['items', ANY, 'id']])
+       {'_links': {'self': {'href': '/items'}}, 'items': [{'id': 1}, {'id': 2}]}
+
+    The paths are merged into a trie first, so the document is walked once
+    and nothing outside the paths is visited. Paths which aren't in the
+    document are left out. The selected values are not copied.
+
+    kwargs:
+       `compact` (bool): leave out the items of lists that weren't selected,
+       rather than leaving None in their places so that the selected items
+       keep their indices.
+    """
+    trie = _path_trie(paths)
+    if trie is True:
+        return json_result
+    return _project(json_result, [trie], compact, lambda value: value, _dictionary) or {}
+
+
+def loads(data, codec=None):
+    """Parses the JSON text `data` (str or UTF-8 bytes) with `codec` (the
+    name of a codec in `pelecanus.codecs`) or the default codec.
+    """
+    return codecs.loads(data, codec)
+
+
+def dumps(json_result, codec=None):
+    """Returns the JSON text of `json_result`, made with `codec` (the name
+    of a codec in `pelecanus.codecs`) or the default codec.
+    """
+    return codecs.dumps(json_result, codec)
+
+
+# Scanning raw JSON text without parsing it
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_SCALAR = re.compile(rb'[^ \t\n\r\[\]{}:,"]+')
+_BRACKETS = re.compile(rb'([\[{])|([\]}])|"(?:[^"\\]|\\.)*"', re.DOTALL)
+_OPENERS = frozenset(b'[{')
+_CLOSERS = {ord('['): ord(']'), ord('{'): ord('}')}
+
+INDEX_SUFFIX = '.pelican-index'
+INDEX_VERSION = 1
+
+
+def _skip_whitespace(data, pos):
+    return _WHITESPACE.match(data, pos).end()
+
+
+def _value_end(data, pos):
+    """Returns the offset just past the JSON value starting at `pos` in
+    `data`. Objects and lists are skipped by counting brackets (outside of
+    strings), without parsing anything in them.
+    """
+    if pos >= len(data):
+        raise ValueError("Expected a JSON value at offset {}".format(pos))
+    if data[pos] in _OPENERS:
+        depth = 0
+        for match in _BRACKETS.finditer(data, pos):
+            if match.lastindex == 1:
+                depth += 1
+            elif match.lastindex == 2:
+                depth -= 1
+                if depth == 0:
+                    return match.end()
+        raise ValueError("Unterminated JSON container at offset {}".format(pos))
+    match = (_STRING if data[pos] == ord('"') else _SCALAR).match(data, pos)
+    if match is None:
+        raise ValueError("Expected a JSON value at offset {}".format(pos))
+    return match.end()
+
+
+def _container_ends(data, pos, max_depth=None):
+    """Scans the JSON object or list starting at `pos` in `data` once, for
+    brackets outside of strings, and returns a dictionary mapping the offset
+    of each object and list in it (down to `max_depth` levels below it) to
+    the offset just past its end.
+    """
+    ends = {}
+    openers = []
+    for match in _BRACKETS.finditer(data, pos):
+        if match.lastindex == 1:
+            openers.append(match.start())
+        elif match.lastindex == 2:
+            start = openers.pop()
+            if _CLOSERS[data[start]] != data[match.start()]:
+                raise ValueError("Mismatched bracket at offset {}".format(match.start()))
+            if max_depth is None or len(openers) <= max_depth:
+                ends[start] = match.end()
+            if not openers:
+                return ends
+    raise ValueError("Unterminated JSON container at offset {}".format(pos))
+
+
+def _json_members(data, pos, value_end=None):
+    """Yields `(key, start, end)` for each member of the JSON object or list
+    starting at `pos` in `data` (keys are indices for lists), where
+    `data[start:end]` is the text of the member's value. Values are skipped
+    with `_value_end`, or with `value_end(start, key)` if it's given.
+    """
+    close = ord('}') if data[pos] == ord('{') else ord(']')
+    pos = _skip_whitespace(data, pos + 1)
+    index = 0
+    while pos < len(data) and data[pos] != close:
+        key = index
+        if close == ord('}'):
+            match = _STRING.match(data, pos)
+            if match is None:
+                raise ValueError("Expected a key at offset {}".format(pos))
+            key = json.loads(data[pos:match.end()].decode('utf-8'))
+            pos = _skip_whitespace(data, match.end())
+            if data[pos:pos + 1] != b':':
+                raise ValueError("Expected ':' at offset {}".format(pos))
+            pos = _skip_whitespace(data, pos + 1)
+        end = _value_end(data, pos) if value_end is None else value_end(pos, key)
+        yield key, pos, end
+        pos = _skip_whitespace(data, end)
+        if data[pos:pos + 1] == b',':
+            pos = _skip_whitespace(data, pos + 1)
+        elif data[pos:pos + 1] != bytes([close]):
+            raise ValueError("Expected ',' at offset {}".format(pos))
+        index += 1
+    if pos >= len(data):
+        raise ValueError("Unterminated JSON container")
+
+
+def _index_path(filename):
+    return filename + INDEX_SUFFIX
+
+
+def _stamp(stat):
+    return stat.st_size, stat.st_mtime_ns
+
+
+def index_json_file(filename, max_depth=None, keys=False):
+    """Scans the JSON file `filename` once and writes a sidecar index next to
+    it (`filename` + INDEX_SUFFIX) with the byte offset and length of each
+    object and list in the file. Returns the index, for use with
+    `get_nested_value_from_file`::
+
+       >>> index = index_json_file('ricketts.json', max_depth=2)
+       >>> index['paths'][('query', 'pages')]
+       (70, 1683)
+       >>> with open('ricketts.json', 'rb') as fp:
+       ...     get_nested_value_from_file(fp, ['query', 'pages', '1422396', 'title'], index)
+       'Ed Ricketts'
+
+    The file is read through `mmap` and scanned for brackets and strings
+    without parsing any values, so indexing costs little more than reading.
+
+    kwargs:
+       `max_depth` (int): only index objects and lists whose paths are at
+       most this long. Anything deeper is reached by parsing its nearest
+       indexed ancestor, so a shallow index stays small and still finds
+       every path.
+
+       `keys` (bool): also map each key (within `max_depth`) to the paths
+       it's found at, under `index['keys']`.
+    """
+    spans = {}
+    key_paths = {} if keys else None
+
+    def scan(data, start):
+        # Records the containers from `start` down, each once its members are
+        if data[start] not in _OPENERS:
+            return _value_end(data, start)
+        ends = _container_ends(data, start, max_depth)
+
+        def value_end(pos, key):
+            return ends.get(pos) or _value_end(data, pos)
+
+        def members(prefix, start):
+            if max_depth is not None and len(prefix) >= max_depth:
+                return iter(())
+            return _json_members(data, start, value_end)
+
+        stack = [((), start, members((), start))]
+        while stack:
+            prefix, start, slots = stack[-1]
+            for key, pos, _ in slots:
+                path = prefix + (key,)
+                if key_paths is not None and isinstance(key, str):
+                    key_paths.setdefault(key, []).append(path)
+                if data[pos] in _OPENERS:
+                    stack.append((path, pos, members(path, pos)))
+                    break
+            else:
+                stack.pop()
+                spans[prefix] = (start, ends[start] - start)
+
+    with open(filename, 'rb') as f:
+        size, mtime_ns = _stamp(os.fstat(f.fileno()))
+        if size == 0:
+            raise ValueError("Empty JSON file: {}".format(filename))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            scan(data, _skip_whitespace(data, 0))
+
+    with open(_index_path(filename), 'w') as f:
+        json.dump({'version': INDEX_VERSION,
+                   'size': size,
+                   'mtime_ns': mtime_ns,
+                   'paths': [[list(path), offset, length]
+                             for path, (offset, length) in spans.items()],
+                   'keys': key_paths and {key: list(map(list, paths))
+                                          for key, paths in key_paths.items()}},
+                  f)
+    return {'size': size, 'mtime_ns': mtime_ns, 'paths': spans, 'keys': key_paths}
+
+
+def load_json_index(filename):
+    """Returns the index written by `index_json_file` for the JSON file
+    `filename`, or None if there isn't one or the file has changed size or
+    modification time since it was written.
+    """
+    try:
+        with open(_index_path(filename), 'r') as f:
+            saved = json.load(f)
+        stamp = _stamp(os.stat(filename))
+    except (OSError, ValueError):
+        return None
+    if saved.get('version') != INDEX_VERSION or (saved['size'], saved['mtime_ns']) != stamp:
+        return None
+    keys = saved['keys']
+    return {'size': saved['size'],
+            'mtime_ns': saved['mtime_ns'],
+            'paths': {tuple(path): (offset, length) for path, offset, length in saved['paths']},
+            'keys': keys and {key: list(map(tuple, paths)) for key, paths in keys.items()}}
+
+
+def get_nested_value_from_file(fp, path, index):
+    """Returns the value at the end of `path` in the JSON file open (in
+    binary mode) as `fp`, reading and parsing only the nearest object or list
+    on the path that `index` (from `index_json_file` or `load_json_index`)
+    holds. Like `get_nested_value`, returns None if `path` can't be followed.
+
+    Raises StaleIndex if the file has changed size or modification time
+    since `index` was made.
+    """
+    if _stamp(os.fstat(fp.fileno())) != (index['size'], index['mtime_ns']):
+        raise StaleIndex("Index is out of date for {}".format(getattr(fp, 'name', fp)))
+    path = tuple(path)
+    spans = index['paths']
+    depth = len(path)
+    while depth and path[:depth] not in spans:
+        depth -= 1
+    if path[:depth] not in spans:
+        # The file doesn't hold an object or list
+        return None
+    offset, length = spans[path[:depth]]
+    fp.seek(offset)
+    fragment = json.loads(fp.read(length).decode('utf-8'))
+    if depth == len(path):
+        return fragment
+    return get_nested_value(fragment, path[depth:])
@@ -0,0 +1,128 @@
+import os
+import json
+import math
+from unittest import TestCase
+
+from pelecanus import PelicanJson
+from pelecanus import codecs
+from pelecanus import toolbox
+
+
+# Fixture locations
+current_dir = os.path.abspath(os.path.dirname(__file__))
+fixture_dir = os.path.join(current_dir, 'fixtures')
+fixtures = [os.path.join(fixture_dir, name) for name in sorted(os.listdir(fixture_dir))
+            if name.endswith('.json')]
+
+EDGE_CASES = {'floats': [0.1, 1e16, 1.5e-300, 5e-324, -0.0, 2.0, 1.7976931348623157e308],
+              'ints': [0, -1, 2 ** 63 - 1, -2 ** 63, 2 ** 64, 10 ** 30, -10 ** 30],
+              'text': ['pélican', '✓ 🐦', 'tab\t"quote"\\', '</script>', ' '],
+              'z': 1, 'a': 2, 'm': [True, False, None]}
+
+
+def same(first, second):
+    """True if two loaded documents are equal and every value has the same
+    type (so that 1 and 1.0 aren't mistaken for each other).
+    """
+    if type(first) is not type(second):
+        return False
+    if isinstance(first, dict):
+        return list(first) == list(second) and all(same(first[key], second[key]) for key in first)
+    if isinstance(first, list):
+        return len(first) == len(second) and all(map(same, first, second))
+    if isinstance(first, float) and first == 0:
+        return math.copysign(1, first) == math.copysign(1, second)
+    return first == second
+
+
+class TestCodecs(TestCase):
+
+    def tearDown(self):
+        codecs.set_default(None)
+
+    def test_registry(self):
+        self.assertEqual(codecs.available()[-1], 'json')
+        self.assertEqual(codecs.default(), codecs.available()[0])
+        codecs.set_default('json')
+        self.assertEqual(codecs.default(), 'json')
+        self.assertIs(codecs.get().loads, json.loads)
+        with self.assertRaises(ValueError):
+            codecs.set_default('missing')
+        with self.assertRaises(ValueError):
+            codecs.loads('{}', codec='missing')
+
+    def test_dumps_defaults_to_json(self):
+        document = {'a': '\u00e9', 'b': [1.0, 1e16], 'c': {1: None}}
+        self.assertEqual(codecs.default(dumping=True), 'json')
+        self.assertEqual(PelicanJson(document).serialize(), json.dumps(document))
+        self.assertEqual(toolbox.dumps(document), json.dumps(document))
+        self.assertEqual(PelicanJson(document).serialize(),
+                         '{"a": "\\u00e9", "b": [1.0, 1e+16], "c": {"1": null}}')
+        codecs.set_default(codecs.available()[0])
+        self.assertEqual(codecs.default(dumping=True), codecs.available()[0])
+
+    def test_register(self):
+        calls = []
+
+        def dumps(obj):
+            calls.append(obj)
+            return json.dumps(obj)
+        codecs.register('counting', json.loads, dumps)
+        try:
+            self.assertEqual(PelicanJson({'a': 1}).serialize(codec='counting'), '{"a": 1}')
+            self.assertEqual(calls, [{'a': 1}])
+        finally:
+            del codecs.CODECS['counting']
+
+    def test_loading_parity(self):
+        texts = [json.dumps(EDGE_CASES), json.dumps(EDGE_CASES, ensure_ascii=False)]
+        for fixture in fixtures:
+            with open(fixture, 'rb') as f:
+                texts.append(f.read())
+        for name in codecs.available():
+            for text in texts:
+                expected = json.loads(text)
+                self.assertTrue(same(codecs.loads(text, name), expected), name)
+                if isinstance(text, str):
+                    self.assertTrue(same(codecs.loads(text.encode('utf-8'), name), expected), name)
+
+    def test_dumping_parity(self):
+        documents = [EDGE_CASES, {1: 'int key', 'nested': {'b': [{}, []]}}]
+        for fixture in fixtures:
+            with open(fixture, 'rb') as f:
+                documents.append(json.loads(f.read()))
+        for name in codecs.available():
+            for document in documents:
+                text = codecs.dumps(document, name)
+                self.assertIsInstance(text, str)
+                self.assertTrue(same(json.loads(text), json.loads(json.dumps(document))), name)
+
+    def test_non_finite_floats(self):
+        document = {'a': float('nan'), 'b': [float('inf'), -float('inf')], 'c': None}
+        expected = json.dumps(document)
+        for name in codecs.available():
+            self.assertEqual(json.dumps(json.loads(codecs.dumps(document, name))), expected, name)
+        self.assertEqual(json.dumps(json.loads(PelicanJson(document).serialize())), expected)
+
+    def test_pelicanjson(self):
+        with open(fixtures[0], 'rb') as f:
+            text = f.read()
+        expected = json.loads(text)
+        for name in codecs.available():
+            pelican = PelicanJson.loads(text, codec=name)
+            self.assertEqual(pelican.convert(), expected)
+            self.assertEqual(json.loads(pelican.serialize(codec=name)), expected)
+        codecs.set_default('json')
+        self.assertEqual(PelicanJson(expected).serialize(), json.dumps(expected))
+
+    def test_class_codec(self):
+        class Stdlib(PelicanJson):
+            codec = 'json'
+        self.assertEqual(Stdlib({'é': 1.0}).serialize(), '{"\\u00e9": 1.0}')
+        self.assertIsInstance(Stdlib.loads('{"a": {"b": 1}}')['a'], Stdlib)
+
+    def test_toolbox(self):
+        document = {'a': [1, 2.5, 'é']}
+        for name in codecs.available():
+            self.assertEqual(toolbox.loads(toolbox.dumps(document, name), name), document)
+        self.assertEqual(toolbox.dumps(document, 'json'), json.dumps(document))
@@ -0,0 +1,125 @@
+import os
+import copy
+import json
+import pickle
+from unittest import TestCase
+
+from pelecanus import PelicanJson
+from pelecanus import FrozenPelicanJson
+from pelecanus.frozen import FrozenList
+from pelecanus.exceptions import BadPath
+
+
+# Fixture locations
+current_dir = os.path.abspath(os.path.dirname(__file__))
+fixture_dir = os.path.join(current_dir, 'fixtures')
+# Actual datasets
+ricketts = os.path.join(fixture_dir, 'ricketts.json')
+pelecanus_occidentalis = os.path.join(fixture_dir,
+                                      'pelecanus_occidentalis.json')
+
+
+class TestFrozenPelicanJson(TestCase):
+
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+        with open(pelecanus_occidentalis, 'r') as f:
+            self.pelecanus_occidentalis = json.loads(f.read())
+
+    def test_reads_like_pelican(self):
+        frozen = FrozenPelicanJson(self.ricketts)
+        test_pelican = PelicanJson(self.ricketts)
+        self.assertEqual(frozen.convert(), self.ricketts)
+        self.assertEqual(list(frozen.enumerate()),
+                         list(test_pelican.enumerate()))
+        self.assertEqual(list(frozen.search_key('*')),
+                         list(test_pelican.search_key('*')))
+        self.assertEqual(json.loads(frozen.serialize()), self.ricketts)
+        self.assertEqual(FrozenPelicanJson(test_pelican), frozen)
+
+    def test_cannot_modify(self):
+        frozen = FrozenPelicanJson(self.ricketts)
+        with self.assertRaises(TypeError):
+            frozen['query'] = 'value'
+        with self.assertRaises(TypeError):
+            del frozen['query']
+        with self.assertRaises(TypeError):
+            frozen.get_nested_value(['query', 'normalized']).append('value')
+        with self.assertRaises(TypeError):
+            frozen.delete_paths([['query', 'normalized', 0]])
+        with self.assertRaises(TypeError):
+            frozen.delete_where(key='title')
+        with self.assertRaises(TypeError):
+            frozen.deep_merge({'query': {'pages': {}, 'new': 1}})
+        with self.assertRaises(TypeError):
+            frozen.move_path(['query', 'normalized'], ['normalized'])
+        with self.assertRaises(TypeError):
+            frozen.rename_key('query', 'q')
+        self.assertEqual(frozen.convert(), self.ricketts)
+
+    def test_set_nested_value_shares_structure(self):
+        frozen = FrozenPelicanJson(self.ricketts)
+        path = ['query', 'normalized', 0, 'to']
+        edited = frozen.set_nested_value(path, 'NEW VALUE')
+        self.assertEqual(edited.get_nested_value(path), 'NEW VALUE')
+        self.assertEqual(frozen.convert(), self.ricketts)
+        self.assertIs(edited['query-continue'], frozen['query-continue'])
+        self.assertIs(edited.get_nested_value(['query', 'pages']),
+                      frozen.get_nested_value(['query', 'pages']))
+
+    def test_set_nested_value_raises_error(self):
+        frozen = FrozenPelicanJson(self.ricketts)
+        with self.assertRaises(KeyError):
+            frozen.set_nested_value(['unknownKey', 'unknownKey2'], 'value')
+        with self.assertRaises(IndexError):
+            frozen.set_nested_value(['query', 'normalized', 1, 'to'], 'value')
+        path = ['query', 'normalized', 1, 'to']
+        edited = frozen.set_nested_value(path, 'value', force=True)
+        self.assertEqual(edited.get_nested_value(path), 'value')
+
+    def test_create_path(self):
+        frozen = FrozenPelicanJson(self.ricketts)
+        paths = [['new', 'path', 'in', 1, 'object'],
+                 ['query', 'normalized', 10, 'NEW'],
+                 ['query-continue', 'extlinks', 'eloffset', 'newkey']]
+        edited = frozen
+        for path in paths:
+            edited = edited.create_path(path, 'VALUE')
+            self.assertEqual(edited.get_nested_value(path), 'VALUE')
+            with self.assertRaises((KeyError, IndexError, TypeError)):
+                frozen.get_nested_value(path)
+        normalized = edited.get_nested_value(['query', 'normalized'])
+        self.assertEqual(len(normalized), 11)
+        self.assertIsNone(normalized[5])
+        with self.assertRaises(BadPath):
+            frozen.create_path([4, 'query'], 'VALUE')
+
+    def test_find_and_replace(self):
+        frozen = FrozenPelicanJson(self.pelecanus_occidentalis)
+        edited = frozen.find_and_replace('Pelecanus occidentalis',
+                                         'Brown Pelican')
+        replace_paths = [['query', 'normalized', 0, 'to'],
+                         ['query', 'pages', '1266004', 'title']]
+        self.assertEqual(sorted(edited.search_value('Brown Pelican')),
+                         sorted(replace_paths))
+        self.assertEqual(list(frozen.search_value('Brown Pelican')), [])
+        self.assertIs(frozen.find_and_replace('NO MATCH', 'value'), frozen)
+
+    def test_hashable(self):
+        frozen = FrozenPelicanJson(self.ricketts)
+        same = FrozenPelicanJson(self.ricketts)
+        self.assertEqual(hash(frozen), hash(same))
+        self.assertEqual(len({frozen, same}), 1)
+        edited = frozen.set_nested_value(['query-continue'], None)
+        self.assertNotEqual(frozen, edited)
+
+    def test_thaw_and_pickle(self):
+        frozen = FrozenPelicanJson(self.ricketts)
+        thawed = frozen.thaw()
+        self.assertNotIsInstance(thawed, FrozenPelicanJson)
+        thawed['query'] = 'editable'
+        self.assertEqual(pickle.loads(pickle.dumps(frozen)), frozen)
+        self.assertIsInstance(pickle.loads(pickle.dumps(frozen))['query']['normalized'], FrozenList)
+        self.assertIs(copy.deepcopy(frozen), frozen)
+        self.assertIs(copy.copy(frozen), frozen)
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import json
+from unittest import TestCase
+
+from pelecanus import PelicanJson
+from pelecanus import ShapedPelicanJson
+from pelecanus import instrumentation
+from pelecanus import toolbox
+
+
+# Fixture locations
+current_dir = os.path.abspath(os.path.dirname(__file__))
+fixture_dir = os.path.join(current_dir, 'fixtures')
+# Actual datasets
+ricketts = os.path.join(fixture_dir, 'ricketts.json')
+
+
+class TestInstrumentation(TestCase):
+
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+        instrumentation.reset()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_disabled_by_default(self):
+        self.assertFalse(instrumentation.enabled())
+        test_rickettsi = PelicanJson(self.ricketts)
+        list(test_rickettsi.search_key('*'))
+        self.assertEqual(instrumentation.snapshot(), {})
+        self.assertFalse(hasattr(PelicanJson.search_key, '__wrapped__'))
+
+    def test_counts_pelican_operations(self):
+        instrumentation.enable()
+        test_rickettsi = PelicanJson(self.ricketts)
+        slots = sum(1 for _ in test_rickettsi._walk())
+        containers = sum(1 for slot in test_rickettsi._walk()
+                         if isinstance(slot[2], (PelicanJson, list)))
+        self.assertEqual(len(list(test_rickettsi.search_key('*'))), 10)
+        list(test_rickettsi.search_key('title'))
+        test_rickettsi.create_path(['new', 'path'], 'VALUE')
+        stats = instrumentation.snapshot()
+        search = stats['PelicanJson.search_key']
+        self.assertEqual(search['calls'], 2)
+        self.assertEqual(search['results'], 18)
+        self.assertEqual(search['nodes'], 2 * slots)
+        # One prefix per container walked into, plus the paths handed back
+        self.assertEqual(search['paths'], 2 * containers + 18)
+        self.assertGreater(search['seconds'], 0)
+        self.assertEqual(stats['PelicanJson.create_path']['calls'], 1)
+        # Nested objects built by the constructor are nodes, not calls
+        self.assertEqual(stats['PelicanJson.__init__']['calls'], 1)
+        self.assertGreater(stats['PelicanJson.__init__']['nodes'], 1)
+        # Methods called by create_path are part of its cost
+        self.assertNotIn('PelicanJson.get_nested_value', stats)
+
+    def test_counts_toolbox_functions(self):
+        instrumentation.enable()
+        self.assertEqual(toolbox.count_key(self.ricketts, '*'), 10)
+        paths = list(toolbox.generate_paths(self.ricketts))
+        stats = instrumentation.snapshot()
+        self.assertEqual(stats['toolbox.count_key']['calls'], 1)
+        generated = stats['toolbox.generate_paths']
+        self.assertEqual(generated['calls'], 1)
+        self.assertEqual(generated['results'], len(paths))
+        self.assertGreater(generated['nodes'], 0)
+
+    def test_operations_cover_the_public_api(self):
+        public = {name for name in vars(PelicanJson)
+                  if not name.startswith('_') and callable(getattr(PelicanJson, name))}
+        self.assertLessEqual(public, set(instrumentation.PELICAN_OPERATIONS))
+        for name in ('loads', 'aload', 'aenumerate', '__init__', '__iter__'):
+            self.assertIn(name, instrumentation.PELICAN_OPERATIONS)
+        self.assertNotIn('__getitem__', instrumentation.PELICAN_OPERATIONS)
+        for name in ('walk', 'load_json_index', 'get_nested_value_from_file'):
+            self.assertIn(name, instrumentation.TOOLBOX_OPERATIONS)
+        self.assertNotIn('reverse_result', instrumentation.TOOLBOX_OPERATIONS)
+        self.assertNotIn('StaleIndex', instrumentation.TOOLBOX_OPERATIONS)
+
+    def test_counts_classmethods_and_async_operations(self):
+        instrumentation.enable()
+        raw = json.dumps(self.ricketts).encode('utf-8')
+        test_rickettsi = PelicanJson.loads(raw)
+        self.assertIsInstance(ShapedPelicanJson.loads(raw), ShapedPelicanJson)
+
+        async def chunks():
+            yield raw
+
+        async def run():
+            loaded = await ShapedPelicanJson.aload(chunks())
+            titles = [path async for path in test_rickettsi.asearch_key('title')]
+            return loaded, titles
+
+        loaded, titles = asyncio.run(run())
+        self.assertIsInstance(loaded, ShapedPelicanJson)
+        stats = instrumentation.snapshot()
+        self.assertEqual(stats['PelicanJson.loads']['calls'], 2)
+        self.assertEqual(stats['PelicanJson.aload']['calls'], 1)
+        search = stats['PelicanJson.asearch_key']
+        self.assertEqual(search['calls'], 1)
+        self.assertEqual(search['results'], len(titles))
+        self.assertGreater(search['nodes'], len(titles))
+        instrumentation.disable()
+        self.assertIsInstance(ShapedPelicanJson.loads(raw), ShapedPelicanJson)
+        self.assertFalse(hasattr(PelicanJson.aload, '__wrapped__'))
+
+    def test_callback_and_disable(self):
+        seen = []
+        instrumentation.enable(callback=lambda name, counts: seen.append(
+            (name, counts)))
+        test_rickettsi = PelicanJson(self.ricketts)
+        test_rickettsi.get_nested_value(['query', 'normalized', 0, 'to'])
+        instrumentation.disable()
+        test_rickettsi.get_nested_value(['query', 'normalized', 0, 'to'])
+        names = [name for name, _ in seen]
+        self.assertEqual(names, ['PelicanJson.__init__',
+                                 'PelicanJson.get_nested_value'])
+        self.assertEqual(set(seen[0][1]),
+                         {'nodes', 'paths', 'results', 'seconds'})
+        stats = instrumentation.snapshot()
+        self.assertEqual(stats['PelicanJson.get_nested_value']['calls'], 1)
+        self.assertFalse(instrumentation.enabled())
@@ -0,0 +1,190 @@
+import asyncio
+import copy
+import os
+import json
+import pickle
+from unittest import TestCase
+
+from pelecanus import InternedPelicanJson
+from pelecanus import PelicanJson
+from pelecanus.frozen import FrozenList
+from pelecanus.interning import InternTable
+from pelecanus.toolbox import ANY
+
+
+# Fixture locations
+current_dir = os.path.abspath(os.path.dirname(__file__))
+fixture_dir = os.path.join(current_dir, 'fixtures')
+# Actual datasets
+ricketts = os.path.join(fixture_dir, 'ricketts.json')
+
+
+def item(number):
+    return {'id': number,
+            'links': {'profile': [{'href': 'http://example.com/profile'}],
+                      'tags': ['a', 'b']}}
+
+
+class TestInternedPelicanJson(TestCase):
+
+    def setUp(self):
+        self.data = {'items': [item(n) for n in range(3)],
+                     'links': {'profile': [{'href': 'http://example.com/profile'}],
+                               'tags': ['a', 'b']}}
+        self.pelican = InternedPelicanJson(self.data)
+
+    def test_repeated_subtrees_are_shared(self):
+        items = self.pelican['items']
+        self.assertIs(items[0]['links'], items[1]['links'])
+        self.assertIs(items[0]['links'], self.pelican['links'])
+        self.assertIsNot(items[0], items[1])
+        self.assertEqual(self.pelican.convert(), self.data)
+
+    def test_fixture_round_trip(self):
+        with open(ricketts, 'r') as f:
+            data = json.loads(f.read())
+        pelican = InternedPelicanJson(data)
+        self.assertEqual(pelican.convert(), data)
+        self.assertEqual(list(pelican.enumerate()),
+                         list(PelicanJson(data).enumerate()))
+
+    def test_aload_shares_subtrees(self):
+        async def chunks():
+            yield json.dumps(self.data).encode('utf-8')
+
+        pelican = asyncio.run(InternedPelicanJson.aload(chunks()))
+        self.assertIsInstance(pelican, InternedPelicanJson)
+        self.assertIs(pelican['items'][0]['links'], pelican['links'])
+        self.assertEqual(pelican.convert(), self.data)
+
+    def test_types_are_not_merged(self):
+        pelican = InternedPelicanJson({'a': {'x': 1}, 'b': {'x': True},
+                                       'c': {'x': 1.0}, 'd': {'x': 1}})
+        self.assertIsNot(pelican['a'], pelican['b'])
+        self.assertIsNot(pelican['a'], pelican['c'])
+        self.assertIs(pelican['a'], pelican['d'])
+        self.assertIs(pelican.get_nested_value(['b', 'x']), True)
+
+    def test_signed_zeros_are_not_merged(self):
+        pelican = InternedPelicanJson({'a': {'v': 0.0}, 'b': {'v': -0.0},
+                                       'c': {'v': float('nan')}, 'd': {'v': float('nan')}})
+        self.assertIsNot(pelican['a'], pelican['b'])
+        self.assertEqual(str(pelican.get_nested_value(['b', 'v'])), '-0.0')
+        self.assertIs(pelican['c'], pelican['d'])
+
+    def test_memory_saved(self):
+        stats = self.pelican.interning
+        self.assertEqual(stats['unique'], 8)
+        self.assertEqual(stats['containers'], 20)
+        self.assertEqual(stats['shared'], 12)
+        self.assertGreater(stats['bytes_saved'], 0)
+        plain = PelicanJson(self.data).memory_stats()
+        interned = self.pelican.memory_stats()
+        self.assertEqual(interned['nodes'], plain['nodes'])
+        self.assertLess(interned['bytes']['total'], plain['bytes']['total'])
+
+    def test_shared_nodes_cant_be_edited_in_place(self):
+        with self.assertRaises(TypeError):
+            self.pelican['links']['tags'] = []
+        with self.assertRaises(TypeError):
+            self.pelican['links']['tags'].append('c')
+
+    def test_set_nested_value_copies_on_write(self):
+        path = ['items', 1, 'links', 'profile', 0, 'href']
+        self.pelican.set_nested_value(path, 'changed')
+        self.assertEqual(self.pelican.get_nested_value(path), 'changed')
+        for other in (['items', 0, 'links', 'profile', 0, 'href'],
+                      ['links', 'profile', 0, 'href']):
+            self.assertEqual(self.pelican.get_nested_value(other),
+                             'http://example.com/profile')
+        # Only the containers along the path were copied
+        links = self.pelican.get_nested_value(['items', 1, 'links'])
+        self.assertIs(links['tags'], self.pelican['links']['tags'])
+        self.assertEqual(self.pelican.path_of(links), ['items', 1, 'links'])
+
+    def test_edited_nodes_are_editable(self):
+        self.pelican.set_nested_value(['links', 'tags', 0], 'z')
+        self.pelican['links']['tags'].append('y')
+        self.pelican['links']['new'] = {'key': 'value'}
+        self.assertEqual(self.pelican['links']['tags'], ['z', 'b', 'y'])
+        self.assertEqual(self.pelican.get_nested_value(['items', 0, 'links', 'tags']),
+                         ['a', 'b'])
+
+    def test_create_path_copies_on_write(self):
+        created = self.pelican.create_path(['items', 2, 'links', 'tags', 3], 'd')
+        self.assertIs(created, self.pelican)
+        created.create_path(['items', 0, 'links', 'next', 'href'], 'n')
+        self.assertEqual(self.pelican.get_nested_value(['items', 2, 'links', 'tags']),
+                         ['a', 'b', None, 'd'])
+        self.assertEqual(self.pelican.get_nested_value(['items', 0, 'links', 'next']),
+                         {'href': 'n'})
+        self.assertEqual(self.pelican.get_nested_value(['items', 1]), item(1))
+        self.assertEqual(self.pelican['links'], self.data['links'])
+
+    def test_copy_and_pickle(self):
+        for copied in (copy.copy(self.pelican), copy.deepcopy(self.pelican),
+                       pickle.loads(pickle.dumps(self.pelican))):
+            self.assertIsInstance(copied, InternedPelicanJson)
+            self.assertEqual(copied.interning, self.pelican.interning)
+            self.assertEqual(copied.convert(), self.data)
+            items = copied['items']
+            self.assertIs(items[0]['links'], items[1]['links'])
+            copied.set_nested_value(['items', 0, 'links', 'tags', 0], 'z')
+            self.assertEqual(copied.get_nested_value(['items', 1, 'links', 'tags', 0]), 'a')
+        self.assertEqual(self.pelican.convert(), self.data)
+
+    def test_find_and_replace(self):
+        self.pelican.find_and_replace('a', 'c')
+        self.assertEqual(list(self.pelican.search_value('a')), [])
+        self.assertEqual(len(list(self.pelican.search_value('c'))), 4)
+
+    def test_deletes_copy_on_write(self):
+        self.assertEqual(self.pelican.delete_paths([['items', 1, 'links', 'tags', 0]]), 1)
+        self.assertEqual(self.pelican.get_nested_value(['items', 1, 'links', 'tags']), ['b'])
+        self.assertEqual(self.pelican.get_nested_value(['items', 0]), item(0))
+        self.assertEqual(self.pelican.delete_where(key='href'), 4)
+        self.assertEqual(list(self.pelican.search_key('href')), [])
+        self.assertEqual(self.pelican['links']['profile'], [{}])
+        self.assertEqual(self.pelican.get_nested_value(['items', 2, 'id']), 2)
+
+    def test_deletes_match_pelican(self):
+        data = {'a': {'s': 1, 'k': 2}, 'b': {'s': 1, 'k': 2}, 'l': [[{'s': 5}]]}
+        for arguments in ({'key': 's'}, {'value': [1]}, {'value': 2},
+                          {'predicate': lambda k, v: k == 0}):
+            interned = InternedPelicanJson(data)
+            plain = PelicanJson(data)
+            self.assertEqual(interned.delete_where(**arguments), plain.delete_where(**arguments))
+            self.assertEqual(interned.convert(), plain.convert())
+
+    def test_delete_paths_through_wildcards(self):
+        self.assertEqual(self.pelican.delete_paths([['items', ANY, 'links', 'tags']]), 3)
+        for number in range(3):
+            self.assertEqual(self.pelican.get_nested_value(['items', number]).convert(),
+                             {'id': number, 'links': {'profile': [{'href': 'http://example.com/profile'}]}})
+        self.assertEqual(self.pelican['links'], self.data['links'])
+
+    def test_deep_merge_copies_on_write(self):
+        self.pelican.deep_merge({'items': [{'id': 1, 'links': {'tags': ['c']}}]},
+                                list_strategy='by_key')
+        self.assertEqual(self.pelican.get_nested_value(['items', 1, 'links', 'tags']), ['a', 'b', 'c'])
+        self.assertEqual(self.pelican.get_nested_value(['items', 0]), item(0))
+        self.assertEqual(self.pelican['links'], self.data['links'])
+
+    def test_move_and_rename_copy_on_write(self):
+        self.pelican.move_path(['items', 1, 'links', 'profile'], ['items', 0, 'links', 'moved'])
+        self.assertEqual(list(self.pelican.get_nested_value(['items', 1, 'links']).store), ['tags'])
+        self.assertEqual(self.pelican.get_nested_value(['items', 0, 'links', 'moved']),
+                         self.data['links']['profile'])
+        self.assertEqual(self.pelican.rename_key('href', 'url', everywhere=True), 4)
+        self.assertEqual(list(self.pelican.search_key('href')), [])
+        self.assertEqual(self.pelican.get_nested_value(['items', 2]).convert(),
+                         {'id': 2, 'links': {'profile': [{'url': 'http://example.com/profile'}],
+                                             'tags': ['a', 'b']}})
+
+    def test_shared_table(self):
+        table = InternTable()
+        first = InternedPelicanJson.with_table(item(1), table)
+        second = InternedPelicanJson.with_table(item(2), table)
+        self.assertIs(first['links'], second['links'])
+        self.assertIsInstance(first['links']['tags'], FrozenList)
+        self.assertEqual(second.interning['shared'], 4)
@@ -0,0 +1,125 @@
+import os
+import json
+import pickle
+from unittest import TestCase
+
+from pelecanus import PelicanJson
+from pelecanus import lazy
+from pelecanus.lazy import RawStore
+
+
+# Fixture locations
+current_dir = os.path.abspath(os.path.dirname(__file__))
+fixture_dir = os.path.join(current_dir, 'fixtures')
+# Actual datasets
+ricketts = os.path.join(fixture_dir, 'ricketts.json')
+monterrey = os.path.join(fixture_dir, 'monterrey.json')
+
+
+class TestLazyLoading(TestCase):
+
+    def setUp(self):
+        with open(ricketts, 'rb') as f:
+            self.ricketts_text = f.read()
+        with open(monterrey, 'rb') as f:
+            self.monterrey_text = f.read()
+        self.ricketts = json.loads(self.ricketts_text.decode('utf-8'))
+        self.monterrey = json.loads(self.monterrey_text.decode('utf-8'))
+
+    def test_round_trip(self):
+        for text, data in ((self.ricketts_text, self.ricketts),
+                           (self.monterrey_text, self.monterrey)):
+            pelican = PelicanJson.loads_lazy(text)
+            self.assertIsInstance(pelican.store, RawStore)
+            self.assertEqual(pelican.convert(), data)
+            self.assertEqual(pelican.serialize(), PelicanJson(data).serialize(codec='json'))
+            self.assertEqual(list(pelican.enumerate()),
+                             list(PelicanJson(data).enumerate()))
+
+    def test_scalars(self):
+        data = {'none': None, 'true': True, 'false': False, 'int': -42,
+                'big': 2 ** 70, 'float': 1.5e-3, 'text': 'pélican ✓ "]}', 'empty': '',
+                'list': [1, [2, {'three': 3}], []], 'object': {}}
+        for text in (json.dumps(data), json.dumps(data, indent=2, ensure_ascii=False)):
+            pelican = PelicanJson.loads_lazy(text)
+            self.assertEqual(pelican.convert(), data)
+            self.assertIs(pelican['true'], True)
+            self.assertIsInstance(pelican.get_nested_value(['list', 1, 1]), PelicanJson)
+            self.assertEqual(json.loads(pelican.serialize()), data)
+
+    def test_only_visited_nodes_are_parsed(self):
+        pelican = PelicanJson.loads_lazy(self.ricketts_text)
+        path = ['query', 'pages', '1422396', 'title']
+        self.assertEqual(pelican.get_nested_value(path),
+                         PelicanJson(self.ricketts).get_nested_value(path))
+        pages = pelican.get_nested_value(['query', 'pages'])
+        self.assertEqual(list(pelican.store._decoded), ['query'])
+        self.assertEqual(list(pages.store._decoded), ['1422396'])
+        self.assertNotIn('normalized', pelican['query'].store._decoded)
+        self.assertIsNone(pelican['query-continue'].store._spans)
+
+    def test_entering_a_level_parses_only_its_members(self):
+        level = {'items': [{'id': n, 'tags': ['a', 'b']} for n in range(200)]}
+        for depth in range(6):
+            level = {'level{}'.format(depth): level, 'filler': ['x'] * 100}
+        text = json.dumps(level)
+        parsed = []
+        scan = lazy._scan
+
+        def counting_scan(text, pos):
+            value, end = scan(text, pos)
+            parsed.append(end - pos)
+            return value, end
+
+        lazy._scan = counting_scan
+        try:
+            pelican = PelicanJson.loads_lazy(text)
+            path = ['level{}'.format(depth) for depth in range(5, -1, -1)]
+            self.assertEqual(pelican.get_nested_value(path + ['items', 3, 'id']), 3)
+        finally:
+            lazy._scan = scan
+        # Only keys and the values asked for are parsed, never whole subtrees
+        self.assertLess(sum(parsed), len(text) // 20)
+
+    def test_serialize_copies_untouched_text(self):
+        text = json.dumps(self.ricketts, indent=4)
+        pelican = PelicanJson.loads_lazy(text)
+        self.assertEqual(pelican.serialize(), text)
+        pelican.set_nested_value(['query', 'pages', '1422396', 'title'], 'EDITED')
+        expected = PelicanJson(self.ricketts)
+        expected.set_nested_value(['query', 'pages', '1422396', 'title'], 'EDITED')
+        result = pelican.serialize()
+        self.assertEqual(json.loads(result), expected.convert())
+        untouched = json.dumps(self.ricketts['query-continue'], indent=4).replace('\n', '\n    ')
+        self.assertIn(untouched, result)
+
+    def test_editing(self):
+        pelican = PelicanJson.loads_lazy(self.ricketts_text)
+        pelican.create_path(['query', 'new', 2], 'NEW')
+        del pelican['query-continue']
+        pelican['added'] = {'a': [1, {'b': 2}]}
+        expected = PelicanJson(self.ricketts)
+        expected.create_path(['query', 'new', 2], 'NEW')
+        del expected['query-continue']
+        expected['added'] = {'a': [1, {'b': 2}]}
+        self.assertEqual(pelican.convert(), expected.convert())
+        self.assertEqual(json.loads(pelican.serialize()), expected.convert())
+
+    def test_parent_links(self):
+        pelican = PelicanJson.loads_lazy(self.ricketts_text)
+        path = ['query', 'normalized', 0]
+        node = pelican.get_nested_value(path)
+        self.assertIs(node.parent, pelican['query'])
+        self.assertEqual(pelican.path_of(node), path)
+
+    def test_pickle(self):
+        pelican = PelicanJson.loads_lazy(self.ricketts_text)
+        copied = pickle.loads(pickle.dumps(pelican))
+        self.assertIsInstance(copied.store, dict)
+        self.assertEqual(copied.convert(), self.ricketts)
+
+    def test_errors(self):
+        for text in ('', '[1, 2]', '{"a": 1} x', '{"a" 1}', '{"a": 1 "b": 2}', '{1: 2}',
+                     '{"a": [1}', '{"a": {"b": 1}', '{"a": "]}'):
+            with self.assertRaises(ValueError):
+                PelicanJson.loads_lazy(text).convert()
@@ -0,0 +1,183 @@
+import asyncio
+import copy
+import json
+import pickle
+from unittest import TestCase
+
+from pelecanus import PackedPelicanJson
+from pelecanus import PelicanJson
+from pelecanus.arrays import NumericList
+from pelecanus.arrays import SparseList
+from pelecanus.arrays import pack
+
+
+class TestNumericList(TestCase):
+
+    def test_pack(self):
+        self.assertEqual(pack([1, 2, 3]).view().format, 'q')
+        self.assertEqual(pack([1.0, 2.5]).view().format, 'd')
+        for values in ([], [1, 2.0], [True, False], [1, None], ['a'], [2 ** 64]):
+            self.assertIsNone(pack(values))
+        self.assertIsNone(pack([1, 2, 3], min_length=4))
+
+    def test_behaves_like_a_list(self):
+        numbers = pack([3, 1, 2])
+        self.assertEqual(numbers, [3, 1, 2])
+        self.assertNotEqual(numbers, [3, 1])
+        self.assertEqual(numbers[-1], 2)
+        self.assertEqual(numbers[:2], [3, 1])
+        self.assertIsInstance(numbers[:2], list)
+        self.assertIn(1, numbers)
+        self.assertEqual(len(numbers), 3)
+        self.assertIs(type(numbers[0]), int)
+        numbers.append(4)
+        numbers[0] = 5
+        del numbers[1]
+        self.assertEqual(numbers.tolist(), [5, 2, 4])
+        self.assertTrue(numbers.packed)
+        with self.assertRaises(IndexError):
+            numbers[10]
+
+    def test_unpacks_for_other_values(self):
+        numbers = pack([1.5, 2.5])
+        numbers[0] = 1
+        self.assertFalse(numbers.packed)
+        self.assertIs(type(numbers[0]), int)
+        numbers.append(True)
+        self.assertEqual(numbers, [1, 2.5, True])
+        with self.assertRaises(TypeError):
+            numbers.view()
+
+    def test_view(self):
+        numbers = pack([1.5, 2.5])
+        view = numbers.view()
+        self.assertEqual(view.tolist(), [1.5, 2.5])
+        self.assertTrue(view.readonly)
+
+    def test_copy_and_pickle(self):
+        numbers = pack([1, 2, 3])
+        for other in (copy.deepcopy(numbers), pickle.loads(pickle.dumps(numbers))):
+            self.assertIsInstance(other, NumericList)
+            self.assertEqual(other, numbers)
+            self.assertIsNot(other._items, numbers._items)
+
+
+class TestPackedPelicanJson(TestCase):
+
+    def setUp(self):
+        self.data = {'sensor': 'a',
+                     'series': {'t': list(range(20)),
+                                'temp': [n / 4 for n in range(20)],
+                                'flags': [True] * 20,
+                                'pairs': [[1, 2]] * 10},
+                     'short': [1, 2],
+                     'readings': [{'values': [0.5] * 10}]}
+        self.pelican = PackedPelicanJson(self.data)
+        self.plain = PelicanJson(self.data)
+
+    def test_packing(self):
+        series = self.pelican['series']
+        self.assertIsInstance(series['t'], NumericList)
+        self.assertIsInstance(series['temp'], NumericList)
+        self.assertIsInstance(self.pelican['readings'][0]['values'], NumericList)
+        self.assertIs(type(series['flags']), list)
+        self.assertIs(type(series['pairs']), list)
+        self.assertIs(type(self.pelican['short']), list)
+
+    def test_same_semantics(self):
+        self.assertEqual(self.pelican.convert(), self.data)
+        self.assertEqual(self.pelican.serialize(), self.plain.serialize())
+        self.assertEqual(list(self.pelican.enumerate()), list(self.plain.enumerate()))
+        self.assertEqual(self.pelican.get_nested_value(['series', 'temp', 3]), 0.75)
+        self.assertEqual(list(self.pelican.search_value(7)),
+                         list(self.plain.search_value(7)))
+        self.assertEqual(self.pelican.search_many(values=[0.5]),
+                         self.plain.search_many(values=[0.5]))
+        stats = self.pelican.memory_stats()
+        plain_stats = self.plain.memory_stats()
+        for key in ('nodes', 'objects', 'lists', 'scalars', 'max_depth', 'list_lengths'):
+            self.assertEqual(stats[key], plain_stats[key])
+        self.assertLess(stats['bytes']['total'], plain_stats['bytes']['total'])
+
+    def test_aload_packs_lists(self):
+        async def chunks():
+            yield json.dumps(self.data).encode('utf-8')
+
+        pelican = asyncio.run(PackedPelicanJson.aload(chunks()))
+        self.assertIsInstance(pelican['series'], PackedPelicanJson)
+        self.assertIsInstance(pelican['series']['t'], NumericList)
+        self.assertIsInstance(pelican['readings'][0], PackedPelicanJson)
+        self.assertIsInstance(pelican['readings'][0]['values'], NumericList)
+        self.assertIs(type(pelican['series']['pairs']), list)
+        self.assertEqual(pelican.convert(), self.data)
+
+    def test_paging(self):
+        items, cursor = self.pelican.page(25)
+        rest, cursor = self.pelican.page(1000, cursor=cursor)
+        self.assertIsNone(cursor)
+        self.assertEqual(items + rest, list(self.plain.enumerate()))
+
+    def test_get_nested_array(self):
+        view = self.pelican.get_nested_array(['series', 'temp'])
+        self.assertEqual(view.format, 'd')
+        self.assertEqual(view[4], 1.0)
+        with self.assertRaises(TypeError):
+            self.pelican.get_nested_array(['series', 'flags'])
+
+    def test_editing(self):
+        self.pelican.set_nested_value(['series', 't', 0], 100)
+        self.pelican.set_nested_value(['series', 'temp', 0], 'missing')
+        self.pelican.create_path(['series', 't', 22], 5)
+        self.pelican['new'] = [1.5] * 8
+        series = self.pelican['series']
+        self.assertEqual(series['t'][0], 100)
+        self.assertEqual(series['t'][-3:], [None, None, 5])
+        self.assertEqual(series['temp'][:2], ['missing', 0.25])
+        self.assertIsInstance(self.pelican['new'], NumericList)
+
+    def test_pickle(self):
+        other = pickle.loads(pickle.dumps(self.pelican))
+        self.assertEqual(other, self.pelican)
+        self.assertIsInstance(other['series']['t'], NumericList)
+
+
+class TestSparseList(TestCase):
+
+    def test_reads(self):
+        sparse = SparseList({2: 'a', 5: 'b'})
+        self.assertEqual(len(sparse), 6)
+        self.assertEqual(sparse, [None, None, 'a', None, None, 'b'])
+        self.assertEqual(list(sparse), [None, None, 'a', None, None, 'b'])
+        self.assertEqual(sparse[-1], 'b')
+        self.assertEqual(sparse[1:3], [None, 'a'])
+        self.assertIn(None, sparse)
+        self.assertIn('a', sparse)
+        self.assertNotIn('c', sparse)
+        with self.assertRaises(IndexError):
+            sparse[6]
+        self.assertEqual(list(sparse.populated()), [(2, 'a'), (5, 'b')])
+
+    def test_writes(self):
+        sparse = SparseList({2: 'a'}, length=4)
+        sparse.append('b')
+        sparse.insert(0, 'c')
+        del sparse[1]
+        sparse[0] = 'd'
+        self.assertEqual(sparse.tolist(), ['d', None, 'a', None, 'b'])
+        sparse.pad_to(1000)
+        sparse.append('e')
+        self.assertEqual(len(sparse), 1001)
+        self.assertEqual(len(list(sparse.populated())), 4)
+        with self.assertRaises(IndexError):
+            sparse[2000] = 'f'
+
+    def test_iterator_offset(self):
+        iterator = iter(SparseList({2: 'a', 5: 'b'}))
+        iterator.__setstate__(3)
+        self.assertEqual(list(iterator), [None, None, 'b'])
+
+    def test_copy_and_pickle(self):
+        sparse = SparseList({100: {'a': 1}})
+        for other in (copy.deepcopy(sparse), pickle.loads(pickle.dumps(sparse))):
+            self.assertEqual(other, sparse)
+            self.assertEqual(len(other), 101)
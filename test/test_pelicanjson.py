@@ -1,11 +1,20 @@
+import asyncio
 import os
 import json
 import copy
+import pickle
+import sys
+import tempfile
 from unittest import TestCase
 
+from pelecanus import PackedPelicanJson
 from pelecanus import PelicanJson
+from pelecanus.arrays import SparseList
+from pelecanus.exceptions import BadCursor
 from pelecanus.exceptions import BadPath
 from pelecanus.exceptions import EmptyPath
+from pelecanus.exceptions import StaleCursor
+from pelecanus.toolbox import ANY
 
 
 # Fixture locations
@@ -538,3 +547,841 @@ class TestPelicanMethods(TestCase):
                          ['query', 'pages', '1266004', 'title']]
         for path in test_pelican.search_value('Brown Pelican'):
             self.assertIn(path, replace_paths)
+
+
+class TestParentLinks(TestCase):
+
+    def setUp(self):
+        with open(data, 'r') as f:
+            rdata = json.loads(f.read())
+            self.item = rdata['items'][-1]
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+
+    def test_parent_and_root(self):
+        test_pelican = PelicanJson(self.item)
+        attributes = test_pelican['attributes']
+        self.assertIs(attributes.parent, test_pelican)
+        self.assertIsNone(test_pelican.parent)
+        alternate = test_pelican.get_nested_value(['links', 'alternate', 0])
+        self.assertIs(alternate.parent, test_pelican['links'])
+        self.assertIs(alternate.root, test_pelican)
+
+    def test_path_of(self):
+        test_rickettsi = PelicanJson(self.ricketts)
+        for path, value in test_rickettsi.enumerate():
+            node = test_rickettsi.get_nested_value(path[:-1])
+            if isinstance(node, PelicanJson):
+                self.assertEqual(test_rickettsi.path_of(node), path[:-1])
+        self.assertEqual(test_rickettsi.path_of(test_rickettsi), [])
+
+    def test_path_of_after_edits(self):
+        test_rickettsi = PelicanJson(self.ricketts)
+        path = ['query', 'normalized', 3, 'NEW']
+        test_rickettsi.create_path(path, "VALUE")
+        node = test_rickettsi.get_nested_value(path[:-1])
+        self.assertEqual(test_rickettsi.path_of(node), path[:-1])
+        test_rickettsi.set_nested_value(['query', 'added'], {'a': 'b'})
+        node = test_rickettsi.get_nested_value(['query', 'added'])
+        self.assertEqual(test_rickettsi.path_of(node), ['query', 'added'])
+
+    def test_path_of_stale_link_falls_back_to_search(self):
+        test_rickettsi = PelicanJson(self.ricketts)
+        images = test_rickettsi.get_nested_value(['query', 'pages',
+                                                  '1422396', 'images'])
+        node = images[3]
+        images.insert(0, 'shifted')
+        self.assertEqual(test_rickettsi.path_of(node),
+                         ['query', 'pages', '1422396', 'images', 4])
+
+    def test_path_of_searches_lists_in_lists(self):
+        pelican = PelicanJson({'a': [{'b': 1}, [{'c': 2}]]})
+        inner = pelican['a'][1][0]
+        pelican['a'].insert(0, 5)
+        self.assertEqual(pelican.path_of(inner), ['a', 2, 0])
+
+    def test_path_of_raises_for_foreign_node(self):
+        test_rickettsi = PelicanJson(self.ricketts)
+        with self.assertRaises(ValueError):
+            test_rickettsi.path_of(PelicanJson({'some': 'value'}))
+
+    def test_links_survive_copy(self):
+        test_pelican = PelicanJson(self.item)
+        for clone in (copy.deepcopy(test_pelican),
+                      pickle.loads(pickle.dumps(test_pelican))):
+            self.assertEqual(clone, test_pelican)
+            self.assertIs(clone['attributes'].parent, clone)
+            link = clone.get_nested_value(['links', 'alternate', 0])
+            self.assertEqual(clone.path_of(link), ['links', 'alternate', 0])
+
+
+class TestAsyncMethods(TestCase):
+
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+        with open(monterrey, 'r') as f:
+            self.monterrey = json.loads(f.read())
+
+    @staticmethod
+    def collect(agen):
+        async def consume():
+            return [item async for item in agen]
+        return asyncio.run(consume())
+
+    def test_aenumerate(self):
+        test_rickettsi = PelicanJson(self.ricketts)
+        self.assertEqual(self.collect(test_rickettsi.aenumerate(budget=5)),
+                         list(test_rickettsi.enumerate()))
+
+    def test_asearch(self):
+        test_rickettsi = PelicanJson(self.ricketts)
+        self.assertEqual(self.collect(test_rickettsi.asearch_key('*')),
+                         list(test_rickettsi.search_key('*')))
+        test_monty = PelicanJson(self.monterrey)
+        self.assertEqual(self.collect(test_monty.asearch_value('2014-08-25')),
+                         [['results', 1, 'maxdate'],
+                          ['results', 3, 'maxdate']])
+
+    def test_aload_yields_to_loop(self):
+        raw = json.dumps(self.monterrey).encode('utf-8')
+
+        async def chunks():
+            for start in range(0, len(raw), 100):
+                yield raw[start:start + 100]
+
+        async def load():
+            ticks = []
+
+            async def ticker():
+                while True:
+                    ticks.append(1)
+                    await asyncio.sleep(0)
+
+            task = asyncio.ensure_future(ticker())
+            pelican = await PelicanJson.aload(chunks(), budget=2)
+            task.cancel()
+            return pelican, len(ticks)
+
+        pelican, ticks = asyncio.run(load())
+        self.assertEqual(pelican, PelicanJson(self.monterrey))
+        self.assertEqual(pelican.convert(), self.monterrey)
+        self.assertGreater(ticks, 5)
+        results = pelican.get_nested_value(['results', 7])
+        self.assertEqual(pelican.path_of(results), ['results', 7])
+
+    def test_aload_from_reader(self):
+        async def load():
+            reader = asyncio.StreamReader()
+            reader.feed_data(json.dumps(self.ricketts).encode('utf-8'))
+            reader.feed_eof()
+            return await PelicanJson.aload(reader)
+
+        self.assertEqual(asyncio.run(load()).convert(), self.ricketts)
+
+    def test_aload_needs_an_object(self):
+        async def load(raw):
+            reader = asyncio.StreamReader()
+            reader.feed_data(raw)
+            reader.feed_eof()
+            return await PelicanJson.aload(reader)
+
+        for raw in (b'[1, 2]', b'"text"', b'5', b'null'):
+            with self.assertRaises(Exception) as expected:
+                PelicanJson.loads(raw)
+            with self.assertRaises(type(expected.exception)):
+                asyncio.run(load(raw))
+
+
+class TestMemoryStats(TestCase):
+
+    def setUp(self):
+        with open(book, 'r') as f:
+            self.book = json.loads(f.read())
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+
+    def test_shape(self):
+        content = {'links': {'alternate': [{'href': 'somelink'},
+                                           {'href': 'otherlink'}],
+                             'tags': [1, 2, 3]},
+                   'version': '1.0'}
+        stats = PelicanJson(content).memory_stats()
+        self.assertEqual(stats['objects'], 4)
+        self.assertEqual(stats['lists'], 2)
+        self.assertEqual(stats['scalars'], 6)
+        self.assertEqual(stats['nodes'], 12)
+        self.assertEqual(stats['max_depth'], 4)
+        self.assertEqual(stats['fanout'], {1: 2, 2: 2})
+        self.assertEqual(stats['list_lengths'], {2: 1, 3: 1})
+
+    def test_bytes(self):
+        stats = PelicanJson(self.ricketts).memory_stats()
+        sizes = stats['bytes']
+        self.assertEqual(set(sizes),
+                         {'wrapper', 'containers', 'keys', 'values', 'total'})
+        self.assertTrue(all(size > 0 for size in sizes.values()))
+        self.assertEqual(sizes['total'], sum(sizes.values()) - sizes['total'])
+        book_stats = PelicanJson(self.book).memory_stats()
+        self.assertLess(book_stats['bytes']['total'], sizes['total'])
+
+
+class TestTuplePaths(TestCase):
+
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+
+    def test_tuple_paths(self):
+        test_rickettsi = PelicanJson(self.ricketts)
+        self.assertEqual([(tuple(path), value) for path, value
+                          in test_rickettsi.enumerate()],
+                         list(test_rickettsi.enumerate(tuples=True)))
+        self.assertEqual([tuple(path) for path in test_rickettsi.paths()],
+                         list(test_rickettsi.paths(tuples=True)))
+        for path in test_rickettsi.search_key('*', tuples=True):
+            self.assertIsInstance(path, tuple)
+            self.assertEqual(path[:4], ('query', 'pages', '1422396',
+                                        'extlinks'))
+        self.assertEqual(list(test_rickettsi.search_value(6, tuples=True)),
+                         [tuple(path) for path
+                          in test_rickettsi.search_value(6)])
+
+    def test_path_prefix(self):
+        test_rickettsi = PelicanJson(self.ricketts)
+        for path in test_rickettsi.search_key('*', path=['prefix']):
+            self.assertEqual(path[:2], ['prefix', 'query'])
+
+    def test_paths_are_independent(self):
+        test_rickettsi = PelicanJson(self.ricketts)
+        paths = list(test_rickettsi.paths())
+        paths[0].append('EXTRA')
+        self.assertEqual(paths[1:], list(test_rickettsi.paths())[1:])
+
+
+class TestSearchMany(TestCase):
+
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+        with open(monterrey, 'r') as f:
+            self.monterrey = json.loads(f.read())
+
+    def test_search_many(self):
+        test_rickettsi = PelicanJson(self.ricketts)
+        found = test_rickettsi.search_many(keys=['*', 'title', 'missing'],
+                                           values=[6, 'NOT A VALUE'])
+        self.assertEqual(found['key']['*'], list(test_rickettsi.search_key('*')))
+        self.assertEqual(found['key']['title'],
+                         list(test_rickettsi.search_key('title')))
+        self.assertEqual(found['key']['missing'], [])
+        self.assertEqual(found['value'][6],
+                         list(test_rickettsi.search_value(6)))
+        self.assertEqual(found['value']['NOT A VALUE'], [])
+        self.assertEqual(found['predicate'], {})
+
+    def test_search_hits_in_walk_order(self):
+        test_monty = PelicanJson(self.monterrey)
+        hits = list(test_monty.search_hits(keys=['href'],
+                                           values=['2014-08-25'],
+                                           tuples=True))
+        self.assertEqual([path for kind, _, path in hits if kind == 'key'],
+                         list(test_monty.search_key('href', tuples=True)))
+        self.assertEqual([path for kind, _, path in hits if kind == 'value'],
+                         list(test_monty.search_value('2014-08-25', tuples=True)))
+        order = [path for path, _ in test_monty.enumerate(tuples=True)]
+        self.assertEqual([path for _, _, path in hits],
+                         sorted((path for _, _, path in hits), key=order.index))
+
+    def test_predicates(self):
+        test_rickettsi = PelicanJson(self.ricketts)
+
+        def is_url(key, value):
+            return isinstance(value, str) and value.startswith('http')
+        found = test_rickettsi.search_many(predicates={'urls': is_url})
+        urls = found['predicate']['urls']
+        self.assertTrue(urls)
+        for path in urls:
+            self.assertTrue(test_rickettsi.get_nested_value(path).startswith('http'))
+
+
+class TestTraversalOrder(TestCase):
+
+    def setUp(self):
+        self.doc = {'_embedded': {'items': [{'links': {'self': 'deep'}}]},
+                    'links': {'self': 'shallow', 'next': 'page2'},
+                    'count': 1}
+
+    def test_bfs(self):
+        pelican = PelicanJson(self.doc)
+        self.assertEqual(list(pelican.paths()),
+                         [['_embedded', 'items', 0, 'links', 'self'],
+                          ['links', 'self'], ['links', 'next'], ['count']])
+        self.assertEqual(list(pelican.enumerate(order='bfs')),
+                         [(['count'], 1),
+                          (['links', 'self'], 'shallow'),
+                          (['links', 'next'], 'page2'),
+                          (['_embedded', 'items', 0, 'links', 'self'], 'deep')])
+        self.assertEqual(sorted(pelican.enumerate(order='bfs')),
+                         sorted(pelican.enumerate()))
+        with self.assertRaises(ValueError):
+            list(pelican.enumerate(order='sideways'))
+
+    def test_max_depth(self):
+        pelican = PelicanJson(self.doc)
+        self.assertEqual(list(pelican.enumerate(max_depth=1)), [(['count'], 1)])
+        self.assertEqual(list(pelican.search_key('self', max_depth=2)),
+                         [['links', 'self']])
+        self.assertEqual(list(pelican.search_key('self', max_depth=2,
+                                                 order='bfs', path=['root'])),
+                         [['root', 'links', 'self']])
+        self.assertEqual(list(pelican.search_value('deep', max_depth=4)), [])
+
+    def test_first_only(self):
+        pelican = PelicanJson(self.doc)
+        self.assertEqual(list(pelican.search_key('self', first_only=True)),
+                         [['_embedded', 'items', 0, 'links', 'self']])
+        self.assertEqual(list(pelican.search_key('self', order='bfs',
+                                                 first_only=True)),
+                         [['links', 'self']])
+        self.assertEqual(list(pelican.search_value('page2', first_only=True)),
+                         [['links', 'next']])
+
+
+class TestCursors(TestCase):
+
+    def setUp(self):
+        with open(monterrey, 'r') as f:
+            self.monterrey = json.loads(f.read())
+
+    def collect_pages(self, pelican, size, **kwargs):
+        items, cursor = pelican.page(size, **kwargs)
+        pages = [items]
+        while cursor is not None:
+            items, cursor = pelican.page(size, cursor=cursor, **kwargs)
+            pages.append(items)
+        return pages
+
+    def test_pages_cover_enumerate(self):
+        test_monty = PelicanJson(self.monterrey)
+        everything = list(test_monty.enumerate())
+        for size in (1, 7, len(everything), len(everything) + 1):
+            pages = self.collect_pages(test_monty, size)
+            self.assertEqual([item for page in pages for item in page],
+                             everything)
+            self.assertTrue(all(len(page) <= size for page in pages))
+        pages = self.collect_pages(test_monty, 5, tuples=True, max_depth=3)
+        self.assertEqual([item for page in pages for item in page],
+                         list(test_monty.enumerate(tuples=True, max_depth=3)))
+
+    def test_enumerate_from_cursor(self):
+        test_monty = PelicanJson(self.monterrey)
+        everything = list(test_monty.enumerate())
+        _, cursor = test_monty.page(10)
+        self.assertIsInstance(cursor, str)
+        self.assertEqual(list(test_monty.enumerate(cursor=cursor)),
+                         everything[10:])
+
+    def test_stale_cursor(self):
+        test_monty = PelicanJson(self.monterrey)
+        _, cursor = test_monty.page(10)
+        path, _ = next(test_monty.enumerate())
+        test_monty.set_nested_value(path, 'CHANGED')
+        with self.assertRaises(StaleCursor):
+            test_monty.page(10, cursor=cursor)
+
+        # Changes anywhere in the tree, including inside lists
+        path = next(path for path, _ in test_monty.enumerate()
+                    if isinstance(path[-2], int))
+        node = test_monty.get_nested_value(path[:-1])
+        _, cursor = test_monty.page(10)
+        del node[path[-1]]
+        with self.assertRaises(StaleCursor):
+            list(test_monty.enumerate(cursor=cursor))
+
+        _, cursor = test_monty.page(10)
+        test_monty.set_nested_value(path[:-1], 'CHANGED')
+        with self.assertRaises(StaleCursor):
+            test_monty.page(10, cursor=cursor)
+
+    def test_bad_cursor(self):
+        test_monty = PelicanJson(self.monterrey)
+        with self.assertRaises(BadCursor):
+            test_monty.page(10, cursor='not a cursor')
+        _, cursor = PelicanJson({'a': 1, 'b': 2}).page(1)
+        with self.assertRaises(BadCursor):
+            test_monty.page(10, cursor=cursor)
+
+
+class TestSparseLists(TestCase):
+
+    def test_create_path_far_index(self):
+        test_pelican = PelicanJson({'a': 1})
+        test_pelican.create_path(['x', 100000], 'VALUE')
+        test_pelican.create_path(['y', 5], 'VALUE')
+        self.assertIsInstance(test_pelican['x'], SparseList)
+        self.assertNotIsInstance(test_pelican['y'], SparseList)
+        self.assertEqual(len(test_pelican['x']), 100001)
+        self.assertEqual(test_pelican.get_nested_value(['x', 100000]), 'VALUE')
+        self.assertIsNone(test_pelican.get_nested_value(['x', 99999]))
+        self.assertEqual(list(test_pelican.search_value('VALUE')),
+                         [['x', 100000], ['y', 5]])
+        converted = test_pelican.convert()
+        self.assertEqual(converted['x'], [None] * 100000 + ['VALUE'])
+        self.assertEqual(test_pelican.memory_stats()['nodes'],
+                         PelicanJson(converted).memory_stats()['nodes'])
+
+    def test_create_path_objects_in_sparse_list(self):
+        test_pelican = PelicanJson({'a': 1})
+        test_pelican.create_path(['x', 5000, 'key'], 'VALUE')
+        test_pelican.create_path(['x', 9000, 'key'], 'OTHER')
+        node = test_pelican.get_nested_value(['x', 9000])
+        self.assertIsInstance(node, PelicanJson)
+        self.assertEqual(test_pelican.path_of(node), ['x', 9000])
+        self.assertEqual(list(test_pelican.search_key('key')),
+                         [['x', 5000, 'key'], ['x', 9000, 'key']])
+        items, cursor = test_pelican.page(7000)
+        rest, _ = test_pelican.page(7000, cursor=cursor)
+        self.assertEqual(items + rest, list(test_pelican.enumerate()))
+        copied = pickle.loads(pickle.dumps(test_pelican))
+        self.assertEqual(copied.convert(), test_pelican.convert())
+
+    def test_list_grows_in_place(self):
+        test_pelican = PelicanJson({'tags': ['a']})
+        tags = test_pelican['tags']
+        for index in range(1, 100):
+            test_pelican.create_path(['tags', index], index)
+        test_pelican.create_path(['tags', 200], 'LAST')
+        self.assertIs(test_pelican['tags'], tags)
+        self.assertEqual(len(tags), 201)
+        self.assertIsNone(tags[150])
+
+        # Past SPARSE_GAP, the list is swapped for a SparseList
+        test_pelican.create_path(['tags', 5000], 'FAR')
+        self.assertIsInstance(test_pelican['tags'], SparseList)
+        self.assertEqual(test_pelican['tags'][:3], ['a', 1, 2])
+        self.assertEqual(test_pelican.get_nested_value(['tags', 5000]), 'FAR')
+
+
+class TestCopies(TestCase):
+
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+
+    def deep_document(self, depth):
+        # Built one level at a time, as building it all at once recurses
+        pelican = PelicanJson({'top': []})
+        node = pelican
+        for level in range(depth):
+            node['child'] = {'level': level, 'list': [[{'leaf': level}]]}
+            node = node['child']
+        return pelican, node
+
+    def test_copies_are_independent(self):
+        test_pelican = PelicanJson(self.ricketts)
+        for clone in (copy.copy(test_pelican), copy.deepcopy(test_pelican)):
+            self.assertEqual(clone, test_pelican)
+            self.assertIsNot(clone['query'], test_pelican['query'])
+            images = ['query', 'pages', '1422396', 'images']
+            self.assertIsNot(clone.get_nested_value(images),
+                             test_pelican.get_nested_value(images))
+            clone.set_nested_value(images + [0, 'title'], 'EDITED')
+            self.assertEqual(test_pelican.convert(), self.ricketts)
+
+    def test_deep_copies_copy_leaves(self):
+        test_pelican = PelicanJson({'a': [1, 'two']})
+        test_pelican.store['b'] = bytearray(b'value')
+        self.assertIs(copy.copy(test_pelican)['b'], test_pelican['b'])
+        self.assertIsNot(copy.deepcopy(test_pelican)['b'], test_pelican['b'])
+        self.assertEqual(copy.deepcopy(test_pelican)['b'], test_pelican['b'])
+
+    def test_deep_documents(self):
+        depth = sys.getrecursionlimit() + 500
+        test_pelican, deepest = self.deep_document(depth)
+        path = test_pelican.path_of(deepest)
+        for clone in (copy.copy(test_pelican), copy.deepcopy(test_pelican),
+                      pickle.loads(pickle.dumps(test_pelican))):
+            self.assertEqual(list(clone.enumerate()), list(test_pelican.enumerate()))
+            node = clone
+            for key in path:
+                node = node[key]
+            leaf = node['list'][0][0]
+            self.assertEqual(leaf['leaf'], depth - 1)
+            self.assertEqual(clone.path_of(leaf), path + ['list', 0, 0])
+
+    def test_lists_and_subclasses(self):
+        test_pelican = PackedPelicanJson({'series': list(range(10)),
+                                          'nested': [[], [{'a': 1}], {}]})
+        test_pelican.create_path(['sparse', 5000, 'b'], 2)
+        for clone in (copy.copy(test_pelican), copy.deepcopy(test_pelican),
+                      pickle.loads(pickle.dumps(test_pelican))):
+            self.assertIsInstance(clone, PackedPelicanJson)
+            self.assertEqual(clone.convert(), test_pelican.convert())
+            self.assertIsInstance(clone['sparse'], SparseList)
+            node = clone.get_nested_value(['sparse', 5000])
+            self.assertEqual(clone.path_of(node), ['sparse', 5000])
+            self.assertIsInstance(clone.get_nested_value(['nested', 1, 0]), PackedPelicanJson)
+            clone['series'][0] = 100
+            self.assertEqual(test_pelican['series'][0], 0)
+
+
+class TestProject(TestCase):
+
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+        self.pelican = PelicanJson(self.ricketts)
+        self.images = ['query', 'pages', '1422396', 'images']
+
+    def test_project(self):
+        paths = [['query-continue'], self.images + [ANY, 'title'], self.images + [1]]
+        result = self.pelican.project(paths)
+        self.assertIsInstance(result, PelicanJson)
+        images = result.get_nested_value(self.images)
+        self.assertEqual(images[1], self.pelican.get_nested_value(self.images + [1]))
+        self.assertEqual(images[2], {'title': self.pelican.get_nested_value(self.images + [2, 'title'])})
+        self.assertEqual(result['query-continue'], self.pelican['query-continue'])
+        self.assertIsNot(result['query-continue'], self.pelican['query-continue'])
+        self.assertIs(result.get_nested_value(self.images + [1]).parent,
+                      result.get_nested_value(self.images[:-1]))
+        self.assertEqual(self.pelican.project([[]]), self.pelican)
+
+    def test_plain_and_compact(self):
+        paths = [self.images + [3, 'title'], self.images + [5, 'title']]
+        result = self.pelican.project(paths, compact=True, plain=True)
+        self.assertIsInstance(result, dict)
+        self.assertEqual(PelicanJson(result).get_nested_value(self.images),
+                         [{'title': self.pelican.get_nested_value(self.images + [index, 'title'])}
+                          for index in (3, 5)])
+        self.assertEqual(self.pelican.project([['missing']], plain=True), {})
+
+    def test_only_selected_branches_are_visited(self):
+        self.pelican.store['query'].store['normalized'] = Unvisitable()
+        result = self.pelican.project([self.images + [0]], plain=True)
+        self.assertEqual(list(result['query']), ['pages'])
+
+    def test_deep_paths(self):
+        depth = sys.getrecursionlimit() + 500
+        # Built one level at a time, as building it all at once recurses
+        pelican = PelicanJson()
+        node = pelican
+        for _ in range(depth):
+            node['k'] = {'other': 1}
+            node = node['k']
+        node['k'] = {'leaf': True}
+        result = pelican.project([['k'] * (depth + 1)], plain=True)
+        self.assertNotIn('other', result)
+        for _ in range(depth + 1):
+            result = result['k']
+        self.assertEqual(result, {'leaf': True})
+
+
+class Unvisitable(list):
+    def __iter__(self):
+        raise AssertionError("Visited")
+
+    def __len__(self):
+        raise AssertionError("Visited")
+
+
+def strip(value, doomed):
+    """Plain-dictionary version of `delete_where`, to check it against.
+    """
+    if isinstance(value, dict):
+        return {k: strip(v, doomed) for k, v in value.items() if not doomed(k, v)}
+    elif isinstance(value, list):
+        return [strip(v, doomed) for k, v in enumerate(value) if not doomed(k, v)]
+    return value
+
+
+class TestDelete(TestCase):
+
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+        with open(monterrey, 'r') as f:
+            self.monterrey = json.loads(f.read())
+        self.data = {'items': [{'id': 1, '_embedded': {'secret': 'a'}},
+                               {'id': 2, 'password': 'b'},
+                               [{'id': 3}, None],
+                               {'id': 4, '_embedded': [{'secret': 'c'}]}],
+                     'links': {'self': '/items', 'next': None}}
+        self.pelican = PelicanJson(self.data)
+
+    def assertLinked(self, pelican):
+        for path in pelican.paths():
+            if path[-1:] != [] and isinstance(pelican.get_nested_value(path), PelicanJson):
+                node = pelican.get_nested_value(path)
+                self.assertTrue(node.parent._holds(node))
+                self.assertEqual(pelican.path_of(node), path)
+
+    def test_delete_paths(self):
+        removed = self.pelican.delete_paths([['items', 0], ['items', -1, '_embedded'],
+                                             ['items', 2, 0, 'id'], ['links', 'self'],
+                                             ['links', 'missing'], ['missing', 0]])
+        self.assertEqual(removed, 4)
+        self.assertEqual(self.pelican.convert(),
+                         {'items': [{'id': 2, 'password': 'b'}, [{}, None], {'id': 4}],
+                          'links': {'next': None}})
+        self.assertLinked(self.pelican)
+        self.assertEqual(self.pelican.path_of(self.pelican.get_nested_value(['items', 1, 0])),
+                         ['items', 1, 0])
+
+    def test_indices_refer_to_the_original_list(self):
+        self.pelican.delete_paths([['items', 1], ['items', 3], ['items', 0, 'id']])
+        self.assertEqual(self.pelican.convert()['items'],
+                         [{'_embedded': {'secret': 'a'}}, [{'id': 3}, None]])
+        self.assertLinked(self.pelican)
+
+    def test_delete_paths_wildcards(self):
+        self.assertEqual(self.pelican.delete_paths([['items', ANY, 'id'], ['items', 2, ANY]]), 5)
+        self.assertEqual(self.pelican.convert()['items'],
+                         [{'_embedded': {'secret': 'a'}}, {'password': 'b'}, [],
+                          {'_embedded': [{'secret': 'c'}]}])
+        self.assertEqual(self.pelican.delete_paths([[ANY]]), 2)
+        self.assertEqual(self.pelican.convert(), {})
+        with self.assertRaises(EmptyPath):
+            self.pelican.delete_paths([['items'], []])
+
+    def test_delete_where(self):
+        self.assertEqual(self.pelican.delete_where(key='_embedded'), 2)
+        self.assertEqual(self.pelican.delete_where(value=None), 2)
+        self.assertEqual(self.pelican.delete_where(predicate=lambda k, v: k == 'password'), 1)
+        self.assertEqual(self.pelican.convert(),
+                         {'items': [{'id': 1}, {'id': 2}, [{'id': 3}], {'id': 4}],
+                          'links': {'self': '/items'}})
+        self.assertLinked(self.pelican)
+        self.assertEqual(self.pelican.delete_where(key='missing'), 0)
+
+    def test_delete_where_matches_a_plain_version(self):
+        def doomed(k, v):
+            return k in ('title', 'ns', 1) or v == 0
+        for data in (self.ricketts, self.monterrey):
+            pelican = PelicanJson(data)
+            pelican.delete_where(key='title', value=0, predicate=lambda k, v: k in ('ns', 1))
+            self.assertEqual(pelican.convert(), strip(data, doomed))
+            self.assertLinked(pelican)
+
+    def test_deletes_invalidate_cursors(self):
+        _, cursor = self.pelican.page(2)
+        self.assertEqual(self.pelican.delete_paths([['items', 5]]), 0)
+        self.pelican.page(2, cursor=cursor)
+        self.pelican.delete_where(key='id')
+        with self.assertRaises(StaleCursor):
+            self.pelican.page(2, cursor=cursor)
+
+    def test_sparse_lists(self):
+        pelican = PelicanJson({'points': SparseList({0: {'a': 1}, 2000: {'a': 2}, 3000: 'x'})})
+        self.assertEqual(pelican.delete_paths([['points', 1000], ['points', -1]]), 2)
+        points = pelican['points']
+        self.assertIsInstance(points, SparseList)
+        self.assertEqual(len(points), 2999)
+        self.assertEqual(list(points.populated())[1][0], 1999)
+        self.assertEqual(pelican.path_of(points[1999]), ['points', 1999])
+
+
+class TestDeepMerge(TestCase):
+
+    def setUp(self):
+        self.defaults = {'db': {'host': 'localhost', 'port': 5432, 'options': {'ssl': False}},
+                         'servers': [{'id': 'a', 'weight': 1}, {'id': 'b', 'weight': 1}],
+                         'tags': ['x']}
+        self.overrides = {'db': {'host': 'db.internal', 'options': {'ssl': True, 'ca': 'ca.pem'}},
+                          'servers': [{'id': 'b', 'weight': 5}, {'id': 'c', 'links': [{'href': '/c'}]}],
+                          'tags': ['y'],
+                          'debug': {'level': 2}}
+        self.pelican = PelicanJson(self.defaults)
+
+    def assertLinked(self, pelican):
+        for path, _ in pelican.enumerate():
+            for end in range(1, len(path)):
+                node = pelican.get_nested_value(path[:end])
+                if isinstance(node, PelicanJson):
+                    self.assertEqual(pelican.path_of(node), path[:end])
+                    self.assertTrue(node.parent._holds(node))
+
+    def test_objects_are_merged(self):
+        options = self.pelican['db']['options']
+        self.assertIs(self.pelican.deep_merge(self.overrides), self.pelican)
+        self.assertEqual(self.pelican.convert(),
+                         {'db': {'host': 'db.internal', 'port': 5432,
+                                 'options': {'ssl': True, 'ca': 'ca.pem'}},
+                          'servers': self.overrides['servers'],
+                          'tags': ['y'],
+                          'debug': {'level': 2}})
+        self.assertIs(self.pelican['db']['options'], options)
+        self.assertIsInstance(self.pelican['debug'], PelicanJson)
+        self.assertLinked(self.pelican)
+
+    def test_values_replace_objects(self):
+        self.pelican.deep_merge({'db': 'sqlite://', 'tags': {'a': 1}})
+        self.assertEqual(self.pelican['db'], 'sqlite://')
+        self.assertEqual(self.pelican['tags'].convert(), {'a': 1})
+        self.pelican.deep_merge(PelicanJson({'db': {'host': 'h'}}))
+        self.assertEqual(self.pelican['db'].convert(), {'host': 'h'})
+
+    def test_list_strategies(self):
+        self.pelican.deep_merge(self.overrides, list_strategy='append')
+        self.assertEqual(self.pelican.convert()['tags'], ['x', 'y'])
+        self.assertEqual(self.pelican.convert()['servers'],
+                         self.defaults['servers'] + self.overrides['servers'])
+        self.assertLinked(self.pelican)
+
+        pelican = PelicanJson(self.defaults)
+        pelican.deep_merge(self.overrides, list_strategy='by_key')
+        self.assertEqual(pelican.convert()['servers'],
+                         [{'id': 'a', 'weight': 1}, {'id': 'b', 'weight': 5},
+                          {'id': 'c', 'links': [{'href': '/c'}]}])
+        self.assertEqual(pelican.convert()['tags'], ['x', 'y'])
+        self.assertLinked(pelican)
+
+        pelican = PelicanJson({'items': [{'name': 'a', 'n': 1}, 'text', [{'name': 'a'}]]})
+        pelican.deep_merge({'items': [{'name': 'a', 'n': 2}, {'name': ['b']}, {'n': 3}]},
+                           list_strategy='by_key', list_key='name')
+        self.assertEqual(pelican.convert()['items'],
+                         [{'name': 'a', 'n': 2}, 'text', [{'name': 'a'}], {'name': ['b']}, {'n': 3}])
+        with self.assertRaises(ValueError):
+            pelican.deep_merge({}, list_strategy='zip')
+        with self.assertRaises(TypeError):
+            pelican.deep_merge([('items', 1)])
+
+    def test_merging_copies_other(self):
+        other = PelicanJson(self.overrides)
+        self.pelican.deep_merge(other, list_strategy='by_key')
+        self.assertEqual(other.convert(), self.overrides)
+        self.assertIsNot(self.pelican['debug'], other['debug'])
+        self.pelican.set_nested_value(['servers', 2, 'links', 0, 'href'], 'changed')
+        self.assertEqual(other.get_nested_value(['servers', 1, 'links', 0, 'href']), '/c')
+        self.assertLinked(self.pelican)
+
+    def test_move(self):
+        other = PelicanJson(self.overrides)
+        debug = other['debug']
+        link = other.get_nested_value(['servers', 1, 'links', 0])
+        self.pelican.deep_merge(other, list_strategy='by_key', move=True)
+        self.assertIs(self.pelican['debug'], debug)
+        self.assertIs(self.pelican.get_nested_value(['servers', 2, 'links', 0]), link)
+        self.assertIs(debug.root, self.pelican)
+        self.assertEqual(self.pelican.path_of(link), ['servers', 2, 'links', 0])
+        self.assertEqual(other.convert(), {})
+        self.assertLinked(self.pelican)
+
+    def test_merge_invalidates_cursors(self):
+        _, cursor = self.pelican.page(2)
+        self.pelican.deep_merge({'db': {'port': 1}})
+        with self.assertRaises(StaleCursor):
+            self.pelican.page(2, cursor=cursor)
+
+
+class TestMoveAndRename(TestCase):
+
+    def setUp(self):
+        self.data = {'attributes': {'links': {'self': '/a', 'items': [{'href': '/i'}]}, 'n': 1},
+                     'items': [{'id': 0}, {'id': 1}, {'id': 2, 'children': [{'id': 3}]}],
+                     'meta': {'_links': {'self': '/m'}}}
+        self.pelican = PelicanJson(self.data)
+
+    def assertLinked(self, pelican):
+        for path, _ in pelican.enumerate():
+            for end in range(1, len(path)):
+                node = pelican.get_nested_value(path[:end])
+                if isinstance(node, PelicanJson):
+                    self.assertEqual(pelican.path_of(node), path[:end])
+                    self.assertTrue(node.parent._holds(node))
+
+    def test_move_path(self):
+        links = self.pelican['attributes']['links']
+        self.pelican.move_path(['attributes', 'links'], ['links'])
+        self.assertIs(self.pelican['links'], links)
+        self.assertIs(links.parent, self.pelican)
+        self.assertNotIn('links', self.pelican['attributes'].store)
+        self.assertEqual(self.pelican.path_of(links['items'][0]), ['links', 'items', 0])
+        self.pelican.move_path(['links'], ['meta', 'new', 'links'])
+        self.assertIs(self.pelican.get_nested_value(['meta', 'new', 'links']), links)
+        self.pelican.move_path(['meta', 'new', 'links', 'self'], ['meta', '_links', 'self'])
+        self.assertEqual(self.pelican.get_nested_value(['meta', '_links', 'self']), '/a')
+        self.assertLinked(self.pelican)
+
+    def test_move_within_and_between_lists(self):
+        self.pelican.move_path(['items', 0], ['items', 3])
+        self.assertEqual([item['id'] for item in self.pelican['items']], [1, 2, 0])
+        self.pelican.move_path(['items', -1], ['items', 0])
+        self.assertEqual([item['id'] for item in self.pelican['items']], [0, 1, 2])
+        self.assertLinked(self.pelican)
+        self.pelican.move_path(['items', 0], ['items', 2, 'children', 1])
+        self.assertEqual(self.pelican.convert()['items'],
+                         [{'id': 1}, {'id': 2, 'children': [{'id': 3}, {'id': 0}]}])
+        self.pelican.move_path(['items', 1, 'children', 0], ['attributes', 'child'])
+        self.assertEqual(self.pelican.get_nested_value(['attributes', 'child', 'id']), 3)
+        self.assertLinked(self.pelican)
+
+    def test_bad_moves(self):
+        with self.assertRaises(BadPath):
+            self.pelican.move_path(['attributes'], ['attributes', 'links', 'x'])
+        with self.assertRaises(KeyError):
+            self.pelican.move_path(['missing'], ['x'])
+        with self.assertRaises(TypeError):
+            self.pelican.move_path(['meta'], ['attributes', 'n', 'x'])
+        with self.assertRaises(IndexError):
+            self.pelican.move_path(['meta'], ['items', 'x'])
+        with self.assertRaises(EmptyPath):
+            self.pelican.move_path([], ['x'])
+        for index in (4, 10, -4):
+            with self.assertRaises(IndexError):
+                self.pelican.move_path(['meta'], ['items', index])
+        self.assertEqual(self.pelican.convert(), self.data)
+
+    def test_move_to_the_end_of_a_list(self):
+        meta = self.pelican['meta']
+        self.pelican.move_path(['meta'], ['items', 3])
+        self.assertIs(self.pelican['items'][3], meta)
+        self.assertEqual(meta._key, ('items', 3))
+        self.assertLinked(self.pelican)
+
+    def test_rename_key(self):
+        attributes = self.pelican['attributes']
+        self.assertEqual(self.pelican.rename_key('attributes', 'attrs'), 1)
+        self.assertEqual(list(self.pelican.store), ['attrs', 'items', 'meta'])
+        self.assertIs(self.pelican['attrs'], attributes)
+        self.assertEqual(self.pelican.path_of(attributes['links']), ['attrs', 'links'])
+        self.assertEqual(attributes.rename_key('n', 'links', overwrite=True), 1)
+        self.assertEqual(attributes.convert(), {'links': 1})
+        with self.assertRaises(KeyError):
+            self.pelican.rename_key('missing', 'x')
+
+    def test_rename_key_keeps_its_place_in_other_stores(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'doc.pelican')
+            self.pelican.dump_binary(path)
+            documents = [PelicanJson.open_binary(path),
+                         PelicanJson.loads_lazy(self.pelican.serialize())]
+            for pelican in documents:
+                self.assertEqual(pelican.rename_key('items', 'entries'), 1)
+                self.assertEqual(list(pelican.store), ['attributes', 'entries', 'meta'])
+                self.assertEqual(pelican['attributes'].rename_key('links', 'n', overwrite=True), 1)
+                self.assertEqual(list(pelican['attributes'].store), ['n'])
+                self.assertLinked(pelican)
+
+    def test_rename_key_wont_overwrite_by_default(self):
+        pelican = PelicanJson({'a': 1, 'b': 2, 'c': {'a': 3}, 'd': {'a': 4, 'b': 5}})
+        with self.assertRaises(ValueError):
+            pelican.rename_key('a', 'b')
+        with self.assertRaises(ValueError):
+            pelican.rename_key('a', 'b', everywhere=True)
+        self.assertEqual(pelican.convert(), {'a': 1, 'b': 2, 'c': {'a': 3}, 'd': {'a': 4, 'b': 5}})
+        self.assertEqual(pelican.rename_key('a', 'b', everywhere=True, overwrite=True), 3)
+        self.assertEqual(pelican.convert(), {'b': 1, 'c': {'b': 3}, 'd': {'b': 4}})
+
+    def test_rename_key_everywhere(self):
+        _, cursor = self.pelican.page(2)
+        self.assertEqual(self.pelican.rename_key('id', 'key', everywhere=True), 4)
+        self.assertEqual(list(self.pelican.search_key('id')), [])
+        self.assertEqual(list(self.pelican.search_key('key')),
+                         [['items', 0, 'key'], ['items', 1, 'key'], ['items', 2, 'key'],
+                          ['items', 2, 'children', 0, 'key']])
+        self.assertEqual(list(self.pelican['items'][2].store), ['key', 'children'])
+        self.assertLinked(self.pelican)
+        with self.assertRaises(StaleCursor):
+            self.pelican.page(2, cursor=cursor)
+        self.assertEqual(self.pelican.rename_key('missing', 'x', everywhere=True), 0)
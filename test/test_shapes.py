@@ -0,0 +1,144 @@
+import asyncio
+import os
+import json
+import pickle
+from unittest import TestCase
+
+from pelecanus import PelicanJson
+from pelecanus import ShapedPelicanJson
+from pelecanus.shapes import ShapeCache
+from pelecanus.shapes import ShapedStore
+
+
+# Fixture locations
+current_dir = os.path.abspath(os.path.dirname(__file__))
+fixture_dir = os.path.join(current_dir, 'fixtures')
+# Actual datasets
+monterrey = os.path.join(fixture_dir, 'monterrey.json')
+
+
+class TestShapedStore(TestCase):
+
+    def setUp(self):
+        self.cache = ShapeCache()
+
+    def test_mapping(self):
+        store = ShapedStore({'a': 1, 'b': 2}, self.cache)
+        self.assertEqual(store['b'], 2)
+        self.assertEqual(list(store), ['a', 'b'])
+        self.assertEqual(list(store.items()), [('a', 1), ('b', 2)])
+        self.assertEqual(dict(store), {'a': 1, 'b': 2})
+        self.assertEqual(store, {'a': 1, 'b': 2})
+        self.assertIn('a', store)
+        self.assertNotIn(1, store)
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store.get('c'))
+        with self.assertRaises(KeyError):
+            store['c']
+
+    def test_shapes_are_shared(self):
+        first = ShapedStore({'a': 1, 'b': 2}, self.cache)
+        second = ShapedStore({'a': 3, 'b': 4}, self.cache)
+        self.assertIs(first.shape, second.shape)
+        reordered = ShapedStore({'b': 1, 'a': 2}, self.cache)
+        self.assertIsNot(reordered.shape, first.shape)
+        self.assertEqual(len(self.cache), 2)
+        # Shapes go once nothing uses them
+        del reordered
+        self.assertEqual(len(self.cache), 1)
+
+    def test_changing_keys_changes_shape(self):
+        store = ShapedStore({'a': 1, 'b': 2}, self.cache)
+        other = ShapedStore({'a': 1, 'b': 2}, self.cache)
+        store['b'] = 'B'
+        self.assertIs(store.shape, other.shape)
+        store['c'] = 3
+        self.assertEqual(store.shape.keys, ('a', 'b', 'c'))
+        self.assertIs(store.shape,
+                      ShapedStore({'a': 0, 'b': 0, 'c': 0}, self.cache).shape)
+        del store['a']
+        self.assertEqual(dict(store), {'b': 'B', 'c': 3})
+        self.assertEqual(store.pop('b'), 'B')
+        self.assertEqual(store.pop('b', None), None)
+        self.assertEqual(dict(store), {'c': 3})
+        self.assertEqual(dict(other), {'a': 1, 'b': 2})
+
+    def test_keys_are_interned(self):
+        first = json.loads('{"somewhat_long_key_name": 1}')
+        second = json.loads('{"somewhat_long_key_name": 2}')
+        self.assertIsNot(list(first)[0], list(second)[0])
+        first = ShapedStore(first, self.cache)
+        second = ShapedStore(second, self.cache)
+        self.assertIs(list(first)[0], list(second)[0])
+
+
+class TestShapedPelicanJson(TestCase):
+
+    def setUp(self):
+        with open(monterrey, 'r') as f:
+            self.monterrey = json.loads(f.read())
+
+    def test_same_as_pelican(self):
+        shaped = ShapedPelicanJson(self.monterrey)
+        pelican = PelicanJson(self.monterrey)
+        self.assertEqual(list(shaped.enumerate()), list(pelican.enumerate()))
+        self.assertEqual(shaped.convert(), self.monterrey)
+        self.assertEqual(json.loads(shaped.serialize()), self.monterrey)
+        self.assertEqual(list(shaped.search_key('href')),
+                         list(pelican.search_key('href')))
+        for path, value in pelican.enumerate():
+            self.assertEqual(shaped.get_nested_value(path), value)
+
+    def test_nested_objects_are_shaped(self):
+        shaped = ShapedPelicanJson(self.monterrey)
+        for _, _, value, _ in shaped._walk():
+            if isinstance(value, PelicanJson):
+                self.assertIsInstance(value, ShapedPelicanJson)
+                self.assertIsInstance(value.store, ShapedStore)
+        shaped.create_path(['new', 'list', 1, 'key'], 'VALUE')
+        self.assertIsInstance(shaped.get_nested_value(['new', 'list', 1]),
+                              ShapedPelicanJson)
+        self.assertEqual(shaped.get_nested_value(['new', 'list', 1, 'key']),
+                         'VALUE')
+
+    def test_aload_builds_shaped_objects(self):
+        async def chunks():
+            yield json.dumps(self.monterrey).encode('utf-8')
+
+        shaped = asyncio.run(ShapedPelicanJson.aload(chunks(), budget=2))
+        self.assertIsInstance(shaped.store, ShapedStore)
+        for _, _, value, _ in shaped._walk():
+            if isinstance(value, PelicanJson):
+                self.assertIsInstance(value, ShapedPelicanJson)
+                self.assertIsInstance(value.store, ShapedStore)
+        self.assertEqual(shaped.convert(), self.monterrey)
+        results = shaped.get_nested_value(['results', 7])
+        self.assertEqual(shaped.path_of(results), ['results', 7])
+
+    def test_rename_key_keeps_its_place(self):
+        shaped = ShapedPelicanJson({'a': 1, 'b': {'c': 2}, 'd': 3})
+        nested = shaped['b']
+        shaped.rename_key('b', 'e')
+        self.assertEqual(list(shaped.store), ['a', 'e', 'd'])
+        self.assertIsInstance(shaped.store, ShapedStore)
+        self.assertIs(shaped['e'], nested)
+        self.assertEqual(shaped.path_of(nested), ['e'])
+        with self.assertRaises(ValueError):
+            shaped.rename_key('a', 'd')
+        shaped.rename_key('a', 'd', overwrite=True)
+        self.assertEqual(shaped.convert(), {'d': 1, 'e': {'c': 2}})
+
+    def test_same_shape_across_documents(self):
+        first = ShapedPelicanJson(json.loads(json.dumps(self.monterrey)))
+        second = ShapedPelicanJson(json.loads(json.dumps(self.monterrey)))
+        self.assertIs(first.store.shape, second.store.shape)
+        self.assertLess(first.memory_stats()['bytes']['containers'],
+                        PelicanJson(self.monterrey).memory_stats()['bytes']['containers'])
+
+    def test_pickle(self):
+        shaped = ShapedPelicanJson(self.monterrey)
+        restored = pickle.loads(pickle.dumps(shaped))
+        self.assertIsInstance(restored.store, ShapedStore)
+        self.assertIs(restored.store.shape, shaped.store.shape)
+        self.assertEqual(restored.convert(), self.monterrey)
+        self.assertIn('ShapedPelicanJson', repr(shaped))
@@ -0,0 +1,141 @@
+import os
+import json
+import multiprocessing
+import pickle
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pelecanus import PelicanJson
+from pelecanus.snapshot import MappedStore
+from pelecanus.snapshot import SharedSnapshot
+
+
+# Fixture locations
+current_dir = os.path.abspath(os.path.dirname(__file__))
+fixture_dir = os.path.join(current_dir, 'fixtures')
+# Actual datasets
+ricketts = os.path.join(fixture_dir, 'ricketts.json')
+monterrey = os.path.join(fixture_dir, 'monterrey.json')
+
+
+def shared_title(shared):
+    pelican = shared.open()
+    return pelican.get_nested_value(['query', 'pages', '1422396', 'title'])
+
+
+class TestSnapshots(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, 'snapshot.pelican')
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+        with open(monterrey, 'r') as f:
+            self.monterrey = json.loads(f.read())
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def snapshot(self, data):
+        PelicanJson(data).dump_binary(self.filename)
+        return PelicanJson.open_binary(self.filename)
+
+    def test_round_trip(self):
+        for data in (self.ricketts, self.monterrey):
+            pelican = self.snapshot(data)
+            self.assertIsInstance(pelican.store, MappedStore)
+            self.assertEqual(pelican.convert(), data)
+            self.assertEqual(list(pelican.enumerate()),
+                             list(PelicanJson(data).enumerate()))
+
+    def test_scalars(self):
+        data = {'none': None, 'true': True, 'false': False, 'int': -42,
+                'big': 2 ** 70, 'float': 1.5, 'text': 'pélican ✓', 'empty': '',
+                'list': [1, [2, {'three': 3}], []], 'object': {}}
+        pelican = self.snapshot(data)
+        self.assertEqual(pelican.convert(), data)
+        self.assertIs(pelican['true'], True)
+        self.assertIs(type(pelican['int']), int)
+
+    def test_only_reached_nodes_are_decoded(self):
+        pelican = self.snapshot(self.ricketts)
+        path = ['query', 'pages', '1422396', 'title']
+        self.assertEqual(pelican.get_nested_value(path),
+                         PelicanJson(self.ricketts).get_nested_value(path))
+        pages = pelican.get_nested_value(['query', 'pages'])
+        self.assertEqual(list(pelican.store._decoded), ['query'])
+        self.assertEqual(list(pages.store._decoded), ['1422396'])
+        self.assertNotIn('normalized', pelican['query'].store._decoded)
+
+    def test_lookups(self):
+        pelican = self.snapshot(self.ricketts)
+        plain = PelicanJson(self.ricketts)
+        self.assertIn('query', pelican)
+        self.assertNotIn('missing', pelican.store)
+        self.assertNotIn(1, pelican.store)
+        with self.assertRaises(KeyError):
+            pelican.get_nested_value(['query', 'missing'])
+        self.assertEqual(list(pelican.search_key('title')), list(plain.search_key('title')))
+        self.assertEqual(len(pelican), len(plain))
+        self.assertEqual(pelican, plain)
+
+    def test_parent_links(self):
+        pelican = self.snapshot(self.ricketts)
+        path = ['query', 'normalized', 0]
+        node = pelican.get_nested_value(path)
+        self.assertIs(node.parent, pelican['query'])
+        self.assertEqual(pelican.path_of(node), path)
+
+    def test_editing_leaves_the_file_alone(self):
+        pelican = self.snapshot(self.ricketts)
+        path = ['query', 'pages', '1422396', 'title']
+        pelican.set_nested_value(path, 'EDITED')
+        pelican.create_path(['query', 'new', 3], 'NEW')
+        self.assertEqual(pelican.get_nested_value(path), 'EDITED')
+        self.assertEqual(pelican.get_nested_value(['query', 'new', 3]), 'NEW')
+        reopened = PelicanJson.open_binary(self.filename)
+        self.assertEqual(reopened.convert(), self.ricketts)
+
+    def test_pickle(self):
+        pelican = self.snapshot(self.ricketts)
+        copied = pickle.loads(pickle.dumps(pelican))
+        self.assertIsInstance(copied.store, dict)
+        self.assertEqual(copied.convert(), self.ricketts)
+
+    def test_snapshot_of_snapshot(self):
+        pelican = self.snapshot(self.monterrey)
+        other = os.path.join(self.tempdir, 'other.pelican')
+        pelican.dump_binary(other)
+        self.assertEqual(PelicanJson.open_binary(other).convert(), self.monterrey)
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            PelicanJson({'a': {1: 'b'}}).dump_binary(self.filename)
+        with self.assertRaises(TypeError):
+            PelicanJson({'a': object()}).dump_binary(self.filename)
+        with open(self.filename, 'w') as f:
+            f.write(json.dumps(self.ricketts))
+        with self.assertRaises(ValueError):
+            PelicanJson.open_binary(self.filename)
+
+    def test_shared_memory(self):
+        plain = PelicanJson(self.ricketts)
+        with plain.share() as shared:
+            handle = pickle.loads(pickle.dumps(shared))
+            self.assertIsInstance(handle, SharedSnapshot)
+            self.assertLess(len(pickle.dumps(shared)), 200)
+            pelican = handle.open()
+            self.assertIsInstance(pelican.store, MappedStore)
+            self.assertEqual(pelican.convert(), self.ricketts)
+            pelican.set_nested_value(['query', 'pages', '1422396', 'title'], 'EDITED')
+            self.assertEqual(handle.open().convert(), self.ricketts)
+        self.assertEqual(pelican['query-continue'], plain['query-continue'])
+        with self.assertRaises(FileNotFoundError):
+            handle.open()
+
+    def test_shared_with_workers(self):
+        title = PelicanJson(self.ricketts).get_nested_value(['query', 'pages', '1422396', 'title'])
+        with PelicanJson(self.ricketts).share() as shared:
+            with multiprocessing.Pool(2) as pool:
+                self.assertEqual(pool.map(shared_title, [shared] * 4), [title] * 4)
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import json
+import tempfile
+import threading
+from unittest import TestCase
+
+from pelecanus import PelicanJson
+from pelecanus import ThreadSafePelicanJson
+from pelecanus.threadsafe import ReadWriteLock
+
+
+# Fixture locations
+current_dir = os.path.abspath(os.path.dirname(__file__))
+fixture_dir = os.path.join(current_dir, 'fixtures')
+# Actual datasets
+ricketts = os.path.join(fixture_dir, 'ricketts.json')
+
+
+class TestReadWriteLock(TestCase):
+
+    def test_readers_share_the_lock(self):
+        lock = ReadWriteLock()
+        both_reading = threading.Barrier(2, timeout=5)
+
+        def reader():
+            with lock.read_locked():
+                both_reading.wait()
+
+        threads = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertFalse(both_reading.broken)
+
+    def test_writer_excludes_readers(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def reader():
+            with lock.read_locked():
+                events.append('read')
+
+        lock.acquire_write()
+        reader = threading.Thread(target=reader)
+        reader.start()
+        reader.join(0.05)
+        events.append('write done')
+        lock.release_write()
+        reader.join()
+        self.assertEqual(events, ['write done', 'read'])
+
+
+class TestThreadSafePelicanJson(TestCase):
+
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+
+    def test_same_results_as_pelican(self):
+        shared = ThreadSafePelicanJson(self.ricketts)
+        test_rickettsi = PelicanJson(self.ricketts)
+        self.assertEqual(list(shared.enumerate()),
+                         list(test_rickettsi.enumerate()))
+        self.assertEqual(list(shared.search_key('*')),
+                         list(test_rickettsi.search_key('*')))
+        self.assertEqual(shared.count_key('title'), 8)
+        self.assertEqual(shared.search_many(keys=['*']),
+                         test_rickettsi.search_many(keys=['*']))
+        self.assertEqual(shared.convert(), self.ricketts)
+        path = ['new', 'path', 0]
+        self.assertIs(shared.create_path(path, 'VALUE'), shared)
+        self.assertEqual(shared.get_nested_value(path), 'VALUE')
+        self.assertEqual(shared.delete_paths([path]), 1)
+        self.assertEqual(shared.delete_where(key='title'), 8)
+        self.assertEqual(shared.count_key('title'), 0)
+        self.assertIs(shared.deep_merge({'query': {'new': 1}}), shared)
+        self.assertEqual(shared.get_nested_value(['query', 'new']), 1)
+        shared.move_path(['query', 'new'], ['moved'])
+        self.assertEqual(shared.rename_key('moved', 'renamed'), 1)
+        self.assertEqual(shared.get_nested_value(['renamed']), 1)
+
+    def test_forwards_all_arguments(self):
+        shared = ThreadSafePelicanJson(self.ricketts)
+        test_rickettsi = PelicanJson(self.ricketts)
+        kwargs = {'tuples': True, 'order': 'bfs', 'max_depth': 3}
+        self.assertEqual(list(shared.enumerate(**kwargs)),
+                         list(test_rickettsi.enumerate(**kwargs)))
+        self.assertEqual(list(shared.paths(tuples=True)),
+                         list(test_rickettsi.paths(tuples=True)))
+        self.assertEqual(list(shared.search_key('title', first_only=True, tuples=True)),
+                         list(test_rickettsi.search_key('title', first_only=True, tuples=True)))
+        self.assertEqual(list(shared.search_value(0, path=['query'])),
+                         list(test_rickettsi.search_value(0, path=['query'])))
+        items, cursor = shared.page(5, tuples=True, max_depth=2)
+        self.assertEqual((items, cursor), test_rickettsi.page(5, tuples=True, max_depth=2))
+        self.assertEqual(list(shared.enumerate(cursor=cursor)),
+                         list(test_rickettsi.enumerate(cursor=cursor)))
+        self.assertEqual(shared.serialize(codec='json'), test_rickettsi.serialize(codec='json'))
+
+    def test_memory_stats_and_dump_binary(self):
+        shared = ThreadSafePelicanJson(self.ricketts)
+        self.assertEqual(shared.memory_stats(), PelicanJson(self.ricketts).memory_stats())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'ricketts.pelican')
+            shared.dump_binary(path)
+            self.assertEqual(PelicanJson.open_binary(path).convert(), self.ricketts)
+
+    def test_async_methods(self):
+        shared = ThreadSafePelicanJson(self.ricketts)
+        test_rickettsi = PelicanJson(self.ricketts)
+
+        async def consume():
+            found = [item async for item in shared.aenumerate(budget=10)]
+            titles = [path async for path in shared.asearch_key('title')]
+            values = [path async for path in shared.asearch_value(0)]
+            return found, titles, values
+
+        found, titles, values = asyncio.run(consume())
+        self.assertEqual(found, list(test_rickettsi.enumerate()))
+        self.assertEqual(titles, list(test_rickettsi.search_key('title')))
+        self.assertEqual(values, list(test_rickettsi.search_value(0)))
+
+    def test_subtrees_are_copies(self):
+        shared = ThreadSafePelicanJson(self.ricketts)
+        query = shared['query']
+        pages = shared.get_nested_value(['query', 'pages'])
+        plucked = list(shared.pluck('ns', 0))
+        nested = [value for _, value in shared.items() if isinstance(value, PelicanJson)]
+        errors = []
+
+        def writer():
+            try:
+                for i in range(200):
+                    shared.create_path(['query', 'pages', 'new{}'.format(i)], i)
+                    shared.create_path(['query', 'new{}'.format(i)], i)
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        # Reading the copies while the writer runs can't see it change them
+        for _ in range(20):
+            list(pages.enumerate())
+            list(query.keys())
+        thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(query.convert(), self.ricketts['query'])
+        self.assertEqual(pages.convert(), self.ricketts['query']['pages'])
+        self.assertIsNone(query.parent)
+        for node in plucked + nested:
+            self.assertNotIn('new0', node)
+        self.assertIn('new0', shared.get_nested_value(['query', 'pages']))
+
+    def test_snapshot_survives_writes(self):
+        shared = ThreadSafePelicanJson(self.ricketts)
+        paths = shared.paths()
+        next(paths)
+        shared.create_path(['brand', 'new', 'key'], 'VALUE')
+        self.assertNotIn(['brand', 'new', 'key'], list(paths))
+
+    def test_concurrent_readers_and_writers(self):
+        shared = ThreadSafePelicanJson(self.ricketts)
+        errors = []
+
+        def reader():
+            try:
+                for _ in range(50):
+                    list(shared.enumerate())
+                    list(shared.search_key('title'))
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+
+        def writer(n):
+            try:
+                for i in range(50):
+                    shared.create_path(['writer{}'.format(n), str(i)], i)
+                    shared.set_nested_value(['query', 'new'], i, force=True)
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        threads += [threading.Thread(target=writer, args=(n,))
+                    for n in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(shared['writer0']), 50)
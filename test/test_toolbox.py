@@ -1,8 +1,11 @@
 import os
 import json
+import shutil
+import tempfile
 from unittest import TestCase
 
 from pelecanus import PelicanJson
+from pelecanus.exceptions import StaleIndex
 from pelecanus.toolbox import backfill_append
 from pelecanus.toolbox import new_json_from_path
 from pelecanus.toolbox import find_value
@@ -13,6 +16,15 @@ from pelecanus.toolbox import reverse_result
 from pelecanus.toolbox import get_path
 from pelecanus.toolbox import get_nested_value
 from pelecanus.toolbox import set_nested_value
+from pelecanus.toolbox import search_hits
+from pelecanus.toolbox import search_many
+from pelecanus.toolbox import walk
+from pelecanus.toolbox import INDEX_SUFFIX
+from pelecanus.toolbox import get_nested_value_from_file
+from pelecanus.toolbox import index_json_file
+from pelecanus.toolbox import load_json_index
+from pelecanus.toolbox import ANY
+from pelecanus.toolbox import project
 
 # Fixture locations
 current_dir = os.path.abspath(os.path.dirname(__file__))
@@ -282,3 +294,268 @@ class TestSetNestedValue(TestCase):
         for path in test_pelican.paths():
             value = get_nested_value(self.item, path)
             self.assertEqual(value, "NEWVALUE")
+
+
+class TestTuplePaths(TestCase):
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+
+    def test_tuple_paths(self):
+        for func, args in ((find_value, (6,)),
+                           (generate_paths, ()),
+                           (generate_paths_to_key, ('*',))):
+            paths = list(func(self.ricketts, *args))
+            self.assertTrue(paths)
+            self.assertEqual([tuple(path) for path in paths],
+                             list(func(self.ricketts, *args, tuples=True)))
+            prefixed = list(func(self.ricketts, *args, path=['prefix']))
+            self.assertEqual(prefixed, [['prefix'] + path for path in paths])
+
+
+class TestWalk(TestCase):
+    def setUp(self):
+        self.doc = {'links': {'self': 'a', 'next': ['b', {'href': 'c'}]},
+                    'count': 2}
+
+    def test_walk(self):
+        walked = [(prefix + (key,), value, type(container))
+                  for prefix, key, value, container in walk(self.doc)]
+        self.assertEqual(walked, [
+            (('links',), self.doc['links'], dict),
+            (('links', 'self'), 'a', dict),
+            (('links', 'next'), ['b', {'href': 'c'}], dict),
+            (('links', 'next', 0), 'b', list),
+            (('links', 'next', 1), {'href': 'c'}, list),
+            (('links', 'next', 1, 'href'), 'c', dict),
+            (('count',), 2, dict)])
+        self.assertEqual(next(walk(self.doc, path=['prefix']))[0], ('prefix',))
+        self.assertEqual(list(walk('scalar')), [])
+
+    def test_prune(self):
+        def skip_lists(prefix, key, value, container):
+            return isinstance(value, list)
+        walked = [prefix + (key,)
+                  for prefix, key, _, _ in walk(self.doc, prune=skip_lists)]
+        self.assertEqual(walked, [('links',), ('links', 'self'),
+                                  ('links', 'next'), ('count',)])
+
+    def test_early_exit(self):
+        seen = []
+        for prefix, key, value, _ in walk(self.doc):
+            seen.append(key)
+            if key == 'next':
+                break
+        self.assertEqual(seen, ['links', 'self', 'next'])
+
+    def test_bfs_and_max_depth(self):
+        walked = [prefix + (key,) for prefix, key, _, _
+                  in walk(self.doc, order='bfs')]
+        self.assertEqual(walked, [('links',), ('count',), ('links', 'self'),
+                                  ('links', 'next'), ('links', 'next', 0),
+                                  ('links', 'next', 1),
+                                  ('links', 'next', 1, 'href')])
+        walked = [prefix + (key,) for prefix, key, _, _
+                  in walk(self.doc, max_depth=2)]
+        self.assertEqual(walked, [('links',), ('links', 'self'),
+                                  ('links', 'next'), ('count',)])
+        self.assertEqual(len(list(walk(self.doc, order='bfs', max_depth=2))), 4)
+
+    def test_get_path_order(self):
+        doc = {'embedded': [{'self': 'deep'}], 'self': 'shallow'}
+        self.assertEqual(get_path(doc, 'self'), ['embedded', 0, 'self'])
+        self.assertEqual(get_path(doc, 'self', order='bfs'), ['self'])
+        self.assertEqual(get_path(doc, 'self', max_depth=2), ['self'])
+        self.assertIsNone(get_path(doc, 'missing', max_depth=2))
+
+    def test_deep_nesting(self):
+        # Deeper than the recursion limit
+        depth = 2000
+        deep = {'needle': 'found'}
+        for _ in range(depth):
+            deep = {'child': [deep]}
+        expected = ['child', 0] * depth + ['needle']
+        self.assertEqual(count_key(deep, 'needle'), 1)
+        self.assertEqual(get_path(deep, 'needle'), expected)
+        self.assertEqual(list(find_value(deep, 'found')), [expected])
+        self.assertEqual(list(generate_paths_to_key(deep, 'needle')), [expected])
+        self.assertEqual(len(list(generate_paths(deep, tuples=True))), depth + 1)
+
+
+class TestSearchMany(TestCase):
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+
+    def test_search_many(self):
+        found = search_many(self.ricketts, keys=['*', 'title'], values=[6],
+                            predicates={'none': lambda key, value: value is None})
+        self.assertEqual(found['key']['*'],
+                         list(generate_paths_to_key(self.ricketts, '*')))
+        self.assertEqual(len(found['key']['title']),
+                         count_key(self.ricketts, 'title'))
+        self.assertEqual(found['value'][6], list(find_value(self.ricketts, 6)))
+        self.assertEqual(found['predicate']['none'],
+                         list(find_value(self.ricketts, None)))
+
+    def test_search_hits(self):
+        doc = {'links': {'self': {'href': 'a'}, 'next': [{'href': 'b'}]}}
+        self.assertEqual(list(search_hits(doc, keys=['href', 'self'],
+                                          values=['b'], tuples=True)),
+                         [('key', 'self', ('links', 'self')),
+                          ('key', 'href', ('links', 'self', 'href')),
+                          ('key', 'href', ('links', 'next', 0, 'href')),
+                          ('value', 'b', ('links', 'next', 0, 'href'))])
+
+
+class TestFileIndex(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, 'ricketts.json')
+        shutil.copy(ricketts, self.filename)
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_spans(self):
+        tricky = {'a"]': [{}, [], {'b': 'x]}\\"{'}, 1.5e3, None, True],
+                  'é ✓': {'k': [[1, 2], {'z': -1}]}}
+        for source in (ricketts, monterrey, book, data):
+            with open(source, 'r') as f:
+                doc = json.loads(f.read())
+            for text in (json.dumps(doc), json.dumps(doc, indent=2, ensure_ascii=False),
+                         json.dumps(tricky, indent=1, ensure_ascii=False)):
+                with open(self.filename, 'wb') as f:
+                    f.write(text.encode('utf-8'))
+                expected = json.loads(text)
+                index = index_json_file(self.filename)
+                with open(self.filename, 'rb') as f:
+                    raw = f.read()
+                for path, (offset, length) in index['paths'].items():
+                    value = get_nested_value(expected, path) if path else expected
+                    self.assertEqual(json.loads(raw[offset:offset + length].decode('utf-8')), value)
+
+    def test_get_nested_value_from_file(self):
+        paths = list(PelicanJson(self.ricketts).paths())
+        for max_depth in (None, 0, 2):
+            index = index_json_file(self.filename, max_depth=max_depth)
+            with open(self.filename, 'rb') as fp:
+                for path in paths:
+                    self.assertEqual(get_nested_value_from_file(fp, path, index),
+                                     get_nested_value(self.ricketts, path))
+                self.assertEqual(get_nested_value_from_file(fp, [], index), self.ricketts)
+                self.assertIsNone(get_nested_value_from_file(fp, ['query', 'missing'], index))
+        self.assertEqual(list(index['paths']),
+                         [('query-continue', 'extlinks'), ('query-continue',),
+                          ('query', 'pages'), ('query', 'normalized'), ('query',), ()])
+
+    def test_scalar_file(self):
+        for text in ('5', '"text"', 'null'):
+            with open(self.filename, 'w') as f:
+                f.write(text)
+            index = index_json_file(self.filename)
+            self.assertEqual(index['paths'], {})
+            with open(self.filename, 'rb') as fp:
+                self.assertIsNone(get_nested_value_from_file(fp, [], index))
+                self.assertIsNone(get_nested_value_from_file(fp, ['a', 0], index))
+
+    def test_deep_file(self):
+        depth = 1500
+        with open(self.filename, 'w') as f:
+            f.write('{"k": ' * depth + '[1, 2]' + '}' * depth)
+        index = index_json_file(self.filename, keys=True)
+        self.assertEqual(len(index['paths']), depth + 1)
+        self.assertEqual(len(index['keys']['k']), depth)
+        with open(self.filename, 'rb') as fp:
+            self.assertEqual(get_nested_value_from_file(fp, ['k'] * depth + [1], index), 2)
+
+    def test_keys(self):
+        index = index_json_file(self.filename, keys=True)
+        self.assertEqual(index['keys']['title'],
+                         [tuple(path) for path in
+                          generate_paths_to_key(self.ricketts, 'title')])
+        self.assertIsNone(index_json_file(self.filename)['keys'])
+
+    def test_sidecar(self):
+        self.assertIsNone(load_json_index(self.filename))
+        index = index_json_file(self.filename, max_depth=3, keys=True)
+        self.assertTrue(os.path.exists(self.filename + INDEX_SUFFIX))
+        self.assertEqual(load_json_index(self.filename), index)
+
+    def test_stale_index(self):
+        index = index_json_file(self.filename)
+        with open(self.filename, 'a') as f:
+            f.write('\n')
+        self.assertIsNone(load_json_index(self.filename))
+        with open(self.filename, 'rb') as fp:
+            with self.assertRaises(StaleIndex):
+                get_nested_value_from_file(fp, ['query'], index)
+
+    def test_malformed(self):
+        for text in ('', '{"a": [1, 2}', '{"a" 1}', '{"a": 1 "b": 2}', '[1, 2'):
+            with open(self.filename, 'w') as f:
+                f.write(text)
+            with self.assertRaises(ValueError):
+                index_json_file(self.filename)
+
+
+class TestProject(TestCase):
+
+    def setUp(self):
+        with open(ricketts, 'r') as f:
+            self.ricketts = json.loads(f.read())
+        self.page = ['query', 'pages', '1422396']
+
+    def test_paths(self):
+        result = project(self.ricketts, [self.page + ['title'],
+                                         ['query-continue'],
+                                         ['query', 'missing', 'path'],
+                                         self.page + ['title', 'too', 'deep']])
+        self.assertEqual(result, {'query': {'pages': {'1422396': {'title': 'Ed Ricketts'}}},
+                                  'query-continue': self.ricketts['query-continue']})
+        self.assertIs(result['query-continue'], self.ricketts['query-continue'])
+        self.assertEqual(project(self.ricketts, [['missing']]), {})
+        self.assertIs(project(self.ricketts, [[]]), self.ricketts)
+
+    def test_shorter_paths_win(self):
+        for paths in ([self.page, self.page + ['title']], [self.page + ['title'], self.page]):
+            self.assertEqual(project(self.ricketts, paths),
+                             {'query': {'pages': {'1422396': get_nested_value(self.ricketts, self.page)}}})
+
+    def test_lists(self):
+        images = self.page + ['images']
+        paths = [images + [1, 'title'], images + [-1, 'ns']]
+        expected = get_nested_value(self.ricketts, images)
+        result = get_nested_value(project(self.ricketts, paths), images)
+        self.assertEqual(len(result), len(expected))
+        self.assertEqual(result[1], {'title': expected[1]['title']})
+        self.assertEqual(result[-1], {'ns': expected[-1]['ns']})
+        self.assertEqual(result[2:-1], [None] * (len(expected) - 3))
+        compacted = get_nested_value(project(self.ricketts, paths, compact=True), images)
+        self.assertEqual(compacted, [result[1], result[-1]])
+
+    def test_wildcards(self):
+        images = self.page + ['images']
+        result = project(self.ricketts, [images + [ANY, 'title'], images + [0, 'ns']])
+        expected = get_nested_value(self.ricketts, images)
+        self.assertEqual(get_nested_value(result, images)[0], expected[0])
+        self.assertEqual(get_nested_value(result, images)[1:],
+                         [{'title': image['title']} for image in expected[1:]])
+        result = project(self.ricketts, [['query', ANY, ANY, 'pageid']])
+        self.assertEqual(result, {'query': {'pages': {'1422396': {'pageid': 1422396}}}})
+        self.assertEqual(repr(ANY), 'ANY')
+
+    def test_deep_nesting(self):
+        # Deeper than the recursion limit
+        depth = 3000
+        deep = {'leaf': True}
+        for _ in range(depth):
+            deep = {'k': deep, 'other': [1]}
+        result = project(deep, [['k'] * depth, ['k'] * (depth - 1) + [ANY, 0]])
+        self.assertNotIn('other', result)
+        for _ in range(depth - 1):
+            result = result['k']
+        self.assertEqual(result, {'k': {'leaf': True}, 'other': [1]})